@@ -0,0 +1,61 @@
+# benchmarks/__main__.py
+#
+# Run the preset scenarios and optionally gate on a stored baseline:
+#
+#     python -m benchmarks --output results.json
+#     python -m benchmarks --baseline baseline.json --tolerance 0.15
+import argparse
+import asyncio
+import sys
+
+from xylen.bench import compare, format_report, load_report, run_benchmark, save_report
+
+from .scenarios import SCENARIOS
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("scenarios", nargs="*", help=f"default: all of {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--tracemalloc", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    report = None
+    for name in names:
+        app, targets = SCENARIOS[name]()
+        for target in targets:
+            target.name = f"{name}: {target.name}"
+        result = asyncio.run(run_benchmark(
+            app, targets,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            trace_memory=args.tracemalloc,
+        ))
+        if report is None:
+            report = result
+        else:
+            report["results"].update(result["results"])
+            report["peak_rss_kb"] = result["peak_rss_kb"]
+
+    print(format_report(report))
+    if args.output:
+        save_report(report, args.output)
+    if args.baseline:
+        regressions = compare(report, load_report(args.baseline), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_broadcast.py
+#
+# Broadcast throughput of a Channel fanned out to N WebSocket subscribers,
+# each relaying into a no-op ASGI send.
+#
+#     python -m benchmarks.bench_broadcast [--messages 200] [--subscribers 10 100 1000 10000]
+import argparse
+import asyncio
+import time
+
+from xylen.channels import Channel
+from xylen.websockets import WebSocket
+
+MESSAGE = {"type": "tick", "symbol": "XYL", "price": 101.25, "volume": 1200}
+
+
+async def measure(subscribers, messages):
+    channel = Channel(max_queue=messages)
+    delivered = 0
+    disconnect = asyncio.get_running_loop().create_future()
+
+    async def receive():
+        await disconnect
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def send(message):
+        nonlocal delivered
+        delivered += 1
+
+    relays = []
+    for _ in range(subscribers):
+        websocket = WebSocket({"type": "websocket", "path": "/feed", "headers": []}, receive, send)
+        relays.append(asyncio.ensure_future(websocket.relay(channel.subscribe())))
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    for _ in range(messages):
+        channel.publish(MESSAGE)
+        # Let the relays drain before the next message, as a paced feed would.
+        await asyncio.sleep(0)
+    while delivered < subscribers * messages:
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    channel.close()
+    await asyncio.gather(*relays)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_broadcast")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'subscribers':>12} {'msg/s':>10} {'deliveries/s':>14} {'us/delivery':>12}")
+    for subscribers in args.subscribers:
+        elapsed = asyncio.run(measure(subscribers, args.messages))
+        deliveries = subscribers * args.messages
+        print(
+            f"{subscribers:>12} {args.messages / elapsed:>10.0f} {deliveries / elapsed:>14.0f} "
+            f"{elapsed / deliveries * 1e6:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_csrf.py
+#
+# Per-request cost of the CSRF check on the GET and POST paths, for the
+# previous hash-both-tokens check and the current plain/signed modes.
+#
+#     python -m benchmarks.bench_csrf
+import asyncio
+import hashlib
+import os
+import secrets
+import time
+
+from xylen.middleware.csrf import CSRFMiddleware
+
+REQUESTS = 50000
+
+
+class LegacyCSRFCheck:
+    """The previous check: SHA-256 of both tokens, compared with ``!=``."""
+
+    def __init__(self, secret_key):
+        self.secret_key = secret_key
+
+    async def before_request(self, scope):
+        headers = dict(scope["headers"])
+        cookies = {}
+        for pair in headers.get(b"cookie", b"").decode().split(";"):
+            if "=" in pair:
+                k, v = pair.strip().split("=", 1)
+                cookies[k] = v
+        token = cookies.get("csrftoken") or secrets.token_urlsafe(32)
+        if scope["method"] in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            return None
+        expected = hashlib.sha256((token + self.secret_key).encode()).hexdigest()
+        submitted = headers.get(b"x-csrf-token", b"").decode()
+        if hashlib.sha256((submitted + self.secret_key).encode()).hexdigest() != expected:
+            return "403"
+        return None
+
+
+async def run(check, method, token):
+    headers = [
+        (b"cookie", f"csrftoken={token}; session=abc".encode()),
+        (b"x-csrf-token", token.encode()),
+        (b"accept", b"*/*"),
+    ]
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        scope = {"type": "http", "method": method, "path": "/submit", "headers": headers}
+        assert await check.before_request(scope) is None
+    return (time.perf_counter() - start) / REQUESTS * 1e9
+
+
+def main():
+    secret = os.urandom(16).hex()
+    plain = CSRFMiddleware(secret_key=secret)
+    signed = CSRFMiddleware(secret_key=secret, signed=True)
+    checks = {
+        "legacy": (LegacyCSRFCheck(secret), secrets.token_urlsafe(32)),
+        "plain": (plain, plain.mint_token()),
+        "signed": (signed, signed.mint_token()),
+    }
+    print(f"{'mode':>8} {'GET ns':>8} {'POST ns':>8}")
+    for name, (check, token) in checks.items():
+        get = min(asyncio.run(run(check, "GET", token)) for _ in range(3))
+        post = min(asyncio.run(run(check, "POST", token)) for _ in range(3))
+        print(f"{name:>8} {get:>8.0f} {post:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# benchmarks/bench_middleware.py
+#
+# Full security stack (CORS + CSRF + rate limit) as Xylen's fused pipeline,
+# versus the same hook middlewares nested as separate ASGI apps, versus the
+# previous standalone ASGI middlewares (reproduced below).
+#
+#     python -m benchmarks.bench_middleware
+import asyncio
+import hashlib
+import secrets
+import time
+from collections import defaultdict, deque
+
+from xylen import Xylen
+from xylen.middleware.cors import CORSMiddleware
+from xylen.middleware.csrf import CSRFMiddleware
+from xylen.middleware.rate_limit import RateLimitMiddleware
+
+REQUESTS = 20000
+
+
+class LegacyCORSMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.allow_origins = {"*"}
+        self.allow_methods = {"*"}
+        self.allow_headers = {"*"}
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get("headers", []))
+        origin = headers.get(b"origin", b"").decode()
+        cors_headers = self._build_cors_headers(origin)
+
+        async def wrapped_send(event):
+            if event["type"] == "http.response.start":
+                existing = dict(event.get("headers", []))
+                existing.update(cors_headers)
+                event["headers"] = list(existing.items())
+            await send(event)
+
+        await self.app(scope, receive, wrapped_send)
+
+    def _build_cors_headers(self, origin):
+        headers = {}
+        if "*" in self.allow_origins or origin in self.allow_origins:
+            headers[b"access-control-allow-origin"] = origin.encode() if origin else b"*"
+        if "*" in self.allow_methods:
+            headers[b"access-control-allow-methods"] = b"GET, POST, PUT, PATCH, DELETE, OPTIONS"
+        else:
+            headers[b"access-control-allow-methods"] = ", ".join(sorted(self.allow_methods)).encode()
+        if "*" in self.allow_headers:
+            headers[b"access-control-allow-headers"] = b"*"
+        else:
+            headers[b"access-control-allow-headers"] = ", ".join(sorted(self.allow_headers)).encode()
+        return headers
+
+
+class LegacyCSRFMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.secret_key = "bench"
+        self.cookie_name = "csrftoken"
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get("headers", []))
+        cookies_raw = headers.get(b"cookie", b"").decode()
+        cookies = {}
+        for pair in cookies_raw.split(";"):
+            if "=" in pair:
+                k, v = pair.strip().split("=", 1)
+                cookies[k] = v
+        csrf_token = cookies.get(self.cookie_name) or secrets.token_urlsafe(32)
+        if scope["method"] not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            hashlib.sha256((csrf_token + self.secret_key).encode()).hexdigest()
+
+        async def wrapped_send(event):
+            if event["type"] == "http.response.start":
+                has_cookie = any(
+                    h[0].decode() == "set-cookie" and self.cookie_name in h[1].decode()
+                    for h in event.get("headers", [])
+                )
+                if not has_cookie:
+                    cookie_value = f"{self.cookie_name}={csrf_token}; Path=/; SameSite=Lax; HttpOnly"
+                    event["headers"] = list(event.get("headers", [])) + [(b"set-cookie", cookie_value.encode())]
+            await send(event)
+
+        await self.app(scope, receive, wrapped_send)
+
+
+class LegacyRateLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.max_requests = 10**9
+        self.window_seconds = 60
+        self._requests = defaultdict(deque)
+
+    async def __call__(self, scope, receive, send):
+        now = time.time()
+        bucket = self._requests[scope["client"][0]]
+        while bucket and bucket[0] < now - self.window_seconds:
+            bucket.popleft()
+        bucket.append(now)
+        await self.app(scope, receive, send)
+
+
+def build_app():
+    app = Xylen(
+        cors=True,
+        csrf=True,
+        csrf_config={"secret_key": "bench"},
+        rate_limit=True,
+        rate_limit_config={"max_requests": 10**9},
+    )
+
+    @app.route("/ping", methods=["GET"])
+    async def ping(request):
+        return {"pong": True}
+
+    return app
+
+
+def nested(app):
+    inner = RateLimitMiddleware(
+        app._inner_app, max_requests=10**9, router=app.router
+    )
+    return CORSMiddleware(CSRFMiddleware(inner, secret_key="bench"))
+
+
+def legacy(app):
+    return LegacyCORSMiddleware(LegacyCSRFMiddleware(LegacyRateLimitMiddleware(app._inner_app)))
+
+
+async def drive(asgi_app, requests):
+    headers = [
+        (b"origin", b"https://client.example"),
+        (b"cookie", b"csrftoken=abc; session=xyz"),
+        (b"accept", b"application/json"),
+        (b"user-agent", b"bench"),
+    ]
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(event):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/ping",
+            "query_string": b"",
+            "headers": headers,
+            "client": ("127.0.0.1", 5000),
+        }
+        await asgi_app(scope, receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    app = build_app()
+    stacks = {
+        "fused pipeline": app,
+        "nested hooks": nested(app),
+        "legacy nested": legacy(app),
+    }
+    # Interleave the stacks so machine noise hits all of them alike.
+    timings = {name: [] for name in stacks}
+    for _ in range(5):
+        for name, asgi_app in stacks.items():
+            timings[name].append(asyncio.run(drive(asgi_app, REQUESTS)))
+    for name, samples in timings.items():
+        print(f"{name:>16}: {min(samples):6.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
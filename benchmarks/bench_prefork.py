@@ -0,0 +1,118 @@
+# benchmarks/bench_prefork.py
+#
+# Per-worker memory of pre-forked workers sharing a preloaded app (with
+# and without gc.freeze) against workers that each import the app from
+# scratch, as `uvicorn --workers N` does.
+#
+#     python -m benchmarks.bench_prefork [--workers 4] [--routes 2000]
+import argparse
+import asyncio
+import gc
+import multiprocessing
+import os
+import time
+
+from xylen import Xylen
+from xylen.bench import Target, run_benchmark
+from xylen.supervisor import memory_usage
+
+
+def build_app(routes):
+    app = Xylen()
+    # Stand-in for the module-level state of a real app: lookup tables,
+    # compiled templates, config...
+    app.state_tables = [{"id": i, "name": f"item-{i}", "tags": [str(i)] * 4} for i in range(routes * 20)]
+
+    for i in range(routes):
+        async def handler(request, item_id, _i=i):
+            return {"route": _i, "id": item_id}
+
+        app.add_route(f"/r{i}/{{item_id:int}}", handler, methods=["GET"])
+    return app
+
+
+def work(app, ready, done):
+    """Serve some traffic and collect, as a live worker would, then park."""
+    asyncio.run(run_benchmark(app, [Target("/r1/5"), Target("/r7/1")], requests=2000, concurrency=16, warmup=0))
+    gc.collect()
+    ready.set()
+    done.wait()
+
+
+def spawned_worker(routes, ready, done):
+    work(build_app(routes), ready, done)
+
+
+def measure(start_workers, workers):
+    ready = [multiprocessing.get_context("spawn").Event() for _ in range(workers)]
+    done = multiprocessing.get_context("spawn").Event()
+    pids = start_workers(ready, done)
+    for event in ready:
+        event.wait(120)
+    time.sleep(0.2)
+    usage = [memory_usage(pid) for pid in pids]
+    done.set()
+    for pid in pids:
+        os.waitpid(pid, 0)
+    if None in usage:
+        return None
+    return {key: sum(u[key] for u in usage) / workers for key in ("rss", "pss", "private")}
+
+
+def forked(app, workers, freeze):
+    def start(ready, done):
+        if freeze:
+            gc.collect()
+            gc.freeze()
+        pids = []
+        for event in ready:
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    work(app, event, done)
+                finally:
+                    os._exit(0)
+            pids.append(pid)
+        if freeze:
+            gc.unfreeze()
+        return pids
+
+    return start
+
+
+def spawned(routes, workers):
+    context = multiprocessing.get_context("spawn")
+
+    def start(ready, done):
+        processes = [context.Process(target=spawned_worker, args=(routes, event, done)) for event in ready]
+        for process in processes:
+            process.start()
+        return [process.pid for process in processes]
+
+    return start
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_prefork")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--routes", type=int, default=2000)
+    args = parser.parse_args()
+
+    if memory_usage(os.getpid()) is None:
+        print("needs /proc/<pid>/smaps_rollup (Linux)")
+        return
+
+    app = build_app(args.routes)
+    modes = [
+        ("import per worker", spawned(args.routes, args.workers)),
+        ("fork", forked(app, args.workers, freeze=False)),
+        ("fork+gc.freeze", forked(app, args.workers, freeze=True)),
+    ]
+    print(f"{'per worker':<20}{'rss kB':>10}{'pss kB':>10}{'private kB':>12}")
+    for name, start in modes:
+        result = measure(start, args.workers)
+        print(f"{name:<20}{result['rss']:>10.0f}{result['pss']:>10.0f}{result['private']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_rate_limit.py
+#
+# Memory and per-hit latency of each rate limit algorithm across many
+# distinct client keys.
+#
+#     python -m benchmarks.bench_rate_limit [--keys 1000000]
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from xylen.middleware.rate_limit import ALGORITHMS, RateLimitMiddleware
+
+
+async def fill(limiter, keys, hits_per_key):
+    hit = limiter.hit
+    now = 1000.0
+    for _ in range(hits_per_key):
+        for key in keys:
+            await hit(key, now=now)
+        now += 0.001
+
+
+def measure(algorithm, keys, hits_per_key):
+    limiter = RateLimitMiddleware(None, max_requests=1000, window_seconds=60, algorithm=algorithm)
+    start = time.perf_counter()
+    asyncio.run(fill(limiter, keys, hits_per_key))
+    elapsed = time.perf_counter() - start
+    latency_ns = elapsed / (len(keys) * hits_per_key) * 1e9
+    del limiter
+    gc.collect()
+
+    limiter = RateLimitMiddleware(None, max_requests=1000, window_seconds=60, algorithm=algorithm)
+    tracemalloc.start()
+    asyncio.run(fill(limiter, keys, hits_per_key))
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latency_ns, memory
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--hits-per-key", type=int, default=3)
+    args = parser.parse_args()
+
+    keys = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.keys)]
+    print(f"{args.keys} keys x {args.hits_per_key} hits")
+    print(f"{'algorithm':>16} {'ns/hit':>8} {'MiB':>8} {'bytes/key':>10}")
+    for algorithm in ALGORITHMS:
+        latency_ns, memory = measure(algorithm, keys, args.hits_per_key)
+        print(
+            f"{algorithm:>16} {latency_ns:>8.0f} {memory / 2**20:>8.1f} "
+            f"{memory / args.keys:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_router.py
+#
+# Compare the compiled trie Router against the previous linear scan.
+#
+#     python -m benchmarks.bench_router
+import timeit
+
+from xylen.router import Route, Router
+
+
+class LinearRouter:
+    """The pre-trie Router: checks every route on every lookup."""
+
+    def __init__(self):
+        self.routes = []
+
+    def add_route(self, path, handler, methods):
+        self.routes.append(Route(path, handler, methods))
+
+    def resolve(self, path: str, method: str):
+        clean_path = path.strip("/")
+        path_parts = clean_path.split("/") if clean_path else []
+
+        for route in self.routes:
+            if method not in route.methods:
+                continue
+            if len(path_parts) != len(route.segments):
+                continue
+
+            kwargs = {}
+            match = True
+            for i, seg in enumerate(route.segments):
+                actual = path_parts[i]
+                if seg is None:
+                    name, converter = route.kwargs[i]
+                    try:
+                        kwargs[name] = converter(actual)
+                    except (ValueError, TypeError):
+                        match = False
+                        break
+                elif seg != actual:
+                    match = False
+                    break
+
+            if match:
+                return route.handler, kwargs
+
+        return None, {}
+
+
+def handler(request, **kwargs):
+    return kwargs
+
+
+def build(router_cls, size):
+    """Register ``size`` routes, half static and half with converters."""
+    router = router_cls()
+    paths = []
+    for i in range(size):
+        if i % 2:
+            router.add_route(f"/api/v1/resource{i}/{{item_id:int}}", handler, ["GET"])
+            paths.append(f"/api/v1/resource{i}/{i * 7}")
+        else:
+            router.add_route(f"/api/v1/resource{i}/list", handler, ["GET", "POST"])
+            paths.append(f"/api/v1/resource{i}/list")
+    paths.append("/api/v1/missing/route")
+    return router, paths
+
+
+def bench(router_cls, size, number):
+    router, paths = build(router_cls, size)
+    resolve = router.resolve
+
+    def run():
+        for path in paths:
+            resolve(path, "GET")
+
+    best = min(timeit.repeat(run, number=number, repeat=5))
+    return best / (number * len(paths)) * 1e9
+
+
+def main():
+    print(f"{'routes':>8} {'linear ns/op':>14} {'trie ns/op':>12} {'speedup':>9}")
+    for size, number in ((10, 2000), (100, 100), (1000, 2)):
+        linear = bench(LinearRouter, size, number)
+        trie = bench(Router, size, number)
+        print(f"{size:>8} {linear:>14.0f} {trie:>12.0f} {linear / trie:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
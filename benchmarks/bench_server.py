@@ -0,0 +1,128 @@
+# benchmarks/bench_server.py
+#
+# Serve the same app with the native server and with uvicorn (when it is
+# installed) in a child process, and drive each over keep-alive sockets.
+#
+#     python -m benchmarks.bench_server [--connections 32] [--requests 20000]
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+
+from xylen import Xylen
+from xylen.bench import percentile
+
+REQUEST = b"GET /hello HTTP/1.1\r\nHost: bench\r\n\r\n"
+
+
+def build_app():
+    app = Xylen()
+
+    @app.route("/hello", methods=["GET"])
+    async def hello(request):
+        return {"message": "Hello from Xylen!"}
+
+    return app
+
+
+def serve(server, port):
+    app = build_app()
+    if server == "native":
+        from xylen.server import run
+
+        run(app, "127.0.0.1", port)
+    else:
+        import uvicorn
+
+        uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+        else:
+            writer.close()
+            return
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line[:15].lower() == b"content-length:":
+            length = int(line[15:])
+    await reader.readexactly(length)
+
+
+async def connection(port, count, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for _ in range(count):
+        start = time.perf_counter()
+        writer.write(REQUEST)
+        await read_response(reader)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def load(port, connections, requests):
+    await wait_for_port(port)
+    await asyncio.gather(*[connection(port, 200, []) for _ in range(connections)])  # warm-up
+    latencies = []
+    per_connection = requests // connections
+    start = time.perf_counter()
+    await asyncio.gather(*[connection(port, per_connection, latencies) for _ in range(connections)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, percentile(latencies, 0.50) * 1000, percentile(latencies, 0.99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_server")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--serve", choices=["native", "uvicorn"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    servers = ["native"]
+    try:
+        import uvicorn  # noqa: F401
+    except ImportError:
+        print("uvicorn not installed: benchmarking the native server only")
+    else:
+        servers.append("uvicorn")
+
+    print(f"{'server':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for server in servers:
+        port = free_port()
+        child = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_server", "--serve", server, "--port", str(port)]
+        )
+        try:
+            rps, p50, p99 = asyncio.run(load(port, args.connections, args.requests))
+        finally:
+            child.terminate()
+            child.wait()
+        print(f"{server:<10}{rps:>10.0f}{p50:>10.3f}{p99:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/scenarios.py
+#
+# Preset apps for the in-process benchmark suite.  Each scenario returns
+# ``(app, targets)``.
+from xylen import Xylen
+from xylen.bench import Target
+from xylen.response import JSONResponse, StreamingResponse
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(factory):
+        SCENARIOS[name] = factory
+        return factory
+
+    return register
+
+
+def _router_app(size):
+    app = Xylen()
+    for i in range(size):
+        app.add_route(f"/api/v1/resource{i}/list", _ok)
+        app.add_route(f"/api/v1/resource{i}/{{item_id:int}}", _item)
+    last = size - 1
+    return app, [
+        Target(f"/api/v1/resource{last}/list", name="static"),
+        Target(f"/api/v1/resource{last}/42", name="dynamic"),
+        Target("/api/v1/missing", name="not found"),
+    ]
+
+
+async def _ok(request):
+    return {"ok": True}
+
+
+async def _item(request, item_id: int):
+    return {"id": item_id}
+
+
+for _size in (10, 100, 1000):
+    scenario(f"router-{_size}")(lambda size=_size: _router_app(size))
+
+
+def _middleware_app(**config):
+    app = Xylen(**config)
+    app.add_route("/ping", _ok)
+    headers = {"Origin": "https://client.example", "Cookie": "csrftoken=bench-token"}
+    return app, [Target("/ping", headers=headers, name="ping")]
+
+
+@scenario("middleware-none")
+def middleware_none():
+    return _middleware_app()
+
+
+@scenario("middleware-cors")
+def middleware_cors():
+    return _middleware_app(cors=True)
+
+
+@scenario("middleware-full")
+def middleware_full():
+    return _middleware_app(
+        cors=True,
+        csrf=True,
+        csrf_config={"secret_key": "bench"},
+        rate_limit=True,
+        rate_limit_config={"max_requests": 10**9, "algorithm": "token_bucket"},
+    )
+
+
+def _json_app(items):
+    payload = {"items": [{"id": i, "name": f"item-{i}", "tags": ["a", "b"], "price": i * 1.5} for i in range(items)]}
+    app = Xylen()
+    encoded_payload = app.json_encoder(payload)
+
+    @app.route("/data")
+    async def data(request):
+        return payload
+
+    @app.route("/data/encoded")
+    async def encoded(request):
+        return JSONResponse(encoded_payload)
+
+    return app, [Target("/data", name="encode"), Target("/data/encoded", name="pre-encoded")]
+
+
+for _name, _items in (("small", 1), ("medium", 100), ("large", 10000)):
+    scenario(f"json-{_name}")(lambda items=_items: _json_app(items))
+
+
+@scenario("streaming")
+def streaming():
+    chunk = b"x" * 65536
+    app = Xylen()
+
+    @app.route("/stream")
+    async def stream(request):
+        async def body():
+            for _ in range(16):
+                yield chunk
+
+        return StreamingResponse(body(), headers={"content-type": "application/octet-stream"})
+
+    @app.route("/buffered")
+    async def buffered(request):
+        return JSONResponse(chunk * 16)
+
+    return app, [Target("/stream", name="1MiB streamed"), Target("/buffered", name="1MiB buffered")]
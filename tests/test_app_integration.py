@@ -1,8 +1,8 @@
 # tests/test_app_integration.py
-from zephyrpy import zephyrpy, TestClient
+from xylen import Xylen, TestClient
 
 def test_full_app():
-    app = zephyrpy(
+    app = Xylen(
         cors=True,
         cors_config={"allow_origins": ["*"]},
         rate_limit=False
@@ -23,4 +23,57 @@ def test_full_app():
     resp = client.get("/user/42", headers={"Origin": "http://localhost:3000"})
     assert resp.status_code == 200
     assert resp.json()["id"] == 42
-    assert "access-control-allow-origin" in resp.headers 
\ No newline at end of file
+    assert "access-control-allow-origin" in resp.headers 
+
+def test_method_not_allowed():
+    app = Xylen()
+
+    @app.route("/items", methods=["GET"])
+    def list_items(request):
+        return {"items": []}
+
+    client = TestClient(app)
+    resp = client.post("/items", json={"name": "x"})
+    assert resp.status_code == 405
+    assert resp.headers["allow"] == "GET"
+    assert client.get("/nothing").status_code == 404
+
+
+def test_generator_handlers_are_streamed():
+    app = Xylen()
+
+    @app.route("/export.csv", methods=["GET"])
+    def export(request):
+        yield "id,name\n"
+        for i in range(3):
+            yield f"{i},user{i}\n"
+
+    @app.route("/report", methods=["GET"])
+    async def report(request):
+        for part in (b"a", b"b"):
+            yield part
+
+    client = TestClient(app)
+    assert client.get("/export.csv").text == "id,name\n0,user0\n1,user1\n2,user2\n"
+    assert client.get("/report").text == "ab"
+
+
+def test_custom_json_codec():
+    import json
+
+    calls = []
+
+    def encoder(data):
+        calls.append(data)
+        return json.dumps(data, sort_keys=True).encode()
+
+    app = Xylen(json_encoder=encoder, json_decoder=lambda raw: {"decoded": json.loads(raw)})
+
+    @app.route("/echo", methods=["POST"])
+    async def echo(request):
+        return await request.json()
+
+    client = TestClient(app)
+    resp = client.post("/echo", json={"b": 1})
+    assert resp.text == '{"decoded": {"b": 1}}'
+    assert calls == [{"decoded": {"b": 1}}]
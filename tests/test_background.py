@@ -0,0 +1,93 @@
+# tests/test_background.py
+import asyncio
+
+from xylen import Xylen, TestClient
+from xylen.background import BackgroundTasks
+from xylen.response import PlainTextResponse
+
+
+def test_tasks_run_after_the_response():
+    app = Xylen()
+    log = []
+
+    async def audit(event):
+        log.append(event)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    @app.route("/injected", methods=["POST"])
+    async def injected(request, background):
+        background.add_task(fail)
+        background.add_task(audit, "injected")
+        return {"ok": True}
+
+    @app.route("/attached/{name}", methods=["GET"])
+    def attached(request, name):
+        tasks = BackgroundTasks()
+        tasks.add_task(log.append, name)
+        return PlainTextResponse("ok", background=tasks)
+
+    async def main():
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(event):
+            sent.append(event)
+            if event["type"] == "http.response.body" and not event.get("more_body"):
+                log.append("response sent")
+
+        scope = {"type": "http", "method": "POST", "path": "/injected", "query_string": b"", "headers": []}
+        await app(scope, receive, send)
+        return sent
+
+    sent = asyncio.run(main())
+    assert sent[0]["status"] == 200
+    assert log == ["response sent", "injected"]
+
+    assert TestClient(app).get("/attached/sync").text == "ok"
+    assert log[-1] == "sync"
+    assert (app.background.completed, app.background.failed) == (2, 1)
+
+
+def test_bounded_queue_defers_tasks():
+    app = Xylen(background_queue_size=2, background_concurrency=1)
+    done = []
+
+    @app.route("/job/{n:int}", methods=["GET"])
+    async def job(request, n, background):
+        background.add_task(slow, n)
+        return "queued"
+
+    async def slow(n):
+        await asyncio.sleep(0.01)
+        done.append(n)
+
+    async def request(n):
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(event):
+            sent.append(event)
+
+        scope = {"type": "http", "method": "GET", "path": f"/job/{n}", "query_string": b"", "headers": []}
+        await app(scope, receive, send)
+        return sent[0]["status"]
+
+    async def main():
+        statuses = await asyncio.gather(*(request(n) for n in range(6)))
+        # Every request has returned while some of their tasks are still queued.
+        assert len(done) < 6
+        pending = app.background.pending
+        await app.background.shutdown()
+        return statuses, pending
+
+    statuses, pending = asyncio.run(main())
+    assert statuses == [200] * 6
+    assert 0 < pending <= 2
+    assert sorted(done) == list(range(6))
+    assert app.background.waited > 0
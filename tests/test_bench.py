@@ -0,0 +1,54 @@
+# tests/test_bench.py
+import asyncio
+
+from xylen import Xylen
+from xylen.bench import Target, compare, percentile, run_benchmark
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile(values, 0.999) == 100
+    assert percentile([], 0.5) == 0.0
+
+
+def test_target_parse():
+    target = Target.parse("POST /items?page=2")
+    assert target.method == "POST"
+    assert target.path == "/items"
+    assert target.query_string == b"page=2"
+    assert Target.parse("/health").method == "GET"
+
+
+def test_run_benchmark_reports_each_target():
+    app = Xylen()
+
+    @app.route("/ok")
+    async def ok(request):
+        return {"ok": True}
+
+    @app.route("/boom")
+    async def boom(request):
+        raise RuntimeError("boom")
+
+    report = asyncio.run(run_benchmark(
+        app, [Target("/ok"), Target("/boom"), Target("/missing")],
+        requests=50, concurrency=4, warmup=5, trace_memory=True,
+    ))
+    ok = report["results"]["GET /ok"]
+    assert ok["requests"] == 50
+    assert ok["errors"] == 0
+    assert ok["rps"] > 0
+    assert ok["p50_ms"] <= ok["p99_ms"] <= ok["p999_ms"]
+    assert ok["alloc_peak_kb"] is not None
+    assert report["results"]["GET /boom"]["errors"] == 50
+    assert report["results"]["GET /missing"]["non_2xx"] == 50
+
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"GET /": {"rps": 1000, "p50_ms": 1.0, "p99_ms": 2.0}}}
+    fast = {"results": {"GET /": {"rps": 950, "p50_ms": 1.05, "p99_ms": 2.1}}}
+    slow = {"results": {"GET /": {"rps": 800, "p50_ms": 1.0, "p99_ms": 3.0}}}
+    assert compare(fast, baseline, 0.10) == []
+    assert len(compare(slow, baseline, 0.10)) == 2
@@ -0,0 +1,35 @@
+# tests/test_cli.py
+import subprocess
+import sys
+
+from xylen.cli import format_importtime, parse_importtime, resolve_import_string
+
+
+def test_resolve_import_string_does_not_import(tmp_path):
+    module = tmp_path / "cli_probe_app.py"
+    module.write_text("raise RuntimeError('imported')\n")
+
+    assert resolve_import_string(f"{module}:app") == "cli_probe_app:app"
+    assert "cli_probe_app" not in sys.modules
+
+
+def test_parse_importtime():
+    text = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     _json\n"
+        "import time:       300 |        420 |   json\n"
+        "import time:      1000 |       1420 | myapp\n"
+        "Traceback (most recent call last):\n"
+    )
+    entries = parse_importtime(text)
+    assert entries == [("_json", 120, 120, 2), ("json", 300, 420, 1), ("myapp", 1000, 1420, 0)]
+
+    report = format_importtime(entries, top=1).splitlines()
+    assert report[1].split() == ["myapp", "1.0", "1.4"]
+    assert report[-1] == "3 modules, 1.4 ms importing"
+
+
+def test_testclient_is_imported_lazily():
+    code = "import sys, xylen; print('xylen.testclient' in sys.modules); xylen.TestClient"
+    output = subprocess.check_output([sys.executable, "-c", code], universal_newlines=True)
+    assert output.strip() == "False"
@@ -0,0 +1,59 @@
+# tests/test_concurrency.py
+import asyncio
+import threading
+import time
+
+from xylen import Xylen, TestClient
+from xylen.concurrency import ThreadPool
+
+
+def test_sync_handlers_run_in_thread_pool():
+    app = Xylen(thread_pool_size=2)
+    main_thread = threading.get_ident()
+
+    @app.route("/blocking", methods=["GET"])
+    def blocking(request):
+        return {"main": threading.get_ident() == main_thread}
+
+    @app.route("/trivial", methods=["GET"], run_in_thread=False)
+    def trivial(request):
+        return {"main": threading.get_ident() == main_thread}
+
+    client = TestClient(app)
+    assert client.get("/blocking").json() == {"main": False}
+    assert client.get("/trivial").json() == {"main": True}
+    assert app.thread_pool.stats()["completed"] == 1
+
+
+def test_blocking_handlers_do_not_stall_the_loop():
+    app = Xylen(thread_pool_size=4)
+
+    @app.route("/sleep", methods=["GET"])
+    def sleep(request):
+        time.sleep(0.1)
+        return {"ok": True}
+
+    client = TestClient(app)
+
+    async def burst():
+        return await asyncio.gather(*[client._make_request("GET", "/sleep") for _ in range(4)])
+
+    start = time.perf_counter()
+    responses = asyncio.run(burst())
+    assert [r.status_code for r in responses] == [200] * 4
+    assert time.perf_counter() - start < 0.35
+
+
+def test_thread_pool_saturation_stats():
+    pool = ThreadPool(max_workers=1)
+
+    async def run():
+        await asyncio.gather(*[pool.run(time.sleep, 0.02) for _ in range(3)])
+
+    asyncio.run(run())
+    stats = pool.stats()
+    assert stats["submitted"] == stats["completed"] == 3
+    assert stats["saturated"] == 2
+    assert stats["peak_in_flight"] == 3
+    assert stats["wait_time_max"] >= 0.02
+    pool.shutdown()
@@ -0,0 +1,42 @@
+# tests/test_datastructures.py
+from xylen.datastructures import Headers, QueryParams, parse_cookies
+from xylen.request import Request
+
+
+def make_scope(headers, query_string=b""):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "query_string": query_string,
+        "headers": headers,
+    }
+
+
+def test_headers_case_insensitive_multi():
+    headers = Headers([(b"accept", b"text/html"), (b"x-tag", b"a"), (b"x-tag", b"b")])
+    assert headers["accept"] == "text/html"
+    assert headers["ACCEPT"] == "text/html"
+    assert headers.getlist("x-tag") == ["a", "b"]
+    assert headers.get_raw(b"x-tag") == b"a"
+    assert "X-TAG" in headers
+    assert headers.get("missing") is None
+    assert len(headers) == 2
+
+
+def test_headers_cached_on_scope():
+    scope = make_scope([(b"cookie", b"session=abc; theme=dark")], b"q=1&q=2&page=3")
+    request = Request(scope, None)
+    assert Headers.from_scope(scope) is request.headers
+    assert request.cookies == {"session": "abc", "theme": "dark"}
+    assert request.query_params["page"] == "3"
+    assert request.query_params.getlist("q") == ["1", "2"]
+
+
+def test_query_params_blank_values():
+    params = QueryParams(b"a=&b=2")
+    assert dict(params) == {"a": "", "b": "2"}
+
+
+def test_parse_cookies_ignores_malformed_pairs():
+    assert parse_cookies(b"a=1; broken; b = 2 ") == {"a": "1", "b": "2"}
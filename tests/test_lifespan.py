@@ -0,0 +1,65 @@
+# tests/test_lifespan.py
+import asyncio
+import contextlib
+
+from xylen import Xylen
+from xylen.server import Lifespan
+
+
+def test_lifespan_hooks_state_and_warmup():
+    events = []
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        events.append("enter")
+        yield {"pool": "connected"}
+        events.append("exit")
+
+    app = Xylen(lifespan=lifespan, warmup=["/items?warm=1"])
+
+    @app.on_startup
+    def open_cache():
+        app.state.cache = {}
+        events.append("startup")
+
+    @app.on_shutdown
+    async def close_cache():
+        events.append("shutdown")
+
+    @app.route("/items", methods=["GET"])
+    async def items(request):
+        events.append(("request", request.query_params.get("warm"), request.app.state.pool))
+        return {"ok": True}
+
+    async def main():
+        lifespan = Lifespan(app)
+        await lifespan.startup()
+        assert lifespan.supported
+        assert app._openapi_content is not None
+        assert app.thread_pool.executor is not None  # created lazily; shutdown stops it
+        await lifespan.shutdown()
+
+    asyncio.run(main())
+    assert events == ["enter", "startup", ("request", "1", "connected"), "shutdown", "exit"]
+    assert app.state.cache == {}
+    assert app.thread_pool._executor is None
+
+
+def test_failed_warmup_fails_startup():
+    app = Xylen(warmup=["/missing"])
+    sent = []
+
+    async def main():
+        messages = [{"type": "lifespan.startup"}]
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await app({"type": "lifespan"}, receive, send)
+
+    asyncio.run(main())
+    assert sent[0]["type"] == "lifespan.startup.failed"
+    assert "/missing returned 404" in sent[0]["message"]
@@ -0,0 +1,102 @@
+# tests/test_metrics.py
+import json
+import os
+
+from xylen import Xylen, TestClient
+from xylen.metrics import Metrics, render_prometheus
+
+
+def test_metrics_are_recorded_per_route_template():
+    app = Xylen(metrics=True, metrics_config={"path": "/_metrics"})
+
+    @app.route("/users/{user_id:int}", methods=["GET"])
+    async def user(request, user_id):
+        return {"id": user_id}
+
+    @app.route("/boom", methods=["GET"])
+    async def boom(request):
+        raise ValueError("nope")
+
+    client = TestClient(app)
+    client.get("/users/1")
+    client.get("/users/2")
+    assert client.get("/boom").status_code == 500
+    client.get("/missing/path")
+
+    response = client.get("/_metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    labels = 'route="/users/{user_id:int}",method="GET"'
+    assert f'xylen_requests_total{{{labels},status="2xx"}} 2' in text
+    assert f"xylen_request_duration_seconds_count{{{labels}}} 2" in text
+    assert f'xylen_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"xylen_requests_in_flight{{{labels}}} 0" in text
+    assert 'xylen_requests_total{route="/boom",method="GET",status="5xx"} 1' in text
+    assert 'xylen_exceptions_total{route="/boom",method="GET",exception="ValueError"} 1' in text
+    assert 'xylen_requests_total{route="<unmatched>",method="GET",status="4xx"} 1' in text
+    assert "/missing/path" not in text
+
+
+def test_metrics_disabled_by_default():
+    app = Xylen()
+    assert app.metrics is None
+    assert TestClient(app).get("/metrics").status_code == 404
+
+
+def test_metrics_histogram_is_cumulative():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    record = {
+        "route": "/x",
+        "method": "GET",
+        "requests": 3,
+        "statuses": [0, 3, 0, 0, 0],
+        "in_flight": 0,
+        "buckets": [1, 1, 1],
+        "sum": 2.5,
+        "exceptions": {},
+    }
+    text = render_prometheus([record], metrics.buckets)
+    assert 'le="0.1"} 1' in text
+    assert 'le="1.0"} 2' in text
+    assert 'le="+Inf"} 3' in text
+
+
+def test_aggregate_mode_sums_worker_snapshots(tmp_path):
+    config = {"mode": "aggregate", "directory": str(tmp_path)}
+    app = Xylen(metrics=True, metrics_config=config)
+
+    @app.route("/ping", methods=["GET"])
+    async def ping(request):
+        return "pong"
+
+    client = TestClient(app)
+    client.get("/ping")
+
+    # A snapshot left by another (exited) worker is merged into the totals.
+    other = Metrics(**config)
+    other.register(app.router.routes[-1])
+    series = other.snapshot()
+    series["series"][0]["requests"] = 4
+    series["series"][0]["statuses"][1] = 4
+    series["series"][0]["in_flight"] = 7
+    (tmp_path / "999999999.json").write_text(json.dumps(series))
+
+    text = client.get("/metrics").text
+    assert 'xylen_requests_total{route="/ping",method="GET",status="2xx"} 5' in text
+    assert 'xylen_requests_in_flight{route="/ping",method="GET"} 0' in text
+    assert f"{os.getpid()}.json" in os.listdir(tmp_path)
+
+
+def test_thread_pool_saturation_is_exported():
+    app = Xylen(metrics=True, thread_pool_size=1)
+
+    @app.route("/sync", methods=["GET"])
+    def sync(request):
+        return "ok"
+
+    client = TestClient(app)
+    client.get("/sync")
+    text = client.get("/metrics").text
+    assert "# TYPE xylen_thread_pool_saturated_total counter" in text
+    assert "xylen_thread_pool_submitted_total 1" in text
+    assert "xylen_thread_pool_max_workers 1" in text
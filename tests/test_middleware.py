@@ -1,10 +1,10 @@
 # tests/test_middleware.py
 import pytest
-from zephyrpy.app import zephyrpy
-from zephyrpy.testclient import TestClient
+from xylen.app import Xylen
+from xylen.testclient import TestClient
 
 def test_cors_middleware():
-    app = zephyrpy(cors=True, cors_config={"allow_origins": ["*"]})
+    app = Xylen(cors=True, cors_config={"allow_origins": ["*"]})
     
     @app.route("/test", methods=["GET"])
     def handler(request):
@@ -18,11 +18,11 @@ def test_cors_middleware():
 
 def test_rate_limiting(monkeypatch):
     # Mock time to simulate multiple requests over time
-    from zephyrpy.middleware.rate_limit import RateLimitMiddleware
+    from xylen.middleware.rate_limit import RateLimitMiddleware
     times = iter([1000.0, 1000.1, 1000.2])
-    monkeypatch.setattr("zephyrpy.middleware.rate_limit.time.time", lambda: next(times))
+    monkeypatch.setattr("xylen.middleware.rate_limit.time.time", lambda: next(times))
 
-    app = zephyrpy(rate_limit=True, rate_limit_config={"max_requests": 2, "window_seconds": 10})
+    app = Xylen(rate_limit=True, rate_limit_config={"max_requests": 2, "window_seconds": 10})
 
     @app.route("/limited", methods=["GET"])
     def handler(request):
@@ -31,4 +31,410 @@ def test_rate_limiting(monkeypatch):
     client = TestClient(app)
     assert client.get("/limited").status_code == 200
     assert client.get("/limited").status_code == 200
-    assert client.get("/limited").status_code == 429
\ No newline at end of file
+    assert client.get("/limited").status_code == 429
+
+def test_csrf_accepts_matching_header():
+    app = Xylen(csrf=True, csrf_config={"secret_key": "test-secret"})
+
+    @app.route("/submit", methods=["POST"])
+    def handler(request):
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.post("/submit").status_code == 403
+    resp = client.post(
+        "/submit",
+        headers={"Cookie": "csrftoken=tok123", "X-CSRF-Token": "tok123"},
+    )
+    assert resp.status_code == 200
+
+
+def test_response_cache_hits_and_vary():
+    app = Xylen(cache=True, cache_config={"vary": ["Accept-Language"]})
+    calls = []
+
+    @app.route("/cached", methods=["GET"], cache_ttl=30)
+    def cached(request):
+        calls.append(request.headers.get("accept-language"))
+        return {"n": len(calls)}
+
+    @app.route("/fresh", methods=["GET"])
+    def fresh(request):
+        calls.append("fresh")
+        return {"n": len(calls)}
+
+    client = TestClient(app)
+    assert client.get("/cached").json() == {"n": 1}
+    assert client.get("/cached").json() == {"n": 1}
+    assert client.get("/cached", headers={"Accept-Language": "de"}).json() == {"n": 2}
+    assert client.get("/cached", query_params={"page": "2"}).json() == {"n": 3}
+    client.get("/fresh")
+    client.get("/fresh")
+    assert len(calls) == 5
+    stats = app.response_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["entries"] == 3
+
+
+def test_response_cache_expiry_and_lru(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("xylen.middleware.cache.time.monotonic", lambda: now[0])
+    app = Xylen(cache=True, cache_config={"ttl": 5, "max_bytes": 400})
+    calls = []
+
+    @app.route("/item/{item_id:int}", methods=["GET"])
+    def item(request, item_id: int):
+        calls.append(item_id)
+        return {"id": item_id, "pad": "x" * 100}
+
+    client = TestClient(app)
+    for item_id in (1, 2, 3):
+        client.get(f"/item/{item_id}")
+    assert app.response_cache.stats()["bytes"] <= 400
+    client.get("/item/3")
+    assert calls == [1, 2, 3]
+    client.get("/item/1")
+    assert calls == [1, 2, 3, 1]
+    now[0] += 10
+    client.get("/item/3")
+    assert calls == [1, 2, 3, 1, 3]
+
+
+def test_response_cache_coalesces_concurrent_misses():
+    import asyncio
+
+    app = Xylen(cache=True)
+    calls = []
+
+    @app.route("/slow", methods=["GET"], cache_ttl=60)
+    async def slow(request):
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"ok": True}
+
+    client = TestClient(app)
+
+    async def burst():
+        return await asyncio.gather(*[client._make_request("GET", "/slow") for _ in range(10)])
+
+    responses = asyncio.run(burst())
+    assert [r.status_code for r in responses] == [200] * 10
+    assert calls == [1]
+    assert app.response_cache.stats()["coalesced"] == 9
+
+
+def test_response_cache_keeps_per_client_headers_out():
+    import asyncio
+
+    app = Xylen(
+        cache=True,
+        cache_config={"ttl": 30},
+        cors=True,
+        cors_config={"allow_origins": ["http://a.com", "http://b.com"]},
+        csrf=True,
+    )
+
+    @app.route("/page", methods=["GET"])
+    async def page(request):
+        return {"ok": True}
+
+    def get(origin, cookie=None):
+        headers = [(b"origin", origin)]
+        if cookie:
+            headers.append((b"cookie", cookie))
+        scope = {"type": "http", "method": "GET", "path": "/page", "query_string": b"", "headers": headers}
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(event):
+            sent.append(event)
+
+        asyncio.run(app(scope, receive, send))
+        return sent[0]["headers"]
+
+    first = get(b"http://a.com")
+    second = get(b"http://b.com", cookie=b"csrftoken=mine")
+    assert app.response_cache.stats()["hits"] == 1
+
+    (entry,) = app.response_cache._entries.values()
+    assert not any(name in (b"set-cookie", b"access-control-allow-origin") for name, _ in entry.headers)
+    assert [v for k, v in first if k == b"access-control-allow-origin"] == [b"http://a.com"]
+    assert [v for k, v in second if k == b"access-control-allow-origin"] == [b"http://b.com"]
+    assert any(k == b"set-cookie" for k, _ in first)
+    assert not any(k == b"set-cookie" for k, _ in second)
+
+
+def test_rate_limit_algorithms():
+    import asyncio
+    from xylen.middleware.rate_limit import RateLimitMiddleware
+
+    async def run(algorithm):
+        limiter = RateLimitMiddleware(None, max_requests=2, window_seconds=10, algorithm=algorithm)
+        results = [(await limiter.hit("k", now=t))[0] for t in (0.0, 1.0, 2.0)]
+        results.append((await limiter.hit("k", now=25.0))[0])
+        return results
+
+    for algorithm in ("sliding_log", "token_bucket", "sliding_window"):
+        assert asyncio.run(run(algorithm)) == [True, True, False, True], algorithm
+
+
+def test_rate_limit_sweeps_idle_keys():
+    import asyncio
+    from xylen.middleware.rate_limit import RateLimitMiddleware
+
+    async def run():
+        limiter = RateLimitMiddleware(None, max_requests=5, window_seconds=10, algorithm="token_bucket")
+        for i in range(100):
+            await limiter.hit(f"ip-{i}", now=0.0)
+        await limiter.hit("active", now=11.0)
+        await limiter.hit("active", now=22.0)
+        return len(limiter.backend)
+
+    assert asyncio.run(run()) == 1
+
+
+def test_rate_limit_per_route_and_key_func():
+    from xylen.middleware.rate_limit import header_key
+
+    app = Xylen(rate_limit=True, rate_limit_config={
+        "max_requests": 100,
+        "algorithm": "token_bucket",
+        "key_func": header_key("X-API-Key"),
+    })
+
+    @app.route("/login", methods=["POST"], rate_limit={"max_requests": 1})
+    def login(request):
+        return {"ok": True}
+
+    @app.route("/health", methods=["GET"], rate_limit=False)
+    def health(request):
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.post("/login", headers={"X-API-Key": "a"}).status_code == 200
+    assert client.post("/login", headers={"X-API-Key": "a"}).status_code == 429
+    assert client.post("/login", headers={"X-API-Key": "b"}).status_code == 200
+    assert client.get("/health").status_code == 200
+
+
+def test_custom_hook_middleware_pipeline():
+    from xylen.middleware.base import Middleware
+    from xylen.response import PlainTextResponse
+
+    class Maintenance(Middleware):
+        async def before_request(self, scope):
+            if scope["path"].startswith("/admin"):
+                return PlainTextResponse("Down for maintenance", status_code=503)
+
+    class ServerHeader(Middleware):
+        def on_response_start(self, scope, status, headers):
+            headers.append((b"server", b"xylen"))
+
+    app = Xylen(cors=True, middleware=[ServerHeader(), Maintenance()])
+
+    @app.route("/ok", methods=["GET"])
+    def ok(request):
+        return {"ok": True}
+
+    client = TestClient(app)
+    resp = client.get("/ok")
+    assert resp.headers["server"] == "xylen"
+    assert "access-control-allow-origin" in resp.headers
+
+    resp = client.get("/admin/users")
+    assert resp.status_code == 503
+    assert resp.headers["server"] == "xylen"
+    assert "access-control-allow-origin" in resp.headers
+
+
+def test_hook_middleware_as_plain_asgi():
+    import asyncio
+    from xylen.middleware.cors import CORSMiddleware
+    from xylen.response import PlainTextResponse
+
+    async def inner(scope, receive, send):
+        await PlainTextResponse("hi")(scope, receive, send)
+
+    sent = []
+
+    async def send(event):
+        sent.append(event)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"origin", b"https://a.dev")]}
+    asyncio.run(CORSMiddleware(inner, allow_origins=["https://a.dev"])(scope, None, send))
+    headers = dict(sent[0]["headers"])
+    assert headers[b"access-control-allow-origin"] == b"https://a.dev"
+
+
+
+def test_cors_origin_blocks_and_vary():
+    app = Xylen(cors=True, cors_config={
+        "allow_origins": ["https://a.dev", "https://b.dev"],
+        "allow_credentials": True,
+        "expose_headers": ["X-Total"],
+    })
+
+    @app.route("/data", methods=["GET"])
+    def data(request):
+        return {"ok": True}
+
+    client = TestClient(app)
+    resp = client.get("/data", headers={"Origin": "https://b.dev"})
+    assert resp.headers["access-control-allow-origin"] == "https://b.dev"
+    assert resp.headers["access-control-allow-credentials"] == "true"
+    assert resp.headers["access-control-expose-headers"] == "X-Total"
+    assert resp.headers["vary"] == "Origin"
+    assert "access-control-allow-methods" not in resp.headers
+
+    resp = client.get("/data", headers={"Origin": "https://evil.dev"})
+    assert "access-control-allow-origin" not in resp.headers
+    assert resp.headers["vary"] == "Origin"
+
+    wildcard = TestClient(Xylen(cors=True))
+    resp = wildcard.get("/openapi.json", headers={"Origin": "https://x.dev"})
+    assert resp.headers["access-control-allow-origin"] == "*"
+    assert "vary" not in resp.headers or "Origin" not in resp.headers["vary"]
+
+
+def test_cors_preflight_prebuilt_and_unknown_paths():
+    import asyncio
+
+    app = Xylen(cors=True, cors_config={
+        "allow_methods": ["GET", "POST"],
+        "max_age": 600,
+        "preflight_unknown_paths": False,
+    })
+
+    @app.route("/items", methods=["GET", "POST"])
+    def items(request):
+        return {"items": []}
+
+    client = TestClient(app)
+
+    def preflight(path):
+        return asyncio.run(client._make_request(
+            "OPTIONS", path, headers={"Origin": "https://a.dev", "Access-Control-Request-Method": "POST"}
+        ))
+
+    resp = preflight("/items")
+    assert resp.status_code == 200
+    assert resp.headers["access-control-allow-methods"] == "GET, POST"
+    assert resp.headers["access-control-max-age"] == "600"
+    cors = app.middleware[0]
+    assert cors._block_for(b"https://a.dev")[2] is cors._block_for(b"https://a.dev")[2]
+    assert preflight("/nowhere").status_code == 404
+
+
+def test_csrf_signed_tokens_and_lazy_cookie():
+    from xylen.middleware.csrf import get_csrf_token
+
+    app = Xylen(csrf=True, csrf_config={"secret_key": "s3cret", "signed": True})
+
+    @app.route("/form", methods=["GET"])
+    def form(request):
+        return {"token": get_csrf_token(request.scope)}
+
+    @app.route("/submit", methods=["POST"])
+    def submit(request):
+        return {"ok": True}
+
+    client = TestClient(app)
+    resp = client.get("/form")
+    token = resp.json()["token"]
+    assert resp.headers["set-cookie"].startswith(f"csrftoken={token};")
+
+    cookie = {"Cookie": f"csrftoken={token}"}
+    again = client.get("/form", headers=cookie)
+    assert again.json()["token"] == token
+    assert "set-cookie" not in again.headers
+
+    ok = client.post("/submit", headers={**cookie, "X-CSRF-Token": token})
+    assert ok.status_code == 200
+
+    forged = "abc.def"
+    resp = client.post("/submit", headers={"Cookie": f"csrftoken={forged}", "X-CSRF-Token": forged})
+    assert resp.status_code == 403
+    assert resp.headers["set-cookie"].startswith("csrftoken=")
+
+
+def test_csrf_exemptions():
+    app = Xylen(csrf=True, csrf_config={"exempt_paths": ["/hooks/"]})
+
+    @app.route("/hooks/github", methods=["POST"])
+    def github(request):
+        return {"ok": True}
+
+    @app.route("/stripe", methods=["POST"], csrf_exempt=True)
+    def stripe(request):
+        return {"ok": True}
+
+    @app.route("/private", methods=["POST"])
+    def private(request):
+        return {"ok": True}
+
+    client = TestClient(app)
+    resp = client.post("/hooks/github")
+    assert resp.status_code == 200
+    assert "set-cookie" not in resp.headers
+    assert client.post("/stripe").status_code == 200
+    assert client.post("/private").status_code == 403
+
+
+def test_load_shedding_queues_then_rejects():
+    import asyncio
+
+    app = Xylen(load_shed=True, load_shed_config={"max_concurrency": 2, "max_queue": 2, "max_wait": 1.0})
+    running = []
+    peak = []
+
+    @app.route("/work", methods=["GET"])
+    async def work(request):
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.pop()
+        return {"ok": True}
+
+    client = TestClient(app)
+
+    async def burst():
+        return await asyncio.gather(*[client._make_request("GET", "/work") for _ in range(6)])
+
+    responses = asyncio.run(burst())
+    assert sorted(r.status_code for r in responses) == [200] * 4 + [503] * 2
+    assert all(r.headers["retry-after"] == "1" for r in responses if r.status_code == 503)
+    assert max(peak) == 2
+    assert app.load_shedder.stats()["shed"] == 2
+    assert app.load_shedder.stats()["in_flight"] == 0
+
+    # The limiter holds no loop-bound state: a new event loop works too.
+    assert client.get("/work").status_code == 200
+
+
+def test_load_shedding_per_route_limit_wait_and_timeout():
+    import asyncio
+
+    app = Xylen(load_shed=True, load_shed_config={"max_wait": 0.02})
+
+    @app.route("/report", methods=["GET"], max_concurrency=1)
+    async def report(request):
+        await asyncio.sleep(0.05)
+        return "done"
+
+    @app.route("/hang", methods=["GET"], timeout=0.02)
+    async def hang(request):
+        await asyncio.sleep(10)
+
+    client = TestClient(app)
+
+    async def burst():
+        return await asyncio.gather(*[client._make_request("GET", "/report") for _ in range(2)])
+
+    assert sorted(r.status_code for r in asyncio.run(burst())) == [200, 503]
+    assert client.get("/hang").status_code == 504
+    stats = app.load_shedder.stats()
+    assert (stats["shed"], stats["timeouts"]) == (1, 1)
+    assert stats["wait_time_total"] > 0
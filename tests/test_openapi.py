@@ -1,9 +1,9 @@
 # tests/test_openapi.py
-from zephyrpy.app import zephyrpy
-from zephyrpy.testclient import TestClient
+from xylen.app import Xylen
+from xylen.testclient import TestClient
 
 def test_openapi_json():
-    app = zephyrpy()
+    app = Xylen()
 
     @app.openapi(
         path="/hello",
@@ -23,8 +23,56 @@ def test_openapi_json():
     assert "get" in data["paths"]["/hello"]
 
 def test_swagger_ui():
-    app = zephyrpy()
+    app = Xylen()
     client = TestClient(app)
     response = client.get("/docs")
     assert response.status_code == 200
-    assert b"SwaggerUIBundle" in response._body
\ No newline at end of file
+    assert b"SwaggerUIBundle" in response._body
+def test_openapi_etag_and_conditional_get():
+    app = Xylen()
+    client = TestClient(app)
+    first = client.get("/openapi.json")
+    etag = first.headers["etag"]
+    assert etag.startswith('"')
+
+    cached = client.get("/openapi.json", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached._body == b""
+
+    @app.openapi(path="/new", methods=["GET"], summary="New")
+    def new(request):
+        return {}
+
+    changed = client.get("/openapi.json", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert "/new" in changed.json()["paths"]
+
+def test_openapi_gzip():
+    import gzip
+    import json
+    app = Xylen()
+    client = TestClient(app)
+    resp = client.get("/openapi.json", headers={"Accept-Encoding": "gzip, br"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(resp._body))["openapi"] == "3.0.3"
+    assert client.get("/docs", headers={"If-None-Match": resp.headers["etag"]}).status_code == 200
+
+
+def test_openapi_not_modified_per_variant():
+    app = Xylen()
+    client = TestClient(app)
+    gz = {"Accept-Encoding": "gzip"}
+    gz_etag = client.get("/openapi.json", headers=gz).headers["etag"]
+    assert gz_etag.endswith('-gz"')
+
+    resp = client.get("/openapi.json", headers={**gz, "If-None-Match": gz_etag})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == gz_etag
+
+    identity = client.get("/openapi.json", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in identity.headers
+    # The gzip tag doesn't validate the identity variant.
+    resp = client.get("/openapi.json", headers={"If-None-Match": gz_etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] == identity.headers["etag"]
@@ -0,0 +1,79 @@
+# tests/test_rate_limit_storage.py
+import asyncio
+import multiprocessing
+import sys
+
+import pytest
+
+from xylen.middleware.rate_limit import RateLimitMiddleware, SlidingLog, TokenBucket
+from xylen.middleware.rate_limit_storage import MemoryBackend, SharedMemoryBackend
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="needs fcntl")
+
+
+def worker(path, hits, results):
+    async def run():
+        limiter = RateLimitMiddleware(
+            None,
+            max_requests=50,
+            window_seconds=60,
+            algorithm="token_bucket",
+            backend=SharedMemoryBackend(path, slots=64),
+        )
+        allowed = 0
+        for _ in range(hits):
+            ok, _ = await limiter.hit("client", now=1000.0)
+            allowed += ok
+        return allowed
+
+    results.put(asyncio.run(run()))
+
+
+def test_shared_backend_across_processes(tmp_path):
+    path = str(tmp_path / "ratelimit")
+    ctx = multiprocessing.get_context("fork" if sys.platform != "darwin" else "spawn")
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(path, 30, results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+    assert sum(results.get(timeout=5) for _ in processes) == 50
+
+
+def test_shared_backend_evicts_least_recent_slot(tmp_path):
+    backend = SharedMemoryBackend(str(tmp_path / "tiny"), slots=1, probe=2)
+    policy = TokenBucket(1, 60)
+
+    async def run():
+        assert (await backend.hit("a", policy, 1.0))[0]
+        assert (await backend.hit("b", policy, 2.0))[0]
+        assert not (await backend.hit("a", policy, 3.0))[0]
+        # Table is full: "c" replaces "b", the least recently hit key.
+        assert (await backend.hit("c", policy, 4.0))[0]
+        assert (await backend.hit("b", policy, 5.0))[0]
+
+    asyncio.run(run())
+    backend.close()
+
+
+def test_shared_backend_rejects_sliding_log(tmp_path):
+    backend = SharedMemoryBackend(str(tmp_path / "log"))
+    with pytest.raises(ValueError):
+        backend.check_policy(SlidingLog(10, 60))
+    MemoryBackend().check_policy(SlidingLog(10, 60))
+    backend.close()
+
+
+def test_shared_backend_validates_layout(tmp_path):
+    path = str(tmp_path / "table")
+    SharedMemoryBackend(path, slots=64).close()
+    SharedMemoryBackend(path, slots=64).close()
+    with pytest.raises(ValueError):
+        SharedMemoryBackend(path, slots=128)
+
+    other = tmp_path / "other"
+    other.write_bytes(b"not a rate limit table" * 4)
+    with pytest.raises(ValueError):
+        SharedMemoryBackend(str(other))
@@ -0,0 +1,70 @@
+# tests/test_request.py
+import asyncio
+
+import pytest
+
+from xylen import Xylen, TestClient
+from xylen.request import Request, RequestBodyTooLarge
+
+
+def make_receive(chunks):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    return receive
+
+
+def make_scope():
+    return {"type": "http", "method": "POST", "path": "/", "headers": []}
+
+
+def test_stream_yields_chunks():
+    async def run():
+        request = Request(make_scope(), make_receive([b"ab", b"", b"cd"]))
+        return [chunk async for chunk in request.stream()]
+
+    assert asyncio.run(run()) == [b"ab", b"cd"]
+
+
+def test_body_joins_and_caches():
+    async def run():
+        request = Request(make_scope(), make_receive([b"x" * 10] * 50))
+        first = await request.body()
+        assert await request.body() is first
+        return first
+
+    assert asyncio.run(run()) == b"x" * 500
+
+
+def test_stream_enforces_max_body_size():
+    async def run():
+        request = Request(make_scope(), make_receive([b"12345", b"67890"]), max_body_size=8)
+        return [chunk async for chunk in request.stream()]
+
+    with pytest.raises(RequestBodyTooLarge):
+        asyncio.run(run())
+
+
+def test_app_rejects_oversized_bodies():
+    app = Xylen(max_body_size=16)
+
+    @app.route("/upload", methods=["POST"])
+    async def upload(request):
+        return {"size": len(await request.body())}
+
+    @app.route("/big-upload", methods=["POST"], max_body_size=1024)
+    async def big_upload(request):
+        return {"size": len(await request.body())}
+
+    client = TestClient(app)
+    assert client.post("/upload", content=b"small").json() == {"size": 5}
+    assert client.post("/upload", content=b"x" * 32).status_code == 413
+    assert client.post(
+        "/upload", content=b"x" * 32, headers={"content-length": "32"}
+    ).status_code == 413
+    assert client.post("/big-upload", content=b"x" * 32).json() == {"size": 32}
@@ -1,5 +1,5 @@
 # tests/test_responses.py
-from zephyrpy.response import PlainTextResponse, JSONResponse
+from xylen.response import PlainTextResponse, JSONResponse
 
 def test_plain_text_response():
     resp = PlainTextResponse("Hello", status_code=201)
@@ -10,5 +10,136 @@ def test_json_response():
     data = {"message": "OK", "code": 200}
     resp = JSONResponse(data)
     assert resp.status_code == 200
-    assert b'"message": "OK"' in resp.body
-    assert resp.headers[b"content-type"] == b"application/json; charset=utf-8"
\ No newline at end of file
+    assert b'"message":"OK"' in resp.body
+    assert resp.headers[b"content-type"] == b"application/json; charset=utf-8"
+
+def test_streaming_response_chunks():
+    import asyncio
+    from xylen.response import StreamingResponse
+
+    async def numbers():
+        for i in range(3):
+            yield f"{i},"
+
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(10)
+
+    async def send(event):
+        sent.append(event)
+
+    asyncio.run(StreamingResponse(numbers())({}, receive, send))
+    bodies = [e for e in sent if e["type"] == "http.response.body"]
+    assert [e["body"] for e in bodies] == [b"0,", b"1,", b"2,", b""]
+    assert [e["more_body"] for e in bodies] == [True, True, True, False]
+
+def test_streaming_response_stops_on_disconnect():
+    import asyncio
+    from xylen.response import StreamingResponse
+
+    closed = []
+
+    async def forever():
+        try:
+            while True:
+                yield b"tick"
+                await asyncio.sleep(0.01)
+        finally:
+            closed.append(True)
+
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    async def send(event):
+        sent.append(event)
+
+    asyncio.run(StreamingResponse(forever())({}, receive, send))
+    assert closed == [True]
+    assert not any(e.get("more_body") is False for e in sent)
+
+def test_json_response_content_length_and_bytes():
+    resp = JSONResponse(b'{"cached":true}')
+    assert resp.body == b'{"cached":true}'
+    assert resp.headers[b"content-length"] == b"15"
+
+    resp = JSONResponse({"name": "café"})
+    assert resp.headers[b"content-length"] == str(len(resp.body)).encode()
+    assert "café".encode() in resp.body
+
+def test_stdlib_codec_is_compact():
+    from xylen.utils.json import stdlib_dumps, stdlib_loads
+    assert stdlib_dumps({"a": [1, 2], "b": "ü"}) == '{"a":[1,2],"b":"ü"}'.encode()
+    assert stdlib_loads(b'{"a":1}') == {"a": 1}
+
+def test_event_source_frames_and_last_event_id():
+    import asyncio
+    from xylen.response import EventSourceResponse, ServerSentEvent
+
+    def events(last_event_id):
+        start = int(last_event_id or 0) + 1
+        yield ServerSentEvent({"n": start}, event="tick", id=start)
+        yield {"data": "two\nlines", "id": start + 1}
+        yield "plain"
+
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(10)
+
+    async def send(event):
+        sent.append(event)
+
+    scope = {"headers": [(b"last-event-id", b"41")]}
+    asyncio.run(EventSourceResponse(events)(scope, receive, send))
+    assert dict(sent[0]["headers"])[b"content-type"] == b"text/event-stream; charset=utf-8"
+    assert [e["body"] for e in sent[1:]] == [
+        b'event: tick\nid: 42\ndata: {"n":42}\n\n',
+        b"id: 43\ndata: two\ndata: lines\n\n",
+        b"data: plain\n\n",
+        b"",
+    ]
+
+def test_event_source_pings_buffers_and_cancels_on_disconnect():
+    import asyncio
+    from xylen.response import EventSourceResponse
+
+    produced = []
+    closed = []
+
+    async def events():
+        try:
+            yield "first"
+            # Then a client that never reads: production stops at the buffer.
+            for i in range(1000):
+                produced.append(i)
+                yield str(i)
+        finally:
+            closed.append(True)
+
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(0.1)
+        return {"type": "http.disconnect"}
+
+    async def send(event):
+        sent.append(event)
+        if event.get("body") == b"data: first\n\n":
+            await asyncio.sleep(1)
+
+    async def quiet():
+        await asyncio.sleep(1)
+        yield "never"
+
+    asyncio.run(EventSourceResponse(events(), max_buffer=4)({}, receive, send))
+    assert closed == [True]
+    assert len(produced) <= 6
+    assert not any(e.get("more_body") is False for e in sent)
+
+    sent.clear()
+    asyncio.run(EventSourceResponse(quiet(), ping_interval=0.05)({}, receive, send))
+    assert b": ping\n\n" in [e.get("body") for e in sent]
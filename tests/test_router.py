@@ -1,5 +1,5 @@
 # tests/test_router.py
-from zephyrpy.router import Router
+from xylen.router import Router
 
 def dummy_handler(request, **kwargs):
     return {"kwargs": kwargs}
@@ -35,4 +35,49 @@ def test_router_not_found():
     router = Router()
     router.add_route("/api/data", dummy_handler, ["GET"])
     handler, kwargs = router.resolve("/api/missing", "GET")
-    assert handler is None
\ No newline at end of file
+    assert handler is None
+
+def test_router_root_path():
+    router = Router()
+    router.add_route("/", dummy_handler, ["GET"])
+    handler, kwargs = router.resolve("/", "GET")
+    assert handler == dummy_handler
+
+def test_router_static_beats_dynamic():
+    def me_handler(request):
+        return {}
+
+    router = Router()
+    router.add_route("/users/{name:str}", dummy_handler, ["GET"])
+    router.add_route("/users/me", me_handler, ["GET"])
+    assert router.resolve("/users/me", "GET")[0] == me_handler
+    assert router.resolve("/users/bob", "GET") == (dummy_handler, {"name": "bob"})
+
+def test_router_converter_priority():
+    def int_handler(request, **kwargs):
+        return kwargs
+
+    router = Router()
+    router.add_route("/item/{slug:str}", dummy_handler, ["GET"])
+    router.add_route("/item/{id:int}", int_handler, ["GET"])
+    assert router.resolve("/item/7", "GET") == (int_handler, {"id": 7})
+    assert router.resolve("/item/seven", "GET") == (dummy_handler, {"slug": "seven"})
+
+def test_router_backtracks_to_dynamic():
+    router = Router()
+    router.add_route("/files/static/readme", dummy_handler, ["GET"])
+    router.add_route("/files/{name:str}/meta", dummy_handler, ["GET"])
+    handler, kwargs = router.resolve("/files/static/meta", "GET")
+    assert handler == dummy_handler
+    assert kwargs == {"name": "static"}
+
+def test_router_method_not_allowed():
+    router = Router()
+    router.add_route("/api/data", dummy_handler, ["GET"])
+    router.add_route("/api/{name:str}", dummy_handler, ["DELETE"])
+    route, kwargs, allowed = router.match("/api/data", "POST")
+    assert route is None
+    assert allowed == ("DELETE", "GET")
+    route, kwargs, allowed = router.match("/api/missing/deep", "GET")
+    assert route is None
+    assert allowed == ()
@@ -0,0 +1,161 @@
+# tests/test_server.py
+import asyncio
+
+from xylen import Xylen
+from xylen.response import Response
+from xylen.server import Server
+
+
+def make_app():
+    app = Xylen()
+
+    @app.route("/hello", methods=["GET"])
+    async def hello(request):
+        return {"message": "hi"}
+
+    @app.route("/echo", methods=["POST"])
+    async def echo(request):
+        return Response(await request.body())
+
+    @app.route("/stream", methods=["GET"])
+    def stream(request):
+        yield "a"
+        yield "b"
+
+    @app.route("/boom", methods=["GET"])
+    async def boom(request):
+        raise ValueError("nope")
+
+    return app
+
+
+def serve(app, client, **options):
+    """Run ``client(host, port)`` against a native server on a free port."""
+
+    async def main():
+        server = Server(app, port=0, **options)
+        server.started = asyncio.Event()
+        task = asyncio.ensure_future(server.serve())
+        await server.started.wait()
+        host, port = server.sockets[0].getsockname()[:2]
+        try:
+            return await client(host, port)
+        finally:
+            server.exit()
+            await task
+
+    return asyncio.run(main())
+
+
+async def exchange(host, port, data, responses=1):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(data)
+    results = []
+    for _ in range(responses):
+        results.append(await read_response(reader))
+    writer.close()
+    return results
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.lower()] = value.strip()
+    if "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        body = b""
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).strip(), 16)
+            chunk = await reader.readexactly(size + 2)
+            if not size:
+                break
+            body += chunk[:-2]
+    else:
+        body = await reader.read()
+    return status, headers, body
+
+
+def test_keep_alive_and_pipelining():
+    request = b"GET /hello HTTP/1.1\r\nHost: x\r\n\r\n"
+    post = b"POST /echo HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n\r\nhello"
+
+    async def client(host, port):
+        return await exchange(host, port, request + post + request, responses=3)
+
+    (s1, h1, b1), (s2, _, b2), (s3, _, b3) = serve(make_app(), client)
+    assert (s1, b1) == (200, b'{"message":"hi"}')
+    assert h1["content-type"].startswith("application/json")
+    assert "connection" not in h1
+    assert (s2, b2) == (200, b"hello")
+    assert (s3, b3) == (200, b1)
+
+
+def test_chunked_request_and_streaming_response():
+    post = (
+        b"POST /echo HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n"
+        b"3\r\nabc\r\n2;ext=1\r\nde\r\n0\r\n\r\n"
+    )
+    stream = b"GET /stream HTTP/1.1\r\nHost: x\r\n\r\n"
+
+    async def client(host, port):
+        return await exchange(host, port, post + stream, responses=2)
+
+    (s1, _, b1), (s2, h2, b2) = serve(make_app(), client)
+    assert (s1, b1) == (200, b"abcde")
+    assert h2["transfer-encoding"] == "chunked"
+    assert (s2, b2) == (200, b"ab")
+
+
+def test_limits_and_errors():
+    async def client(host, port):
+        big_head = b"GET /hello HTTP/1.1\r\nX: " + b"a" * 2048 + b"\r\n\r\n"
+        big_body = b"POST /echo HTTP/1.1\r\nContent-Length: 100\r\n\r\n"
+        smuggle = b"POST /echo HTTP/1.1\r\nContent-Length: 1\r\nTransfer-Encoding: chunked\r\n\r\n"
+        results = []
+        for data in (big_head, big_body, smuggle, b"nonsense\r\n\r\n", b"GET /boom HTTP/1.1\r\n\r\n"):
+            results.append((await exchange(host, port, data))[0])
+        return results
+
+    results = serve(make_app(), client, max_header_size=1024, max_body_size=10)
+    assert [status for status, _, _ in results] == [431, 413, 400, 400, 500]
+    assert all(headers.get("connection") == "close" for _, headers, _ in results[:4])
+
+
+def test_http_10_and_idle_timeout():
+    async def client(host, port):
+        (response,) = await exchange(host, port, b"GET /hello HTTP/1.0\r\n\r\n")
+        reader, writer = await asyncio.open_connection(host, port)
+        closed = await asyncio.wait_for(reader.read(), 2)
+        writer.close()
+        return response, closed
+
+    (status, headers, _), closed = serve(make_app(), client, keep_alive_timeout=0.1)
+    assert status == 200
+    assert headers["connection"] == "close"
+    assert closed == b""
+
+
+def test_max_requests_stops_the_server():
+    async def client(host, port):
+        request = b"GET /hello HTTP/1.1\r\n\r\n"
+        return await exchange(host, port, request * 2, responses=2)
+
+    async def main():
+        server = Server(make_app(), port=0, max_requests=2)
+        server.started = asyncio.Event()
+        task = asyncio.ensure_future(server.serve())
+        await server.started.wait()
+        host, port = server.sockets[0].getsockname()[:2]
+        responses = await client(host, port)
+        await asyncio.wait_for(task, 5)
+        return responses, server.responses
+
+    responses, served = asyncio.run(main())
+    assert [status for status, _, _ in responses] == [200, 200]
+    assert served == 2
@@ -0,0 +1,86 @@
+# tests/test_supervisor.py
+import os
+import signal
+import socket
+import time
+
+import pytest
+
+from xylen.supervisor import Supervisor, memory_usage
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_lines(path, count, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists() and len(path.read_text().split()) >= count:
+            return path.read_text().split()
+        time.sleep(0.05)
+    raise AssertionError(f"expected {count} lines in {path}")
+
+
+def run_supervisor(serve, workers, **options):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            Supervisor(serve, workers, port=free_port(), **options).run()
+        finally:
+            os._exit(0)
+    return pid
+
+
+def stop(pid):
+    os.kill(pid, signal.SIGTERM)
+    _, status = os.waitpid(pid, 0)
+    return status
+
+
+def test_workers_are_respawned_after_exiting(tmp_path):
+    log = tmp_path / "pids"
+
+    def serve(sock, max_requests, ready):
+        assert sock is not None
+        ready()
+        with open(log, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.1)  # then exit, as a recycled worker does
+
+    master = run_supervisor(serve, 2)
+    try:
+        pids = wait_for_lines(log, 5)
+    finally:
+        assert stop(master) == 0
+    assert len(set(pids)) == len(pids)
+
+
+def test_rolling_restart_replaces_every_worker(tmp_path):
+    log = tmp_path / "pids"
+
+    def serve(sock, max_requests, ready):
+        ready()
+        with open(log, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(60)  # until SIGTERM
+
+    master = run_supervisor(serve, 2, graceful_timeout=5)
+    try:
+        first = wait_for_lines(log, 2)
+        os.kill(master, signal.SIGHUP)
+        second = wait_for_lines(log, 4)[2:]
+    finally:
+        stop(master)
+    assert not set(first) & set(second)
+
+
+def test_memory_usage():
+    usage = memory_usage(os.getpid())
+    if usage is None:
+        pytest.skip("no /proc/<pid>/smaps_rollup")
+    assert usage["rss"] >= usage["private"] > 0
@@ -0,0 +1,62 @@
+# tests/test_tracing.py
+import os
+
+import pytest
+
+from xylen import Xylen, TestClient
+from xylen.tracing import Tracer
+
+
+def make_app(**tracing_config):
+    app = Xylen(cors=True, tracing=True, tracing_config=tracing_config)
+
+    @app.route("/items/{item_id:int}", methods=["GET"])
+    async def item(request, item_id):
+        return {"id": item_id}
+
+    return app
+
+
+def test_trace_requested_by_secret_header():
+    traces = []
+    client = TestClient(make_app(secret="s3cret", sink=traces.append))
+
+    response = client.get("/items/1", headers={"x-xylen-trace": "s3cret"})
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    for stage in ("router", "mw.CORSMiddleware", "handler", "serialize", "total"):
+        assert f"{stage};dur=" in timing
+
+    (trace,) = traces
+    assert trace.route == "/items/{item_id:int}"
+    assert trace.status == 200
+    assert "send" in trace.durations()
+    assert trace.total >= sum(trace.durations().values())
+
+
+def test_untraced_requests_are_untouched():
+    traces = []
+    client = TestClient(make_app(secret="s3cret", sink=traces.append))
+
+    assert "server-timing" not in client.get("/items/1").headers
+    assert "server-timing" not in client.get("/items/1", headers={"x-xylen-trace": "wrong"}).headers
+    assert traces == []
+
+
+def test_sample_rate_and_profile_capture(tmp_path):
+    traces = []
+    client = TestClient(make_app(
+        sample_rate=1.0, server_timing=False, sink=traces.append,
+        profile=True, profile_dir=str(tmp_path),
+    ))
+
+    response = client.get("/items/7")
+    assert "server-timing" not in response.headers
+    assert traces[0].profile is not None
+    (name,) = os.listdir(tmp_path)
+    assert name.endswith("-GET-items_7.prof")
+
+
+def test_invalid_sample_rate():
+    with pytest.raises(ValueError):
+        Tracer(sample_rate=2)
@@ -0,0 +1,151 @@
+# tests/test_websockets.py
+import asyncio
+
+import pytest
+
+from xylen import Xylen
+from xylen.channels import Channel
+from xylen.websockets import WebSocketDisconnect
+
+
+async def session(app, path, incoming):
+    """Run a WebSocket connection fed ``incoming`` and return what the app sent."""
+    queue = asyncio.Queue()
+    for message in incoming:
+        queue.put_nowait(message)
+    sent = []
+
+    async def receive():
+        return await queue.get()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "websocket", "path": path, "query_string": b"", "headers": []}
+    await asyncio.wait_for(app(scope, receive, send), 5)
+    return sent
+
+
+def test_websocket_route_with_converter():
+    app = Xylen()
+
+    @app.websocket("/rooms/{room_id:int}")
+    async def room(websocket, room_id):
+        await websocket.accept()
+        async for message in websocket:
+            await websocket.send_json({"room": room_id, "echo": message})
+
+    incoming = [
+        {"type": "websocket.connect"},
+        {"type": "websocket.receive", "text": "hi"},
+        {"type": "websocket.disconnect", "code": 1001},
+    ]
+    sent = asyncio.run(session(app, "/rooms/7", incoming))
+    assert sent == [
+        {"type": "websocket.accept", "subprotocol": None},
+        {"type": "websocket.send", "text": '{"room":7,"echo":"hi"}'},
+    ]
+
+    sent = asyncio.run(session(app, "/rooms/abc", [{"type": "websocket.connect"}]))
+    assert sent == [{"type": "websocket.close", "code": 1000}]
+
+
+def test_websocket_handler_must_be_async():
+    app = Xylen()
+    with pytest.raises(TypeError):
+        app.add_websocket_route("/ws", lambda websocket: None)
+
+
+def test_receive_raises_on_disconnect():
+    app = Xylen()
+    codes = []
+
+    @app.websocket("/ws")
+    async def ws(websocket):
+        await websocket.accept()
+        try:
+            await websocket.receive_text()
+        except WebSocketDisconnect as exc:
+            codes.append(exc.code)
+            raise
+
+    asyncio.run(session(app, "/ws", [{"type": "websocket.connect"}, {"type": "websocket.disconnect", "code": 1006}]))
+    assert codes == [1006]
+
+
+def test_channel_encodes_once_and_applies_policies():
+    encoded = []
+
+    def encoder(message):
+        encoded.append(message)
+        return b'{"n":1}'
+
+    async def main():
+        channel = Channel(max_queue=2, encoder=encoder)
+        fast = channel.subscribe()
+        oldest = channel.subscribe()
+        newest = channel.subscribe(policy="drop_newest")
+        slow = channel.subscribe(policy="disconnect")
+
+        assert channel.publish({"n": 1}) == 4
+        assert fast.pop() == '{"n":1}'
+        channel.publish("a")
+        assert channel.publish("b") == 2
+        assert slow.closed and slow.overflowed and len(channel) == 3
+        assert [oldest.pop(), oldest.pop()] == ["a", "b"]
+        assert [newest.pop(), newest.pop()] == ['{"n":1}', "a"]
+
+        fast.close()
+        assert await fast.get() == "a"
+        assert await fast.get() == "b"
+        assert await fast.get() is None
+        return channel.stats()
+
+    stats = asyncio.run(main())
+    assert encoded == [{"n": 1}]
+    assert stats == {"subscribers": 2, "published": 3, "dropped": 3, "disconnected": 1}
+
+
+def test_relay_broadcasts_and_closes_slow_consumers():
+    app = Xylen()
+    channel = Channel(max_queue=1, policy="disconnect")
+
+    @app.websocket("/feed")
+    async def feed(websocket):
+        await websocket.accept()
+        await websocket.relay(channel.subscribe())
+
+    async def main():
+        queue = asyncio.Queue()
+        queue.put_nowait({"type": "websocket.connect"})
+        sent = []
+        sending = asyncio.Event()
+
+        async def receive():
+            return await queue.get()
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "websocket.send":
+                # A stalled client: the next publishes overflow its queue.
+                sending.set()
+                await asyncio.sleep(0.05)
+
+        scope = {"type": "websocket", "path": "/feed", "query_string": b"", "headers": []}
+        task = asyncio.ensure_future(app(scope, receive, send))
+        while not len(channel):
+            await asyncio.sleep(0)
+        channel.publish("first")
+        await sending.wait()
+        channel.publish("second")
+        channel.publish("third")
+        await asyncio.wait_for(task, 5)
+        return sent
+
+    sent = asyncio.run(main())
+    assert sent[1:] == [
+        {"type": "websocket.send", "text": "first"},
+        {"type": "websocket.send", "text": "second"},
+        {"type": "websocket.close", "code": 1013, "reason": ""},
+    ]
+    assert len(channel) == 0
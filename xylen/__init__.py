@@ -1,6 +1,14 @@
 # xylen/__init__.py
 from .app import Xylen
-from .testclient import TestClient
 
 __version__ = "1.0.0"
-__all__ = ["Xylen", "TestClient"]
\ No newline at end of file
+__all__ = ["Xylen", "TestClient"]
+
+
+def __getattr__(name):
+    # Only tests need the client; keep it off the import path of servers.
+    if name == "TestClient":
+        from .testclient import TestClient
+
+        return TestClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,60 @@
 # Xylen/app.py
 import asyncio
+import functools
+import inspect
+import logging
 import os
+from time import perf_counter
 from typing import Callable, Dict, Any, Optional
-from .router import Router
-from .request import Request
-from .response import Response, PlainTextResponse, JSONResponse
+from .background import BackgroundRunner, BackgroundTasks
+from .concurrency import ThreadPool
+from .datastructures import State
+from .middleware.base import HookedSend, overrides
+from .metrics import ERROR_KEY, Metrics
+from .router import Router, is_async_callable
+from .tracing import TRACE_KEY, Tracer, timed_hook
+from .request import ClientDisconnect, Request, RequestBodyTooLarge
+from .response import (
+    Response,
+    PlainTextResponse,
+    JSONResponse,
+    StreamingResponse,
+    CachedContent,
+)
+from .utils import json as json_codec
+from .websockets import WebSocket, WebSocketDisconnect
 
+logger = logging.getLogger("xylen")
+
+# Router method under which WebSocket routes are registered.
+WEBSOCKET_METHOD = "WEBSOCKET"
+
+SWAGGER_UI_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Swagger UI - Xylen API</title>
+    <meta charset="utf-8"/>
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <link rel="stylesheet" type="text/css" href="https://unpkg.com/swagger-ui-dist@5.9.0/swagger-ui.css" />
+</head>
+<body>
+    <div id="swagger-ui"></div>
+    <script src="https://unpkg.com/swagger-ui-dist@5.9.0/swagger-ui-bundle.js"></script>
+    <script>
+        SwaggerUIBundle({
+            url: "/openapi.json",
+            dom_id: "#swagger-ui",
+            presets: [
+                SwaggerUIBundle.presets.apis,
+                SwaggerUIBundle.SwaggerUIStandalonePreset
+            ],
+            layout: "BaseLayout"
+        });
+    </script>
+</body>
+</html>
+"""
 
 class Xylen:
     def __init__(
@@ -16,8 +65,40 @@ class Xylen:
         csrf_config: Optional[dict] = None,
         rate_limit: bool = False,
         rate_limit_config: Optional[dict] = None,
+        cache: bool = False,
+        cache_config: Optional[dict] = None,
+        load_shed: bool = False,
+        load_shed_config: Optional[dict] = None,
+        max_body_size: Optional[int] = None,
+        json_encoder: Optional[Callable[[Any], bytes]] = None,
+        json_decoder: Optional[Callable[[bytes], Any]] = None,
+        thread_pool_size: Optional[int] = None,
+        background_queue_size: Optional[int] = None,
+        background_concurrency: int = 8,
+        middleware: Optional[list] = None,
+        metrics: bool = False,
+        metrics_config: Optional[dict] = None,
+        tracing: bool = False,
+        tracing_config: Optional[dict] = None,
+        on_startup: Optional[list] = None,
+        on_shutdown: Optional[list] = None,
+        lifespan: Optional[Callable] = None,
+        warmup: Optional[list] = None,
+        cancel_on_disconnect: bool = True,
     ):
         self.router = Router()
+        # WebSocket routes live apart so a plain GET on their path is a 404.
+        self.websocket_router = Router()
+        self.thread_pool = ThreadPool(thread_pool_size)
+        self.background = BackgroundRunner(
+            self.thread_pool.run, max_pending=background_queue_size, concurrency=background_concurrency
+        )
+        self.max_body_size = max_body_size
+        # Stop handlers whose client has gone away; counted in disconnects.
+        self.cancel_on_disconnect = cancel_on_disconnect
+        self.disconnects = 0
+        self.json_encoder = json_encoder or json_codec.dumps
+        self.json_decoder = json_decoder or json_codec.loads
         self.openapi_info = {
             "title": "Xylen API",
             "version": "1.0.0",
@@ -25,41 +106,226 @@ class Xylen:
         }
         self._routes_openapi = []
 
-        # Start with core app
-        current_app = self
+        # Shared resources, set up by the lifespan hooks.
+        self.state = State()
+        self._startup_hooks = list(on_startup or ())
+        self._shutdown_hooks = list(on_shutdown or ())
+        self.lifespan = lifespan
+        self._lifespan_context = None
+        # Paths requested in-process at startup, before the worker is ready.
+        self.warmup = list(warmup or ())
+        # Encoded lazily and dropped whenever a route is registered.
+        self._openapi_content = None
+        self._swagger_content = None
 
-        if rate_limit:
-            rate_limit_config = rate_limit_config or {}
-            from .middleware.rate_limit import RateLimitMiddleware
+        # Hook middlewares, outermost first, fused into one pipeline around
+        # the core dispatch (optionally wrapped by the response cache).
+        self.middleware = []
+        self.response_cache = None
+        self.load_shedder = None
+        inner_app = self._dispatch
 
-            current_app = RateLimitMiddleware(current_app, **rate_limit_config)
+        # Inside the cache, so cache hits never wait for a slot.
+        if load_shed:
+            load_shed_config = dict(load_shed_config or {})
+            from .middleware.load_shed import LoadShedMiddleware
 
-        if csrf:
-            csrf_config = csrf_config or {}
-            from .middleware.csrf import CSRFMiddleware
+            load_shed_config.setdefault("router", self.router)
+            inner_app = self.load_shedder = LoadShedMiddleware(inner_app, **load_shed_config)
 
-            current_app = CSRFMiddleware(current_app, **csrf_config)
+        if cache:
+            cache_config = cache_config or {}
+            from .middleware.cache import CacheMiddleware
+
+            inner_app = self.response_cache = CacheMiddleware(
+                inner_app, router=self.router, **cache_config
+            )
 
         if cors:
-            cors_config = cors_config or {}
+            cors_config = dict(cors_config or {})
             from .middleware.cors import CORSMiddleware
 
-            current_app = CORSMiddleware(current_app, **cors_config)
+            cors_config.setdefault("router", self.router)
+
+            self.middleware.append(CORSMiddleware(**cors_config))
+
+        if csrf:
+            csrf_config = dict(csrf_config or {})
+            from .middleware.csrf import CSRFMiddleware
+
+            csrf_config.setdefault("router", self.router)
+
+            self.middleware.append(CSRFMiddleware(**csrf_config))
+
+        if rate_limit:
+            rate_limit_config = dict(rate_limit_config or {})
+            from .middleware.rate_limit import RateLimitMiddleware
+
+            rate_limit_config.setdefault("router", self.router)
+            self.middleware.append(RateLimitMiddleware(**rate_limit_config))
 
-        self._asgi_app = current_app
+        self.middleware.extend(middleware or ())
+        self._inner_app = inner_app
+        self._build_pipeline()
+        self._asgi_app = self
+
+        # Instrumentation wraps the whole pipeline; routes register their
+        # series as they are added, so it must exist before any route.
+        self.metrics = None
+        self._entry = self._pipeline
+        if metrics:
+            metrics_config = dict(metrics_config or {})
+            metrics_config.setdefault("router", self.router)
+            self.metrics = Metrics(**metrics_config)
+            self.metrics.add_collector(self.thread_pool.metrics)
+            self.metrics.add_collector(self.background.metrics)
+            self.metrics.add_collector(self._disconnect_metrics)
+            if self.load_shedder is not None:
+                self.metrics.add_collector(self.load_shedder.metrics)
+            self._entry = functools.partial(self.metrics.observe, self._entry)
+            self.add_route(self.metrics.path, self.metrics.endpoint, methods=["GET"])
+
+        self.tracer = None
+        if tracing:
+            tracing_config = dict(tracing_config or {})
+            tracing_config.setdefault("router", self.router)
+            self.tracer = Tracer(**tracing_config)
+            self._entry = functools.partial(self.tracer.trace, self._entry)
 
         # Add OpenAPI routes to CORE (not wrapped)
         self.add_route("/openapi.json", self._serve_openapi, methods=["GET"])
         self.add_route("/docs", self._serve_swagger_ui, methods=["GET"])
 
-    def add_route(self, path: str, handler: Callable, methods=None):
+    def add_middleware(self, middleware):
+        """Append a hook middleware (see ``xylen.middleware.base.Middleware``)."""
+        self.middleware.append(middleware)
+        self._build_pipeline()
+
+    def _build_pipeline(self):
+        # Each before_request hook is paired with the response hooks of the
+        # middlewares outside it, which still see a response it short-circuits.
+        before = []
+        response_hooks = []
+        for middleware in self.middleware:
+            if overrides(middleware, "before_request"):
+                before.append((middleware.before_request, tuple(reversed(response_hooks))))
+            if overrides(middleware, "on_response_start"):
+                response_hooks.append(middleware.on_response_start)
+        self._before_request = tuple(before)
+        self._response_hooks = tuple(reversed(response_hooks))
+
+    def on_startup(self, func: Callable):
+        """Register a sync or async callable run at startup; usable as a decorator."""
+        self._startup_hooks.append(func)
+        return func
+
+    def on_shutdown(self, func: Callable):
+        """Register a sync or async callable run at shutdown; usable as a decorator."""
+        self._shutdown_hooks.append(func)
+        return func
+
+    async def startup(self):
+        """Enter ``lifespan``, run the startup hooks, then warm up.
+
+        ``lifespan(app)`` is an async context manager held open until
+        shutdown; a mapping it yields is copied onto ``app.state``.
+        """
+        if self.lifespan is not None:
+            self._lifespan_context = self.lifespan(self)
+            state = await self._lifespan_context.__aenter__()
+            if state:
+                vars(self.state).update(state)
+        for hook in self._startup_hooks:
+            await _call_hook(hook)
+        await self.warm_up()
+
+    async def warm_up(self):
+        """Build the lazily encoded pages and request the ``warmup`` paths,
+        so the first real requests don't pay for it."""
+        self._openapi_response()
+        self._swagger_response()
+        for path in self.warmup:
+            status = await self._warmup_request(path)
+            if status >= 400:
+                raise RuntimeError(f"Warm-up request GET {path} returned {status}")
+
+    async def _warmup_request(self, path):
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("latin-1"),
+            "query_string": query.encode("latin-1"),
+            "headers": [(b"host", b"localhost")],
+            "client": None,
+            "server": None,
+        }
+        status = None
+        requested = False
+        sent = asyncio.Event()
+
+        async def receive():
+            nonlocal requested
+            if requested:
+                # Like a real client, only go away once the response is read.
+                await sent.wait()
+                return {"type": "http.disconnect"}
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(event):
+            nonlocal status
+            if event["type"] == "http.response.start":
+                status = event["status"]
+            elif not event.get("more_body", False):
+                sent.set()
+
+        await self(scope, receive, send)
+        return status or 500
+
+    async def shutdown(self):
+        """Run the shutdown hooks and leave ``lifespan``, then drain the
+        background queue, stop the thread pool and flush metrics."""
+        try:
+            for hook in self._shutdown_hooks:
+                await _call_hook(hook)
+            context, self._lifespan_context = self._lifespan_context, None
+            if context is not None:
+                await context.__aexit__(None, None, None)
+        finally:
+            await self.background.shutdown()
+            await asyncio.get_running_loop().run_in_executor(None, self.thread_pool.shutdown)
+            if self.metrics is not None and self.metrics.directory is not None:
+                # Keep the final counts of this worker in the aggregate.
+                self.metrics.flush()
+
+    def add_route(self, path: str, handler: Callable, methods=None, **options):
         if methods is None:
             methods = ["GET"]
-        self.router.add_route(path, handler, methods)
+        route = self.router.add_route(path, handler, methods, **options)
+        if self.metrics is not None:
+            self.metrics.register(route)
+        self._openapi_content = None
+
+    def route(self, path: str, methods=None, **options):
+        def decorator(handler):
+            self.add_route(path, handler, methods, **options)
+            return handler
+
+        return decorator
 
-    def route(self, path: str, methods=None):
+    def add_websocket_route(self, path: str, handler: Callable, **options):
+        if not is_async_callable(handler):
+            raise TypeError(f"WebSocket handler for {path!r} must be async")
+        self.websocket_router.add_route(path, handler, [WEBSOCKET_METHOD], **options)
+
+    def websocket(self, path: str, **options):
         def decorator(handler):
-            self.add_route(path, handler, methods)
+            self.add_websocket_route(path, handler, **options)
             return handler
 
         return decorator
@@ -72,6 +338,7 @@ class Xylen:
         description: str = "",
         request_body: dict = None,
         responses: dict = None,
+        **options,
     ):
         if methods is None:
             methods = ["GET"]
@@ -79,7 +346,7 @@ class Xylen:
             responses = {200: {"description": "Successful Response"}}
 
         def decorator(handler):
-            self.add_route(path, handler, methods)
+            self.add_route(path, handler, methods, **options)
             self._routes_openapi.append(
                 {
                     "path": path,
@@ -90,6 +357,7 @@ class Xylen:
                     "responses": responses,
                 }
             )
+            self._openapi_content = None
             return handler
 
         return decorator
@@ -119,75 +387,244 @@ class Xylen:
             "paths": paths,
         }
 
+    def _openapi_response(self):
+        if self._openapi_content is None:
+            self._openapi_content = CachedContent(
+                JSONResponse(self.generate_openapi(), encoder=self.json_encoder).body,
+                "application/json; charset=utf-8",
+            )
+        return self._openapi_content
+
+    def _swagger_response(self):
+        if self._swagger_content is None:
+            self._swagger_content = CachedContent(
+                SWAGGER_UI_HTML.encode("utf-8"), "text/html; charset=utf-8"
+            )
+        return self._swagger_content
+
     async def _serve_openapi(self, request):
-        return JSONResponse(self.generate_openapi())
+        return self._openapi_response().response(request)
 
     async def _serve_swagger_ui(self, request):
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Swagger UI - Xylen API</title>
-            <meta charset="utf-8"/>
-            <meta name="viewport" content="width=device-width, initial-scale=1">
-            <link rel="stylesheet" type="text/css" href="https://unpkg.com/swagger-ui-dist@5.9.0/swagger-ui.css" />
-        </head>
-        <body>
-            <div id="swagger-ui"></div>
-            <script src="https://unpkg.com/swagger-ui-dist@5.9.0/swagger-ui-bundle.js"></script>
-            <script>
-                SwaggerUIBundle({{
-                    url: "/openapi.json",
-                    dom_id: "#swagger-ui",
-                    presets: [
-                        SwaggerUIBundle.presets.apis,
-                        SwaggerUIBundle.SwaggerUIStandalonePreset
-                    ],
-                    layout: "BaseLayout"
-                }});
-            </script>
-        </body>
-        </html>
-        """
-        return PlainTextResponse(
-            html, headers={"content-type": "text/html; charset=utf-8"}
-        )
+        return self._swagger_response().response(request)
 
-    # Core ASGI app (no middleware)
+    # ASGI entry point: the middleware pipeline around the core app
     async def __call__(self, scope: Dict[str, Any], receive, send):
         if scope["type"] != "http":
-            if scope["type"] == "lifespan":
-                while True:
-                    message = await receive()
-                    if message["type"] == "lifespan.startup":
-                        await send({"type": "lifespan.startup.complete"})
-                    elif message["type"] == "lifespan.shutdown":
-                        await send({"type": "lifespan.shutdown.complete"})
-                        break
+            if scope["type"] == "websocket":
+                scope["app"] = self
+                await self._websocket(scope, receive, send)
+            elif scope["type"] == "lifespan":
+                await self._lifespan(receive, send)
+            return
+
+        scope["app"] = self
+        await self._entry(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as exc:
+                    logger.exception("Application startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": repr(exc)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                try:
+                    await self.shutdown()
+                except Exception as exc:
+                    logger.exception("Application shutdown failed")
+                    await send({"type": "lifespan.shutdown.failed", "message": repr(exc)})
+                    return
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _pipeline(self, scope: Dict[str, Any], receive, send):
+        if TRACE_KEY in scope:
+            return await self._traced_pipeline(scope, receive, send)
+        for before_request, hooks in self._before_request:
+            response = await before_request(scope)
+            if response is not None:
+                if hooks:
+                    send = HookedSend(scope, send, hooks)
+                await response(scope, receive, send)
+                return
+
+        if self._response_hooks:
+            send = HookedSend(scope, send, self._response_hooks)
+        await self._inner_app(scope, receive, send)
+
+    async def _traced_pipeline(self, scope: Dict[str, Any], receive, send):
+        # Same as _pipeline, timing each middleware hook as its own stage.
+        trace = scope[TRACE_KEY]
+        response_hooks = []
+        for middleware in self.middleware:
+            name = "mw." + type(middleware).__name__
+            if overrides(middleware, "before_request"):
+                hooks = tuple(reversed(response_hooks))
+                started = perf_counter()
+                response = await middleware.before_request(scope)
+                trace.stage(name, started)
+                if response is not None:
+                    if hooks:
+                        send = HookedSend(scope, send, hooks)
+                    await response(scope, receive, send)
+                    return
+            if overrides(middleware, "on_response_start"):
+                response_hooks.append(timed_hook(trace, name, middleware.on_response_start))
+
+        if response_hooks:
+            send = HookedSend(scope, send, tuple(reversed(response_hooks)))
+        await self._inner_app(scope, receive, send)
+
+    async def _websocket(self, scope: Dict[str, Any], receive, send):
+        # The hook middlewares are HTTP-only, as in their own __call__.
+        route, kwargs, _ = self.websocket_router.match(scope["path"], WEBSOCKET_METHOD)
+        if route is None:
+            # Closing before accept makes the server answer 403.
+            await send({"type": "websocket.close", "code": 1000})
             return
+        websocket = WebSocket(scope, receive, send)
+        try:
+            await route.handler(websocket, **kwargs)
+        except WebSocketDisconnect:
+            pass
+        except Exception as exc:
+            scope[ERROR_KEY] = exc
+            logger.exception("Unhandled error in WebSocket %s", route.path)
+            await websocket.close(1011)
+            return
+        await websocket.close()
 
+    # Core ASGI app (no middleware)
+    async def _dispatch(self, scope: Dict[str, Any], receive, send):
         request = Request(scope, receive)
-        response = await self._handle_request(request)
-        await response(scope, receive, send)
+        if not self.cancel_on_disconnect:
+            response = await self._handle_request(request)
+            await response(scope, receive, send)
+        else:
+            response = await self._watched_dispatch(request, receive, send)
+            if response is None:
+                return
+        background = getattr(response, "background", None)
+        if background:
+            await self.background(background)
+        if request.background:
+            await self.background(request.background)
+
+    async def _watched_dispatch(self, request, receive, send):
+        """Handle ``request``, cancelling the handler if the client goes away.
+
+        Returns the response sent, or ``None`` if cancelled.  Once the handler has returned
+        a disconnect is only passed on to the response (streaming responses
+        stop on it), so a response is never cut off half sent.
+        """
+        task = asyncio.current_task()
+        handling = True
+        cancelled = False
+
+        def on_disconnect():
+            nonlocal cancelled
+            if handling:
+                cancelled = True
+                task.cancel()
+
+        request.watch_disconnect(on_disconnect)
+        try:
+            try:
+                response = await self._handle_request(request)
+            finally:
+                handling = False
+            if request.watching:
+                receive = request.receive_after_body
+            await response(request.scope, receive, send)
+        except asyncio.CancelledError:
+            if not cancelled:
+                raise
+            self.disconnects += 1
+            return None
+        finally:
+            request.stop_watching()
+        return response
+
+    def _disconnect_metrics(self):
+        return (
+            ("xylen_client_disconnects_total", "counter",
+             "Requests whose handler was cancelled because the client went away.", self.disconnects),
+        )
 
     async def _handle_request(self, request: "Request"):
-        handler, kwargs = self.router.resolve(request.path, request.method)
-        if handler is None:
+        route, kwargs, allowed = self.router.match_scope(request.scope)
+        if route is None:
+            if allowed:
+                return PlainTextResponse(
+                    "Method Not Allowed",
+                    status_code=405,
+                    headers={"allow": ", ".join(allowed)},
+                )
             return PlainTextResponse("Not Found", status_code=404)
 
+        max_body_size = route.options.get("max_body_size", self.max_body_size)
+        if max_body_size is not None:
+            request.max_body_size = max_body_size
+            content_length = request.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > max_body_size:
+                return PlainTextResponse("Payload Too Large", status_code=413)
+
+        if route.injects_background:
+            request.background = BackgroundTasks()
+            kwargs = dict(kwargs, background=request.background)
+
+        trace = request.scope.get(TRACE_KEY)
+        if trace is not None:
+            started = perf_counter()
         try:
-            result = handler(request, **kwargs)
-            if asyncio.iscoroutine(result):
-                result = await result
-        except Exception as e:
+            if route.is_async:
+                result = await route.handler(request, **kwargs)
+            else:
+                if route.run_in_thread:
+                    result = await self.thread_pool.run(route.handler, request, **kwargs)
+                else:
+                    result = route.handler(request, **kwargs)
+                if inspect.iscoroutine(result):
+                    result = await result
+        except RequestBodyTooLarge:
+            return PlainTextResponse("Payload Too Large", status_code=413)
+        except ClientDisconnect:
+            # Nobody will read this; nginx's code for it, for the metrics.
+            self.disconnects += 1
+            return PlainTextResponse("Client Closed Request", status_code=499)
+        except Exception as exc:
+            request.scope[ERROR_KEY] = exc
+            logger.exception(
+                "Unhandled error in %s %s", request.scope["method"], route.path
+            )
             return PlainTextResponse("Internal Server Error", status_code=500)
 
+        if trace is not None:
+            started = trace.stage("handler", started)
+
         if isinstance(result, Response):
-            return result
+            response = result
         elif isinstance(result, dict):
-            return JSONResponse(result)
+            response = JSONResponse(result, encoder=self.json_encoder)
+        elif inspect.isgenerator(result) or inspect.isasyncgen(result):
+            response = StreamingResponse(result)
         else:
-            return PlainTextResponse(str(result))
+            response = PlainTextResponse(str(result))
+
+        if trace is not None:
+            trace.stage("serialize", started)
+        return response
 
     def run(self, host="127.0.0.1", port=8000, reload=False):
         raise RuntimeError("Use 'xylen run --app your_module:app' instead.")
+
+
+async def _call_hook(hook):
+    result = hook()
+    if inspect.isawaitable(result):
+        await result
@@ -0,0 +1,131 @@
+# xylen/background.py
+import asyncio
+import logging
+
+from .router import is_async_callable
+
+logger = logging.getLogger("xylen")
+
+
+class BackgroundTasks:
+    """Work to do once the response has been sent.
+
+    Attach it to a response (``Response(..., background=tasks)``) or take a
+    ``background`` parameter in the handler to have one passed in.  Tasks
+    run in order; one failing is logged and doesn't stop the others.
+    """
+
+    def __init__(self, tasks=None):
+        self.tasks = list(tasks or ())
+
+    def add_task(self, func, *args, **kwargs):
+        self.tasks.append((func, args, kwargs))
+
+    def __len__(self):
+        return len(self.tasks)
+
+    async def __call__(self, run_sync=None) -> int:
+        """Run every task and return how many failed.
+
+        Sync functions go through ``run_sync(func, *args, **kwargs)`` (the
+        app passes its thread pool) or are called inline without one.
+        """
+        failed = 0
+        for func, args, kwargs in self.tasks:
+            try:
+                if is_async_callable(func):
+                    await func(*args, **kwargs)
+                elif run_sync is not None:
+                    await run_sync(func, *args, **kwargs)
+                else:
+                    func(*args, **kwargs)
+            except Exception:
+                failed += 1
+                logger.exception("Background task %s failed", getattr(func, "__qualname__", func))
+        return failed
+
+
+class BackgroundRunner:
+    """Runs the app's background tasks.
+
+    By default a request's tasks run right after its response, before the
+    ASGI call returns.  With ``max_pending`` they go to an app-wide queue
+    drained by ``concurrency`` workers instead; when it is full the request
+    waits for room, so a spike can't pile up unbounded work.
+    """
+
+    def __init__(self, run_sync=None, max_pending: int = None, concurrency: int = 8):
+        if max_pending is not None and max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.run_sync = run_sync
+        self.max_pending = max_pending
+        self.concurrency = concurrency
+        self.completed = 0
+        self.failed = 0
+        self.waited = 0
+        # Created on first use, in the loop that serves requests.
+        self._loop = None
+        self._queue = None
+        self._workers = ()
+
+    async def __call__(self, tasks):
+        if self.max_pending is None:
+            await self._run(tasks)
+            return
+        queue = self._bind()
+        if queue.full():
+            self.waited += 1
+        await queue.put(tasks)
+
+    async def _run(self, tasks):
+        failed = await tasks(self.run_sync)
+        self.failed += failed
+        self.completed += len(tasks) - failed
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(self.max_pending)
+            self._workers = [loop.create_task(self._work()) for _ in range(self.concurrency)]
+        return self._queue
+
+    async def _work(self):
+        queue = self._queue
+        while True:
+            tasks = await queue.get()
+            try:
+                await self._run(tasks)
+            finally:
+                queue.task_done()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def join(self):
+        """Wait until every queued task has run."""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+
+    async def shutdown(self):
+        """Run what is queued, then stop the workers."""
+        if self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = ()
+        self._loop = self._queue = None
+
+    def metrics(self):
+        """Samples for ``Metrics.add_collector``."""
+        return (
+            ("xylen_background_tasks_completed_total", "counter", "Background tasks that ran to completion.",
+             self.completed),
+            ("xylen_background_tasks_failed_total", "counter", "Background tasks that raised.", self.failed),
+            ("xylen_background_tasks_pending", "gauge", "Requests' tasks waiting in the background queue.",
+             self.pending),
+            ("xylen_background_tasks_waited_total", "counter",
+             "Requests that waited for room in the full background queue.", self.waited),
+        )
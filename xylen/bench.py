@@ -0,0 +1,201 @@
+# Xylen/bench.py
+#
+# In-process load generator: drives an ASGI app directly (no sockets) and
+# reports throughput, latency percentiles and memory per target.
+import asyncio
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+
+class Target:
+    def __init__(self, path: str, method: str = "GET", headers=None, body: bytes = b"", name: str = None):
+        self.method = method.upper()
+        self.path, _, query = path.partition("?")
+        self.query_string = query.encode()
+        self.headers = [
+            (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items()
+        ]
+        self.body = body
+        self.name = name or f"{self.method} {path}"
+
+    @classmethod
+    def parse(cls, spec: str):
+        """``"/path"`` or ``"METHOD /path"``."""
+        method, _, path = spec.strip().rpartition(" ")
+        return cls(path, method or "GET")
+
+    def scope(self):
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": self.method,
+            "scheme": "http",
+            "path": self.path,
+            "raw_path": self.path.encode(),
+            "query_string": self.query_string,
+            "headers": list(self.headers),
+            "client": ("127.0.0.1", 50000),
+            "server": ("127.0.0.1", 8000),
+        }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile.
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+async def _request(app, target, counters):
+    request_sent = False
+    done = asyncio.Event()
+    status = None
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": target.body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(event):
+        nonlocal status
+        if event["type"] == "http.response.start":
+            status = event["status"]
+        elif event["type"] == "http.response.body":
+            counters[1] += len(event.get("body", b""))
+            if not event.get("more_body", False):
+                done.set()
+
+    await app(target.scope(), receive, send)
+    done.set()
+    if status is None or status >= 500:
+        counters[0] += 1
+    elif not 200 <= status < 300:
+        counters[2] += 1
+
+
+async def _run_target(app, target, requests, concurrency):
+    latencies = []
+    counters = [0, 0, 0]  # errors, response bytes, other non-2xx
+    remaining = requests
+    perf_counter = time.perf_counter
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = perf_counter()
+            try:
+                await _request(app, target, counters)
+            except Exception:
+                counters[0] += 1
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(1, min(concurrency, requests)))])
+    elapsed = perf_counter() - start
+    return latencies, elapsed, counters
+
+
+async def run_benchmark(app, targets, requests=10000, concurrency=32, warmup=200, trace_memory=False):
+    """Drive ``app`` with each target in turn; return a JSON-serializable report."""
+    results = {}
+    for target in targets:
+        if warmup:
+            await _run_target(app, target, warmup, concurrency)
+        if trace_memory:
+            tracemalloc.start()
+        latencies, elapsed, (errors, response_bytes, non_2xx) = await _run_target(
+            app, target, requests, concurrency
+        )
+        alloc_peak = None
+        if trace_memory:
+            alloc_peak = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+
+        latencies.sort()
+        results[target.name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "non_2xx": non_2xx,
+            "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+            "p999_ms": round(percentile(latencies, 0.999) * 1000, 4),
+            "bytes_per_response": response_bytes // max(1, len(latencies)),
+            "alloc_peak_kb": alloc_peak,
+            # Process-wide high-water mark after this target ran.
+            "peak_rss_kb": peak_rss_kb(),
+        }
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "requests": requests,
+            "concurrency": concurrency,
+        },
+        "peak_rss_kb": peak_rss_kb(),
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.10):
+    """Regressions of ``report`` against ``baseline`` beyond ``tolerance``."""
+    regressions = []
+    for name, base in baseline.get("results", {}).items():
+        current = report["results"].get(name)
+        if current is None:
+            continue
+        if base["rps"] and current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {current['rps']} < baseline {base['rps']}")
+        for key in ("p50_ms", "p99_ms"):
+            if base[key] and current[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {current[key]} > baseline {base[key]}")
+    return regressions
+
+
+def format_report(report):
+    lines = [
+        f"{'target':<40} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'alloc KB':>9}"
+    ]
+    for name, r in report["results"].items():
+        alloc = "-" if r["alloc_peak_kb"] is None else str(r["alloc_peak_kb"])
+        lines.append(
+            f"{name[:40]:<40} {r['rps']:>10.0f} {r['p50_ms']:>9.3f} "
+            f"{r['p99_ms']:>9.3f} {r['p999_ms']:>9.3f} {alloc:>9}"
+        )
+    if report.get("peak_rss_kb") is not None:
+        lines.append(f"peak RSS: {report['peak_rss_kb'] / 1024:.1f} MiB")
+    return "\n".join(lines)
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
@@ -0,0 +1,165 @@
+# xylen/channels.py
+import asyncio
+from collections import deque
+
+from .utils.json import dumps as json_dumps
+
+POLICIES = ("drop_oldest", "drop_newest", "disconnect")
+
+
+class Subscription:
+    """One subscriber's bounded queue of encoded messages.
+
+    Iterate it (``async for payload in subscription``) or hand it to
+    ``WebSocket.relay``; it ends when closed, by either side, or when the
+    ``disconnect`` policy drops it as too slow (``overflowed`` is then set).
+    """
+
+    __slots__ = ("channel", "max_queue", "policy", "closed", "overflowed", "dropped", "_queue", "_waiter")
+
+    def __init__(self, channel, max_queue, policy):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy!r}")
+        self.channel = channel
+        self.max_queue = max_queue
+        self.policy = policy
+        self.closed = False
+        self.overflowed = False
+        self.dropped = 0
+        self._queue = deque()
+        self._waiter = None
+
+    def put(self, payload) -> bool:
+        if self.closed:
+            return False
+        queue = self._queue
+        if len(queue) >= self.max_queue:
+            self.dropped += 1
+            self.channel.dropped += 1
+            if self.policy == "drop_newest":
+                return False
+            if self.policy == "disconnect":
+                self.overflowed = True
+                self.channel.disconnected += 1
+                self.close()
+                return False
+            queue.popleft()
+        queue.append(payload)
+        self._wake()
+        return True
+
+    def pop(self):
+        """The next queued payload, or ``None`` if there is none yet."""
+        if self._queue:
+            return self._queue.popleft()
+        return None
+
+    async def wait(self):
+        """Return once a payload is queued or the subscription is closed."""
+        if self._queue or self.closed:
+            return
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    async def get(self):
+        """The next payload, or ``None`` once the subscription has ended."""
+        while True:
+            payload = self.pop()
+            if payload is not None or self.closed:
+                return payload
+            await self.wait()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        payload = await self.get()
+        if payload is None:
+            raise StopAsyncIteration
+        return payload
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.channel._subscribers.pop(self, None)
+            self._wake()
+
+    def _wake(self):
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Channel:
+    """In-process pub/sub: ``publish`` encodes a message once and queues the
+    result for every subscriber without waiting on any of them.
+
+    Each subscriber gets a queue of at most ``max_queue`` messages.  When a
+    slow one's queue is full, ``policy`` decides: ``"drop_oldest"`` makes
+    room by discarding its oldest message, ``"drop_newest"`` discards the
+    new one, and ``"disconnect"`` ends its subscription.
+
+    ``str`` and ``bytes`` messages are sent as they are; anything else is
+    encoded to JSON text with ``encoder``.
+    """
+
+    def __init__(self, max_queue: int = 64, policy: str = "drop_oldest", encoder=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy!r}")
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.encoder = encoder or json_dumps
+        # Used as an ordered set: O(1) unsubscribe.
+        self._subscribers = {}
+        self.published = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    def subscribe(self, max_queue: int = None, policy: str = None) -> Subscription:
+        subscription = Subscription(self, max_queue or self.max_queue, policy or self.policy)
+        self._subscribers[subscription] = None
+        return subscription
+
+    def encode(self, message):
+        if isinstance(message, (str, bytes)):
+            return message
+        body = self.encoder(message)
+        return body.decode("utf-8") if isinstance(body, bytes) else body
+
+    def publish(self, message) -> int:
+        """Queue ``message`` for every subscriber; return how many took it."""
+        payload = self.encode(message)
+        self.published += 1
+        delivered = 0
+        # ``put`` may unsubscribe a slow consumer, so iterate over a copy.
+        for subscription in tuple(self._subscribers):
+            if subscription.put(payload):
+                delivered += 1
+        return delivered
+
+    def close(self):
+        """End every subscription."""
+        for subscription in tuple(self._subscribers):
+            subscription.close()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+        }
@@ -1,8 +1,10 @@
 # xylen/cli.py
 import sys
 import argparse
-import importlib
+import importlib.util
 import os
+import re
+import subprocess
 from pathlib import Path
 
 from .app import Xylen
@@ -12,7 +14,8 @@ def eprint(msg: str) -> None:
     print(msg, file=sys.stderr)
 
 
-def resolve_import_string(import_str: str) -> str:
+def split_import_string(import_str: str):
+    """Return ``(module_name, attr_name)``, putting the module's directory on ``sys.path``."""
     if ':' not in import_str:
         eprint(f"Invalid --app format: {import_str!r} (expected 'module:app' or 'file.py:app')")
         sys.exit(1)
@@ -33,7 +36,14 @@ def resolve_import_string(import_str: str) -> str:
         module_name = file_path.stem
     else:
         module_name = module_part
-        sys.path.insert(0, os.getcwd())
+        if os.getcwd() not in sys.path:
+            sys.path.insert(0, os.getcwd())
+
+    return module_name, attr_name
+
+
+def load_app(import_str: str) -> Xylen:
+    module_name, attr_name = split_import_string(import_str)
 
     try:
         module = importlib.import_module(module_name)
@@ -53,7 +63,200 @@ def resolve_import_string(import_str: str) -> str:
         eprint(f"'{import_str}' is not a Xylen instance (got {type(app).__name__})")
         sys.exit(1)
 
-    return import_str
+    return app
+
+
+def resolve_import_string(import_str: str) -> str:
+    """Check that ``import_str`` names an importable module, without running
+    it, and return it as the ``module:app`` string uvicorn's reloader imports
+    in its own worker process.
+    """
+    module_name, attr_name = split_import_string(import_str)
+    try:
+        spec = importlib.util.find_spec(module_name)
+    except ImportError as exc:
+        eprint(f"Cannot import module '{module_name}': {exc}")
+        sys.exit(1)
+    if spec is None:
+        eprint(f"Cannot find module '{module_name}'")
+        sys.exit(1)
+    return f"{module_name}:{attr_name}"
+
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s*(\d+) \|\s*(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(text: str):
+    """``[(module, self_us, cumulative_us, depth)]`` from ``-X importtime`` output."""
+    entries = []
+    for line in text.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def format_importtime(entries, top: int) -> str:
+    lines = [f"{'module':<50} {'self ms':>9} {'cumul ms':>9}"]
+    for module, self_us, cumulative_us, _ in sorted(entries, key=lambda e: e[2], reverse=True)[:top]:
+        lines.append(f"{module[:50]:<50} {self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}")
+    lines.append(f"{len(entries)} modules, {sum(e[1] for e in entries) / 1000:.1f} ms importing")
+    return "\n".join(lines)
+
+
+STARTUP_PROFILE = """\
+import sys, time
+start = time.perf_counter()
+from xylen.cli import load_app
+load_app(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+
+def startup_profile(args) -> None:
+    # A fresh interpreter, so nothing is already in sys.modules.
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_PROFILE, args.app],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    entries = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        eprint("\n".join(errors))
+        sys.exit(result.returncode)
+    print(format_importtime(entries, args.top))
+    print(f"load_app({args.app!r}): {float(result.stdout.split()[-1]) * 1000:.1f} ms")
+
+
+def default_bench_targets(app: Xylen):
+    from .bench import Target
+
+    targets = []
+    for route in app.router.routes:
+        if "GET" in route.methods and None not in route.segments:
+            targets.append(Target(route.path))
+    return targets
+
+
+def bench(args) -> None:
+    import asyncio
+
+    from .bench import Target, compare, format_report, load_report, run_benchmark, save_report
+
+    app = load_app(args.app)
+    if args.path:
+        targets = [Target.parse(spec) for spec in args.path]
+    else:
+        targets = default_bench_targets(app)
+    if not targets:
+        eprint("Nothing to benchmark: pass --path for routes with parameters")
+        sys.exit(1)
+
+    report = asyncio.run(run_benchmark(
+        app,
+        targets,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        warmup=args.warmup,
+        trace_memory=args.tracemalloc,
+    ))
+    print(format_report(report))
+
+    if args.output:
+        save_report(report, args.output)
+    if args.baseline:
+        regressions = compare(report, load_report(args.baseline), args.tolerance)
+        for regression in regressions:
+            eprint(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+def run_native(args) -> None:
+    from .server import run
+
+    if args.reload or args.command == "dev":
+        eprint("--reload needs uvicorn; use --server uvicorn")
+        sys.exit(1)
+
+    app = load_app(args.app)
+    print(f"Xylen serving on http://{args.host}:{args.port}")
+    if args.workers > 1:
+        run_supervisor(args, native_worker(app, args))
+        return
+    try:
+        run(app, args.host, args.port, keep_alive_timeout=args.keep_alive_timeout)
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+
+
+def worker_socket(sock, args):
+    # With --reuse-port every worker binds its own listening socket.
+    if sock is None:
+        from .server import bind_socket
+
+        sock = bind_socket(args.host, args.port, reuse_port=True)
+    return sock
+
+
+def native_worker(app, args):
+    from .server import run
+
+    def serve(sock, max_requests, ready):
+        run(
+            app,
+            sock=worker_socket(sock, args),
+            ready=ready,
+            max_requests=max_requests,
+            keep_alive_timeout=args.keep_alive_timeout,
+            graceful_timeout=args.graceful_timeout,
+        )
+
+    return serve
+
+
+def uvicorn_worker(app, args):
+    import uvicorn
+
+    class Server(uvicorn.Server):
+        # Report readiness only once lifespan startup is done and the
+        # worker is accepting, so a rolling restart never leaves a gap.
+        async def startup(self, sockets=None):
+            await super().startup(sockets=sockets)
+            if self.started and not self.should_exit:
+                self.ready()
+
+    def serve(sock, max_requests, ready):
+        config = uvicorn.Config(
+            app,
+            log_level=args.log_level,
+            limit_max_requests=max_requests,
+            timeout_keep_alive=int(args.keep_alive_timeout),
+            timeout_graceful_shutdown=args.graceful_timeout,
+        )
+        server = Server(config)
+        server.ready = ready
+        server.run(sockets=[worker_socket(sock, args)])
+
+    return serve
+
+
+def run_supervisor(args, serve) -> None:
+    from .supervisor import Supervisor
+
+    Supervisor(
+        serve,
+        args.workers,
+        host=args.host,
+        port=args.port,
+        reuse_port=args.reuse_port,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        graceful_timeout=args.graceful_timeout,
+    ).run()
 
 
 def main() -> None:
@@ -65,8 +268,9 @@ def main() -> None:
 
     parser.add_argument(
         "command",
-        choices=["run", "dev"],
-        help="run = production-like\n dev = with reload",
+        choices=["run", "dev", "bench", "startup-profile"],
+        help="run = production-like\n dev = with reload\n bench = in-process load test\n"
+             "startup-profile = import time of the app, per module",
     )
     parser.add_argument(
         "--app",
@@ -82,35 +286,87 @@ def main() -> None:
     parser.add_argument("--port", type=int, default=8000)
     parser.add_argument("--reload", action="store_true")
     parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--server",
+        choices=["auto", "native", "uvicorn"],
+        default="auto",
+        help="auto = uvicorn when installed, else the built-in server",
+    )
+    parser.add_argument("--keep-alive-timeout", type=float, default=5.0)
+
+    workers_group = parser.add_argument_group("workers (--workers > 1)")
+    workers_group.add_argument("--max-requests", type=int, help="recycle a worker after this many requests")
+    workers_group.add_argument("--max-requests-jitter", type=int, default=0)
+    workers_group.add_argument("--reuse-port", action="store_true", help="one SO_REUSEPORT socket per worker")
+    workers_group.add_argument("--graceful-timeout", type=float, default=30.0)
     parser.add_argument(
         "--log-level",
         choices=["critical", "error", "warning", "info", "debug", "trace"],
         default="info",
     )
 
-    args = parser.parse_args()
+    bench_group = parser.add_argument_group("bench")
+    bench_group.add_argument(
+        "--path",
+        action="append",
+        help="target as '/path' or 'METHOD /path' (repeatable)\n"
+             "default: every GET route without path parameters",
+    )
+    bench_group.add_argument("--requests", type=int, default=10000, help="requests per target")
+    bench_group.add_argument("--concurrency", type=int, default=32)
+    bench_group.add_argument("--warmup", type=int, default=200, help="untimed requests per target")
+    bench_group.add_argument("--tracemalloc", action="store_true", help="record peak allocations per target")
+    bench_group.add_argument("--output", help="write the JSON report here")
+    bench_group.add_argument("--baseline", help="JSON report to compare against; exit 1 on regressions")
+    bench_group.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
 
-    try:
-        import uvicorn
-    except ImportError:
-        eprint("uvicorn not found. Install it with: pip install uvicorn")
-        sys.exit(1)
+    profile_group = parser.add_argument_group("startup-profile")
+    profile_group.add_argument("--top", type=int, default=25, help="modules to list, slowest first")
+
+    args = parser.parse_args()
 
-    import_path = resolve_import_string(args.app)
+    if args.command == "bench":
+        bench(args)
+        return
+    if args.command == "startup-profile":
+        startup_profile(args)
+        return
 
     reload = args.reload or (args.command == "dev")
 
+    server = args.server
+    if server != "native":
+        try:
+            import uvicorn
+        except ImportError:
+            if server == "uvicorn" or reload:
+                eprint("uvicorn not found. Install it with: pip install uvicorn")
+                sys.exit(1)
+            server = "native"
+
+    if server == "native":
+        run_native(args)
+        return
+
     if reload and args.workers > 1:
         eprint("Warning: --workers > 1 is ignored when --reload is enabled")
         args.workers = 1
 
+    if args.workers > 1:
+        # Pre-fork: import once here and share the app with every worker.
+        run_supervisor(args, uvicorn_worker(load_app(args.app), args))
+        return
+
+    # The reloader imports the app in its own process, so only check the
+    # module exists here; otherwise import once and hand uvicorn the object.
+    target = resolve_import_string(args.app) if reload else load_app(args.app)
+
     try:
         uvicorn.run(
-            import_path,
+            target,
             host=args.host,
             port=args.port,
             reload=reload,
-            workers=args.workers,
             log_level=args.log_level,
             factory=False,
         )
@@ -122,4 +378,4 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,103 @@
+# Xylen/concurrency.py
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ThreadPool:
+    """Bounded executor for sync handlers, with saturation metrics.
+
+    All bookkeeping happens on the event loop thread, so the counters need
+    no locks; worker threads only report when they picked a call up.
+    """
+
+    def __init__(self, max_workers: int = None, thread_name_prefix: str = "xylen"):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = None
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.saturated = 0  # submissions that found every worker busy
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self.thread_name_prefix,
+            )
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        context = contextvars.copy_context()
+
+        self.submitted += 1
+        if self.in_flight >= self.max_workers:
+            self.saturated += 1
+        self.in_flight += 1
+        if self.in_flight > self.peak_in_flight:
+            self.peak_in_flight = self.in_flight
+
+        submitted_at = time.perf_counter()
+        try:
+            started_at, result = await loop.run_in_executor(
+                self.executor, context.run, _timed_call, call
+            )
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+        wait = started_at - submitted_at
+        self.wait_time_total += wait
+        if wait > self.wait_time_max:
+            self.wait_time_max = wait
+        return result
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.max_workers),
+            "peak_in_flight": self.peak_in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "saturated": self.saturated,
+            "wait_time_total": self.wait_time_total,
+            "wait_time_max": self.wait_time_max,
+        }
+
+    def metrics(self):
+        """Samples for ``Metrics.add_collector``."""
+        return (
+            ("xylen_thread_pool_max_workers", "gauge", "Threads available to sync handlers.", self.max_workers),
+            ("xylen_thread_pool_in_flight", "gauge", "Sync handler calls running or queued.", self.in_flight),
+            ("xylen_thread_pool_queued", "gauge", "Sync handler calls waiting for a thread.",
+             max(0, self.in_flight - self.max_workers)),
+            ("xylen_thread_pool_submitted_total", "counter", "Sync handler calls submitted.", self.submitted),
+            ("xylen_thread_pool_saturated_total", "counter",
+             "Submissions that found every thread busy.", self.saturated),
+            ("xylen_thread_pool_wait_seconds_total", "counter",
+             "Time calls spent queued for a thread.", self.wait_time_total),
+            ("xylen_thread_pool_wait_seconds_max", "gauge",
+             "Longest time a call spent queued for a thread.", self.wait_time_max),
+        )
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+def _timed_call(call):
+    started_at = time.perf_counter()
+    return started_at, call()
@@ -0,0 +1,146 @@
+# Xylen/datastructures.py
+from collections.abc import Mapping
+from urllib.parse import parse_qsl
+
+SCOPE_KEY = "xylen.headers"
+
+
+class Headers(Mapping):
+    """Case-insensitive, read-only multi-dict over ``scope["headers"]``.
+
+    ASGI servers send lowercase header names, so lookups only lowercase the
+    requested key.  Nothing is decoded up front: the raw pairs are indexed on
+    first access and a value is decoded only when it is read.  Use
+    :meth:`from_scope` so the request and every middleware share one
+    instance per request.
+    """
+
+    __slots__ = ("raw", "_scope", "_index", "_cookies", "_query_params")
+
+    def __init__(self, raw=(), scope=None):
+        self.raw = raw
+        self._scope = scope
+        self._index = None
+        self._cookies = None
+        self._query_params = None
+
+    @classmethod
+    def from_scope(cls, scope):
+        headers = scope.get(SCOPE_KEY)
+        if headers is None:
+            headers = scope[SCOPE_KEY] = cls(scope.get("headers", ()), scope)
+        return headers
+
+    def get_raw(self, name: bytes, default=None):
+        """First raw value for a lowercase ``bytes`` name, without decoding."""
+        index = self._index
+        if index is None:
+            # Reversed so the first occurrence of a repeated header wins.
+            index = self._index = dict(reversed(self.raw))
+        return index.get(name, default)
+
+    def getlist(self, key: str):
+        name = key.lower().encode("latin-1")
+        return [v.decode("latin-1") for k, v in self.raw if k == name]
+
+    def __getitem__(self, key: str):
+        value = self.get_raw(key.lower().encode("latin-1"))
+        if value is None:
+            raise KeyError(key)
+        return value.decode("latin-1")
+
+    def __contains__(self, key):
+        if not isinstance(key, str):
+            return False
+        return self.get_raw(key.lower().encode("latin-1")) is not None
+
+    def __iter__(self):
+        if self._index is None:
+            self.get_raw(b"")
+        return (name.decode("latin-1") for name in self._index)
+
+    def __len__(self):
+        if self._index is None:
+            self.get_raw(b"")
+        return len(self._index)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    @property
+    def cookies(self):
+        if self._cookies is None:
+            self._cookies = parse_cookies(self.get_raw(b"cookie", b""))
+        return self._cookies
+
+    @property
+    def query_params(self):
+        if self._query_params is None:
+            query_string = self._scope.get("query_string", b"") if self._scope else b""
+            self._query_params = QueryParams(query_string)
+        return self._query_params
+
+
+class QueryParams(Mapping):
+    """Read-only multi-dict over a raw query string, parsed on first access."""
+
+    __slots__ = ("_query_string", "_items", "_dict")
+
+    def __init__(self, query_string=b""):
+        if isinstance(query_string, bytes):
+            query_string = query_string.decode("latin-1")
+        self._query_string = query_string
+        self._items = None
+        self._dict = None
+
+    def _parse(self):
+        self._items = parse_qsl(self._query_string, keep_blank_values=True)
+        # Last value wins for plain lookups, like dict(parse_qsl(...)).
+        self._dict = dict(self._items)
+        return self._dict
+
+    def getlist(self, key: str):
+        if self._items is None:
+            self._parse()
+        return [v for k, v in self._items if k == key]
+
+    def multi_items(self):
+        if self._items is None:
+            self._parse()
+        return list(self._items)
+
+    def __getitem__(self, key: str):
+        d = self._dict if self._dict is not None else self._parse()
+        return d[key]
+
+    def __iter__(self):
+        d = self._dict if self._dict is not None else self._parse()
+        return iter(d)
+
+    def __len__(self):
+        d = self._dict if self._dict is not None else self._parse()
+        return len(d)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._query_string!r})"
+
+
+class State:
+    """Attribute namespace for resources shared across requests (``app.state``)."""
+
+    def __init__(self, state=None):
+        self.__dict__.update(state or {})
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.__dict__!r})"
+
+
+def parse_cookies(cookie_header: bytes):
+    cookies = {}
+    if not cookie_header:
+        return cookies
+    for pair in cookie_header.decode("latin-1").split(";"):
+        name, sep, value = pair.partition("=")
+        if sep:
+            cookies[name.strip()] = value.strip()
+    return cookies
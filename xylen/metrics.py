@@ -0,0 +1,324 @@
+# xylen/metrics.py
+import json
+import os
+from bisect import bisect_left
+from time import perf_counter
+
+from .response import Response
+from .router import Router
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Scope key under which the app leaves an exception raised by a handler.
+ERROR_KEY = "xylen.error"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Requests no route matched share one series so raw paths can't blow up the
+# label cardinality; unknown methods are folded the same way.
+UNMATCHED = "<unmatched>"
+KNOWN_METHODS = frozenset(
+    ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE", "CONNECT")
+)
+
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+
+class RouteMetrics:
+    """Counters for one (route template, method) pair.
+
+    Only the event loop thread updates them, so plain integer fields are
+    enough: no locks and no allocation per request.
+    """
+
+    __slots__ = ("route", "method", "requests", "statuses", "in_flight", "buckets", "sum", "exceptions")
+
+    def __init__(self, route, method, bucket_count):
+        self.route = route
+        self.method = method
+        self.requests = 0
+        self.statuses = [0] * len(STATUS_CLASSES)
+        self.in_flight = 0
+        self.buckets = [0] * (bucket_count + 1)
+        self.sum = 0.0
+        self.exceptions = {}
+
+    def snapshot(self):
+        return {
+            "route": self.route,
+            "method": self.method,
+            "requests": self.requests,
+            "statuses": list(self.statuses),
+            "in_flight": self.in_flight,
+            "buckets": list(self.buckets),
+            "sum": self.sum,
+            "exceptions": dict(self.exceptions),
+        }
+
+
+class _StatusSend:
+    __slots__ = ("send", "status")
+
+    def __init__(self, send):
+        self.send = send
+        self.status = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        await self.send(message)
+
+
+class Metrics:
+    """Per-route request counts, status classes, in-flight gauges and latency
+    histograms, rendered in the Prometheus text format at ``path``.
+
+    ``mode="worker"`` reports this process only.  ``mode="aggregate"`` is for
+    ``--workers N``: every worker writes a snapshot to ``directory`` at most
+    once per ``flush_interval`` seconds, and a scrape on any worker sums the
+    snapshots of all of them.  Counters of exited workers are kept so totals
+    never go backwards; their in-flight gauges are dropped.
+    """
+
+    def __init__(
+        self,
+        path="/metrics",
+        mode="worker",
+        directory=None,
+        buckets=DEFAULT_BUCKETS,
+        flush_interval=1.0,
+        router=None,
+    ):
+        if mode not in ("worker", "aggregate"):
+            raise ValueError(f"Unknown metrics mode: {mode!r}")
+        buckets = tuple(sorted(float(b) for b in buckets))
+        if not buckets:
+            raise ValueError("At least one histogram bucket is required")
+
+        self.path = path
+        self.mode = mode
+        self.buckets = buckets
+        self.flush_interval = flush_interval
+        self.router = router or Router()
+        self.directory = None
+        if mode == "aggregate":
+            import tempfile
+
+            # Uvicorn workers share their supervisor as parent process.
+            self.directory = directory or os.environ.get("XYLEN_METRICS_DIR") or os.path.join(
+                tempfile.gettempdir(), f"xylen-metrics-{os.getppid()}"
+            )
+            os.makedirs(self.directory, exist_ok=True)
+        self._last_flush = 0.0
+        # route -> {method: RouteMetrics}, filled when routes are registered.
+        self._routes = {}
+        self._unmatched = {}
+        self._collectors = []
+
+    def add_collector(self, collector):
+        """Report extra process-wide values on every scrape.
+
+        ``collector()`` returns ``(name, kind, help, value)`` tuples with
+        ``kind`` ``"counter"`` or ``"gauge"``.  In aggregate mode the values
+        of all workers are summed, except names ending in ``_max``, which
+        take the maximum.
+        """
+        self._collectors.append(collector)
+
+    def samples(self):
+        return [list(sample) for collector in self._collectors for sample in collector()]
+
+    def register(self, route):
+        """Preallocate the series of ``route``; called by ``Xylen.add_route``."""
+        by_method = self._routes.setdefault(route, {})
+        for method in route.methods:
+            if method not in by_method:
+                by_method[method] = RouteMetrics(route.path, method, len(self.buckets))
+
+    def series_for(self, scope):
+        route = self.router.match_scope(scope)[0]
+        method = scope["method"]
+        if route is not None:
+            series = self._routes.get(route, {}).get(method)
+            if series is not None:
+                return series
+            path = route.path
+        else:
+            path = UNMATCHED
+            if method not in KNOWN_METHODS:
+                method = "OTHER"
+        series = self._unmatched.get((path, method))
+        if series is None:
+            series = self._unmatched[path, method] = RouteMetrics(path, method, len(self.buckets))
+        return series
+
+    async def observe(self, app, scope, receive, send):
+        series = self.series_for(scope)
+        series.in_flight += 1
+        send = _StatusSend(send)
+        start = perf_counter()
+        try:
+            await app(scope, receive, send)
+        except BaseException as exc:
+            scope.setdefault(ERROR_KEY, exc)
+            raise
+        finally:
+            end = perf_counter()
+            elapsed = end - start
+            series.in_flight -= 1
+            series.requests += 1
+            status_class = (send.status or 500) // 100 - 1
+            if 0 <= status_class < 5:
+                series.statuses[status_class] += 1
+            series.sum += elapsed
+            series.buckets[bisect_left(self.buckets, elapsed)] += 1
+            error = scope.get(ERROR_KEY)
+            if error is not None:
+                name = type(error).__name__
+                series.exceptions[name] = series.exceptions.get(name, 0) + 1
+            if self.directory is not None and end - self._last_flush >= self.flush_interval:
+                self._last_flush = end
+                self.flush()
+
+    def snapshot(self):
+        series = [s for by_method in self._routes.values() for s in by_method.values()]
+        series.extend(self._unmatched.values())
+        return {
+            "buckets": list(self.buckets),
+            "series": [s.snapshot() for s in series],
+            "samples": self.samples(),
+        }
+
+    def flush(self):
+        """Write this worker's snapshot to the shared directory atomically."""
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def collect(self):
+        """``(series, samples)`` to report: this worker's, or every worker's summed."""
+        if self.directory is None:
+            snapshot = self.snapshot()
+            return snapshot["series"], snapshot["samples"]
+
+        self.flush()
+        merged = {}
+        samples = {}
+        pid = os.getpid()
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced, or not ours
+            if data.get("buckets") != list(self.buckets):
+                continue
+            alive = _pid_alive(name[:-5], pid)
+            for sample_name, kind, help_text, value in data.get("samples", ()):
+                # Gauges describe live processes only.
+                if kind == "gauge" and not alive:
+                    continue
+                total = samples.get(sample_name)
+                if total is None:
+                    samples[sample_name] = [sample_name, kind, help_text, value]
+                elif sample_name.endswith("_max"):
+                    total[3] = max(total[3], value)
+                else:
+                    total[3] += value
+            for record in data["series"]:
+                key = (record["route"], record["method"])
+                total = merged.get(key)
+                if total is None:
+                    total = merged[key] = RouteMetrics(key[0], key[1], len(self.buckets)).snapshot()
+                total["requests"] += record["requests"]
+                total["sum"] += record["sum"]
+                if alive:
+                    total["in_flight"] += record["in_flight"]
+                for i, count in enumerate(record["statuses"]):
+                    total["statuses"][i] += count
+                for i, count in enumerate(record["buckets"]):
+                    total["buckets"][i] += count
+                for exc, count in record["exceptions"].items():
+                    total["exceptions"][exc] = total["exceptions"].get(exc, 0) + count
+        return list(merged.values()), list(samples.values())
+
+    def render(self):
+        series, samples = self.collect()
+        return render_prometheus(series, self.buckets, samples)
+
+    async def endpoint(self, request):
+        return Response(self.render().encode("utf-8"), headers={"content-type": CONTENT_TYPE})
+
+
+def _pid_alive(name, own_pid):
+    try:
+        pid = int(name)
+    except ValueError:
+        return False
+    if pid == own_pid:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_float(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def render_prometheus(series, buckets, samples=()):
+    """Render series snapshots in the Prometheus text exposition format."""
+    requests = [
+        "# HELP xylen_requests_total HTTP requests by route template, method and status class.",
+        "# TYPE xylen_requests_total counter",
+    ]
+    in_flight = [
+        "# HELP xylen_requests_in_flight HTTP requests currently being served.",
+        "# TYPE xylen_requests_in_flight gauge",
+    ]
+    duration = [
+        "# HELP xylen_request_duration_seconds HTTP request latency.",
+        "# TYPE xylen_request_duration_seconds histogram",
+    ]
+    exceptions = [
+        "# HELP xylen_exceptions_total Exceptions raised while serving a request.",
+        "# TYPE xylen_exceptions_total counter",
+    ]
+    bounds = [_format_float(b) for b in buckets] + ["+Inf"]
+
+    for record in sorted(series, key=lambda r: (r["route"], r["method"])):
+        labels = f'route="{_escape(record["route"])}",method="{_escape(record["method"])}"'
+        for status_class, count in zip(STATUS_CLASSES, record["statuses"]):
+            if count:
+                requests.append(f'xylen_requests_total{{{labels},status="{status_class}"}} {count}')
+        in_flight.append(f"xylen_requests_in_flight{{{labels}}} {record['in_flight']}")
+        cumulative = 0
+        for bound, count in zip(bounds, record["buckets"]):
+            cumulative += count
+            duration.append(f'xylen_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        duration.append(f"xylen_request_duration_seconds_sum{{{labels}}} {_format_float(record['sum'])}")
+        duration.append(f"xylen_request_duration_seconds_count{{{labels}}} {record['requests']}")
+        for exc, count in sorted(record["exceptions"].items()):
+            exceptions.append(f'xylen_exceptions_total{{{labels},exception="{_escape(exc)}"}} {count}')
+
+    lines = requests + in_flight + duration + exceptions
+    for name, kind, help_text, value in samples:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {_format_float(value) if isinstance(value, float) else value}")
+    return "\n".join(lines) + "\n"
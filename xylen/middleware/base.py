@@ -0,0 +1,58 @@
+# xylen/middleware/base.py
+
+
+class Middleware:
+    """Hook-based middleware that Xylen fuses into one flat pipeline.
+
+    ``before_request`` runs in registration order and may return a
+    ``Response`` to short-circuit the request.  ``on_response_start`` runs
+    for every response that passed through this middleware and mutates the
+    shared ``headers`` list of the ``http.response.start`` event in place.
+    Override only the hooks you need; untouched ones are skipped entirely.
+
+    Instances remain usable as plain ASGI middleware around ``app``.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+
+    async def before_request(self, scope):
+        return None
+
+    def on_response_start(self, scope, status, headers):
+        pass
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        response = await self.before_request(scope)
+        if response is not None:
+            return await response(scope, receive, send)
+        if type(self).on_response_start is Middleware.on_response_start:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, HookedSend(scope, send, (self.on_response_start,)))
+
+
+class HookedSend:
+    """``send`` wrapper applying ``on_response_start`` hooks to the start event."""
+
+    __slots__ = ("scope", "send", "hooks")
+
+    def __init__(self, scope, send, hooks):
+        self.scope = scope
+        self.send = send
+        self.hooks = hooks
+
+    async def __call__(self, event):
+        if event["type"] == "http.response.start":
+            headers = event.get("headers")
+            if type(headers) is not list:
+                headers = event["headers"] = list(headers or ())
+            status = event["status"]
+            for hook in self.hooks:
+                hook(self.scope, status, headers)
+        await self.send(event)
+
+
+def overrides(middleware, hook: str) -> bool:
+    return getattr(type(middleware), hook) is not getattr(Middleware, hook)
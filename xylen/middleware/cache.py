@@ -0,0 +1,186 @@
+# xylen/middleware/cache.py
+import asyncio
+import time
+from collections import OrderedDict
+
+from ..datastructures import Headers
+
+
+class _Entry:
+    __slots__ = ("expires", "status", "headers", "body", "size")
+
+    def __init__(self, expires, status, headers, body):
+        self.expires = expires
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers)
+
+
+class CacheMiddleware:
+    """In-memory cache of complete GET responses.
+
+    Routes opt in with ``cache_ttl=<seconds>``; ``ttl`` caches every GET
+    route that doesn't set its own.  Entries are keyed on method, path,
+    query string and the ``vary`` request headers, and evicted LRU-first
+    once ``max_bytes`` is exceeded.  Concurrent misses for the same key run
+    the handler once and share its result.
+    """
+
+    def __init__(
+        self,
+        app,
+        router=None,
+        ttl: float = None,
+        max_bytes: int = 8 * 1024 * 1024,
+        vary=None,
+        methods=("GET",),
+    ):
+        self.app = app
+        self.router = router
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.vary = [h.lower().encode("latin-1") for h in (vary or [])]
+        self.methods = {m.upper() for m in methods}
+
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            return await self.app(scope, receive, send)
+
+        ttl = self._route_ttl(scope)
+        if not ttl:
+            return await self.app(scope, receive, send)
+
+        key = self._key(scope)
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return await self._send_entry(entry, send)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            entry = await asyncio.shield(inflight)
+            if entry is not None:
+                self.hits += 1
+                return await self._send_entry(entry, send)
+            return await self.app(scope, receive, send)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        entry = None
+        try:
+            entry = await self._fill(scope, receive, send, key, ttl)
+        finally:
+            del self._inflight[key]
+            future.set_result(entry)
+
+    def _route_ttl(self, scope):
+        if self.router is None:
+            return self.ttl
+        route = self.router.match_scope(scope)[0]
+        if route is None:
+            return None
+        return route.options.get("cache_ttl", self.ttl)
+
+    def _key(self, scope):
+        key = (scope["method"], scope["path"], scope.get("query_string", b""))
+        if self.vary:
+            headers = Headers.from_scope(scope)
+            key += tuple(headers.get_raw(name) for name in self.vary)
+        return key
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def _send_entry(self, entry, send):
+        await send({
+            "type": "http.response.start",
+            "status": entry.status,
+            "headers": list(entry.headers),
+        })
+        await send({"type": "http.response.body", "body": entry.body})
+
+    async def _fill(self, scope, receive, send, key, ttl):
+        start = None
+        chunks = []
+        size = 0
+        cacheable = True
+
+        async def capture_send(event):
+            nonlocal start, size, cacheable
+            if event["type"] == "http.response.start":
+                # Snapshot the app's own headers: the hooks outside the cache
+                # (CORS, CSRF, ...) add per-client headers to what we pass on
+                # and run again for every hit.
+                headers = tuple(event.get("headers") or ())
+                start = (event["status"], headers)
+                cacheable = event["status"] == 200 and self._storable(headers)
+                event = dict(event, headers=list(headers))
+            elif event["type"] == "http.response.body" and cacheable:
+                chunk = event.get("body", b"")
+                size += len(chunk)
+                if size > self.max_bytes:
+                    cacheable = False
+                    chunks.clear()
+                else:
+                    chunks.append(chunk)
+            await send(event)
+
+        await self.app(scope, receive, capture_send)
+
+        if start is None or not cacheable:
+            return None
+        entry = _Entry(time.monotonic() + ttl, start[0], start[1], b"".join(chunks))
+        self._store(key, entry)
+        return entry
+
+    def _storable(self, headers):
+        for name, value in headers:
+            name = name.lower()
+            if name == b"set-cookie":
+                return False
+            if name == b"cache-control" and (b"no-store" in value or b"private" in value):
+                return False
+        return True
+
+    def _store(self, key, entry):
+        if entry.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key).size
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
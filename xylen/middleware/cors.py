@@ -1,70 +1,122 @@
 # zephyrpy/middleware/cors.py
-class CORSMiddleware:
+from ..datastructures import Headers
+from ..response import Response
+from .base import Middleware
+
+SCOPE_KEY = "xylen.cors"
+
+
+class CORSMiddleware(Middleware):
+    """CORS headers from blocks encoded at init and memoized per origin.
+
+    Preflights (``OPTIONS``) are answered from a prebuilt response; with
+    ``max_age`` browsers cache them.  Pass ``router`` and
+    ``preflight_unknown_paths=False`` to answer preflights for paths the
+    router doesn't know with 404 instead.
+    """
+
     def __init__(
         self,
-        app,
+        app=None,
         allow_origins=None,
         allow_methods=None,
         allow_headers=None,
+        expose_headers=None,
+        allow_credentials: bool = False,
+        max_age: int = None,
+        origin_cache_size: int = 256,
+        router=None,
+        preflight_unknown_paths: bool = True,
     ):
-        self.app = app
+        super().__init__(app)
         self.allow_origins = set(allow_origins or ["*"])
         self.allow_methods = set(m.upper() for m in (allow_methods or ["*"]))
         self.allow_headers = set(h.lower() for h in (allow_headers or ["*"]))
+        self.allow_credentials = allow_credentials
+        self.origin_cache_size = origin_cache_size
+        self.router = router
+        self.preflight_unknown_paths = preflight_unknown_paths
+        self._allow_all_origins = "*" in self.allow_origins
 
-    async def __call__(self, scope, receive, send):
-        if scope["type"] != "http":
-            return await self.app(scope, receive, send)
-
-        method = scope["method"]
-        headers = dict(scope.get("headers", []))
-        origin = headers.get(b"origin", b"").decode()
+        # Everything that doesn't depend on the request origin, encoded once.
+        simple = []
+        if allow_credentials:
+            simple.append((b"access-control-allow-credentials", b"true"))
+        if expose_headers:
+            simple.append((b"access-control-expose-headers", ", ".join(expose_headers).encode()))
+        # A literal "*" is only valid without credentials; otherwise the
+        # origin is echoed and caches must key on it.
+        self._echo_origin = allow_credentials or not self._allow_all_origins
+        if self._echo_origin:
+            simple.append((b"vary", b"Origin"))
+        self._simple_headers = tuple(simple)
 
-        # Build CORS headers once
-        cors_headers = self._build_cors_headers(origin)
-
-        if method == "OPTIONS":
-            await send(
-                {
-                    "type": "http.response.start",
-                    "status": 200,
-                    "headers": list(cors_headers.items()),
-                }
-            )
-            await send({"type": "http.response.body", "body": b""})
-            return
+        if "*" in self.allow_methods:
+            methods = b"GET, POST, PUT, PATCH, DELETE, OPTIONS"
+        else:
+            methods = ", ".join(sorted(self.allow_methods)).encode()
+        preflight = [(b"access-control-allow-methods", methods)]
+        # Browsers ignore a wildcard allow-headers on credentialed requests.
+        self._echo_request_headers = "*" in self.allow_headers and allow_credentials
+        if not self._echo_request_headers:
+            if "*" in self.allow_headers:
+                allowed_headers = b"*"
+            else:
+                allowed_headers = ", ".join(sorted(self.allow_headers)).encode()
+            preflight.append((b"access-control-allow-headers", allowed_headers))
+        if max_age is not None:
+            preflight.append((b"access-control-max-age", str(int(max_age)).encode()))
+        self._preflight_headers = tuple(preflight)
 
-        # Wrap send to inject CORS headers for ALL methods
-        async def wrapped_send(event):
-            if event["type"] == "http.response.start":
-                existing = dict(event.get("headers", []))
-                existing.update(cors_headers)
-                event["headers"] = list(existing.items())
-            await send(event)
+        self._origins = {}
+        self._not_found = Response(b"Not Found", 404, {b"content-type": b"text/plain; charset=utf-8"})
 
-        await self.app(scope, receive, wrapped_send)
+    async def before_request(self, scope):
+        headers = Headers.from_scope(scope)
+        block = self._block_for(headers.get_raw(b"origin", b""))
+        scope[SCOPE_KEY] = block
 
-    def _build_cors_headers(self, origin: str):
-        headers = {}
+        if scope["method"] == "OPTIONS":
+            if not self.preflight_unknown_paths and self.router is not None:
+                route, _, allowed = self.router.match_scope(scope)
+                if route is None and not allowed:
+                    return self._not_found
+            if self._echo_request_headers:
+                requested = headers.get_raw(b"access-control-request-headers")
+                if requested:
+                    return Response(
+                        b"", 200,
+                        dict(block[1] + ((b"access-control-allow-headers", requested),)),
+                    )
+            return block[2]
+        return None
 
-        if "*" in self.allow_origins or origin in self.allow_origins:
-            headers[b"access-control-allow-origin"] = (
-                origin.encode() if origin else b"*"
-            )
+    def on_response_start(self, scope, status, headers):
+        block = scope.get(SCOPE_KEY)
+        if block is not None:
+            headers.extend(block[1])
 
-        if "*" in self.allow_methods:
-            headers[b"access-control-allow-methods"] = (
-                b"GET, POST, PUT, PATCH, DELETE, OPTIONS"
-            )
-        else:
-            methods = ", ".join(sorted(self.allow_methods))
-            headers[b"access-control-allow-methods"] = methods.encode()
+    def _block_for(self, origin: bytes):
+        block = self._origins.get(origin)
+        if block is None:
+            if len(self._origins) >= self.origin_cache_size:
+                del self._origins[next(iter(self._origins))]
+            block = self._origins[origin] = self._build_block(origin)
+        return block
 
-        if "*" in self.allow_headers:
-            headers[b"access-control-allow-headers"] = b"*"
-        else:
-            headers[b"access-control-allow-headers"] = ", ".join(
-                sorted(self.allow_headers)
-            ).encode()
+    def _build_block(self, origin: bytes):
+        """``(origin, response headers, prebuilt preflight Response)``."""
+        allowed = self._allow_all_origins or origin.decode("latin-1") in self.allow_origins
+        headers = []
+        if allowed:
+            if not self._echo_origin:
+                headers.append((b"access-control-allow-origin", b"*"))
+            elif origin:
+                headers.append((b"access-control-allow-origin", origin))
+            headers.extend(self._simple_headers)
+        elif self._echo_origin:
+            headers.append((b"vary", b"Origin"))
+        headers = tuple(headers)
 
-        return headers
+        preflight_headers = headers + self._preflight_headers if allowed else headers
+        return origin, headers, Response(b"", 200, dict(preflight_headers))
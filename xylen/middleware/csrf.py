@@ -1,8 +1,17 @@
 # zephyrpy/middleware/csrf.py
+import base64
+import hashlib
+import hmac
 import os
 import secrets
-import hashlib
+from ..datastructures import Headers
 from ..response import PlainTextResponse
+from .base import Middleware
+
+SCOPE_KEY = "xylen.csrf_token"
+MIDDLEWARE_KEY = "xylen.csrf"
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "TRACE"))
+
 
 def generate_csrf_token() -> str:
     return secrets.token_urlsafe(32)
@@ -10,55 +19,108 @@ def generate_csrf_token() -> str:
 def hash_token(token: str, secret: str) -> str:
     return hashlib.sha256((token + secret).encode()).hexdigest()
 
-class CSRFMiddleware:
-    def __init__(self, app, secret_key: str = None, cookie_name: str = "csrftoken", header_name: str = "X-CSRF-Token"):
-        self.app = app
+def get_csrf_token(scope) -> str:
+    """The request's CSRF token, minting (and later setting) one if needed.
+
+    Call it from a handler to embed the token in a form or page.
+    """
+    token = scope.get(SCOPE_KEY)
+    if token is None:
+        token = scope[SCOPE_KEY] = scope[MIDDLEWARE_KEY].mint_token()
+        scope[MIDDLEWARE_KEY + ".new"] = True
+    return token
+
+class CSRFMiddleware(Middleware):
+    """Double-submit cookie check.
+
+    Unsafe requests must echo the cookie token in ``header_name``; the two
+    are compared with ``hmac.compare_digest``.  With ``signed=True``
+    tokens are ``<random>.<HMAC(secret, random)>`` and the cookie's
+    signature is verified once, so a token can't be planted without the
+    secret.  The cookie is only minted when a response actually needs it.
+    ``exempt_paths`` prefixes and routes with ``csrf_exempt=True`` skip the
+    check (e.g. webhooks).
+    """
+
+    def __init__(
+        self,
+        app=None,
+        secret_key: str = None,
+        cookie_name: str = "csrftoken",
+        header_name: str = "X-CSRF-Token",
+        signed: bool = False,
+        exempt_paths=None,
+        router=None,
+    ):
+        super().__init__(app)
         self.secret_key = secret_key or os.getenv("zephyrpy_SECRET_KEY") or generate_csrf_token()
         self.cookie_name = cookie_name
-        self.header_name = header_name.lower().replace("-", "_")
-
-    async def __call__(self, scope, receive, send):
-        if scope["type"] != "http":
-            return await self.app(scope, receive, send)
-
-        method = scope["method"]
-        headers = dict(scope.get("headers", []))
-        cookies_raw = headers.get(b"cookie", b"").decode()
-        cookies = {}
-        for pair in cookies_raw.split(";"):
-            if "=" in pair:
-                k, v = pair.strip().split("=", 1)
-                cookies[k] = v
-
-        csrf_token = cookies.get(self.cookie_name)
-        if not csrf_token:
-            csrf_token = generate_csrf_token()
-
-        if method in ("GET", "HEAD", "OPTIONS", "TRACE"):
-            pass
-        else:
-            expected_hash = hash_token(csrf_token, self.secret_key)
-            submitted_token = None
-            header_key = self.header_name.encode()
-            if header_key in headers:
-                submitted_token = headers[header_key].decode()
-
-            if not submitted_token or hash_token(submitted_token, self.secret_key) != expected_hash:
-                return await self._send_error(send, "CSRF token missing or invalid")
-
-        async def wrapped_send(event):
-            if event["type"] == "http.response.start":
-                has_cookie = any(
-                    h[0].decode() == "set-cookie" and self.cookie_name in h[1].decode()
-                    for h in event.get("headers", [])
-                )
-                if not has_cookie:
-                    cookie_value = f"{self.cookie_name}={csrf_token}; Path=/; SameSite=Lax; HttpOnly"
-                    event["headers"] = list(event.get("headers", [])) + [(b"set-cookie", cookie_value.encode())]
-            await send(event)
-
-        await self.app(scope, receive, wrapped_send)
-
-    async def _send_error(self, send, message: str):
-        response = PlainTextResponse(message, status_code=403)
-        await response({}, None, send)
\ No newline at end of file
+        self.header_name = header_name.lower().encode("latin-1")
+        self.signed = signed
+        self.exempt_paths = tuple(exempt_paths or ())
+        self.router = router
+        self._key = self.secret_key.encode()
+        self._cookie_prefix = f"{cookie_name}=".encode()
+
+    def mint_token(self) -> str:
+        if not self.signed:
+            return generate_csrf_token()
+        nonce = secrets.token_urlsafe(18)
+        return f"{nonce}.{self._sign(nonce)}"
+
+    def _sign(self, nonce: str) -> str:
+        digest = hmac.digest(self._key, nonce.encode(), "sha256")
+        return base64.urlsafe_b64encode(digest[:18]).decode()
+
+    def _valid_signature(self, token: str) -> bool:
+        nonce, sep, signature = token.partition(".")
+        return bool(sep) and hmac.compare_digest(signature, self._sign(nonce))
+
+    def _exempt(self, scope) -> bool:
+        if self.exempt_paths and scope["path"].startswith(self.exempt_paths):
+            return True
+        if self.router is not None:
+            route = self.router.match_scope(scope)[0]
+            return route is not None and route.options.get("csrf_exempt", False)
+        return False
+
+    async def before_request(self, scope):
+        if self._exempt(scope):
+            return None
+
+        headers = Headers.from_scope(scope)
+        csrf_token = headers.cookies.get(self.cookie_name) or None
+        scope[SCOPE_KEY] = csrf_token
+        scope[MIDDLEWARE_KEY] = self
+
+        if scope["method"] in SAFE_METHODS:
+            return None
+
+        submitted_token = headers.get_raw(self.header_name)
+        if (
+            csrf_token is None
+            or submitted_token is None
+            or not hmac.compare_digest(submitted_token, csrf_token.encode("latin-1"))
+            or (self.signed and not self._valid_signature(csrf_token))
+        ):
+            # Hand out a fresh token so the client can retry.
+            return PlainTextResponse(
+                "CSRF token missing or invalid",
+                status_code=403,
+                headers={b"set-cookie": self._cookie(self.mint_token())},
+            )
+        return None
+
+    def on_response_start(self, scope, status, headers):
+        if MIDDLEWARE_KEY not in scope:  # exempt
+            return
+        if scope[SCOPE_KEY] is not None and not scope.get(MIDDLEWARE_KEY + ".new"):
+            return
+        prefix = self._cookie_prefix
+        for name, value in headers:
+            if name == b"set-cookie" and value.startswith(prefix):
+                return
+        headers.append((b"set-cookie", self._cookie(get_csrf_token(scope))))
+
+    def _cookie(self, token: str) -> bytes:
+        return f"{self.cookie_name}={token}; Path=/; SameSite=Lax; HttpOnly".encode()
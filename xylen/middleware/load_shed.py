@@ -0,0 +1,206 @@
+# xylen/middleware/load_shed.py
+import asyncio
+import time
+from collections import deque
+
+from ..response import PlainTextResponse
+
+
+class _Limiter:
+    """Counting semaphore with FIFO hand-off.
+
+    Waiters are futures of the loop that awaits them, created per wait, so
+    one limiter is safe to share across event loops (``asyncio.run`` calls).
+    """
+
+    __slots__ = ("limit", "active", "waiters")
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiters = deque()
+
+    def try_acquire(self) -> bool:
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return True
+        return False
+
+    async def acquire(self, timeout) -> bool:
+        if self.try_acquire():
+            return True
+        if timeout <= 0:
+            return False
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        try:
+            await asyncio.wait((future,), timeout=timeout)
+        except BaseException:
+            self._abandon(future)
+            raise
+        if future.done():
+            return True
+        self._abandon(future)
+        return False
+
+    def _abandon(self, future):
+        if future.done() and not future.cancelled():
+            # The slot was handed over just as we gave up: pass it on.
+            self.release()
+            return
+        future.cancel()
+        try:
+            self.waiters.remove(future)
+        except ValueError:
+            pass
+
+    def release(self):
+        # Hand the slot straight to the next waiter; ``active`` is unchanged.
+        while self.waiters:
+            future = self.waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class _StartedSend:
+    __slots__ = ("send", "started")
+
+    def __init__(self, send):
+        self.send = send
+        self.started = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.started = True
+        await self.send(message)
+
+
+class LoadShedMiddleware:
+    """Caps the requests a worker handles at once, so overload sheds some
+    requests quickly instead of slowing every one of them down.
+
+    At most ``max_concurrency`` requests run at once, and at most the
+    route's ``max_concurrency=`` option for routes that set one.  Up to
+    ``max_queue`` more wait for a slot, each for at most ``max_wait``
+    seconds; the rest get an immediate 503 with ``Retry-After``.  A handler
+    running past ``timeout`` seconds (or the route's ``timeout=``) is
+    cancelled and answered with 504.
+    """
+
+    def __init__(
+        self,
+        app,
+        router=None,
+        max_concurrency: int = None,
+        max_queue: int = 100,
+        max_wait: float = 1.0,
+        timeout: float = None,
+        retry_after: int = 1,
+    ):
+        self.app = app
+        self.router = router
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._global = _Limiter(max_concurrency) if max_concurrency else None
+        # Route -> _Limiter, for routes with their own max_concurrency.
+        self._routes = {}
+        self._shed_response = PlainTextResponse(
+            "Service Unavailable", status_code=503, headers={"retry-after": str(retry_after)}
+        )
+        self._timeout_response = PlainTextResponse("Gateway Timeout", status_code=504)
+
+        self.queued = 0
+        self.shed = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route = self.router.match_scope(scope)[0] if self.router is not None else None
+        timeout = self.timeout
+        limiters = []
+        if route is not None:
+            timeout = route.options.get("timeout", timeout)
+            limiter = self._route_limiter(route)
+            if limiter is not None:
+                limiters.append(limiter)
+        if self._global is not None:
+            limiters.append(self._global)
+
+        acquired = []
+        deadline = None
+        try:
+            for limiter in limiters:
+                if not limiter.try_acquire():
+                    if deadline is None:
+                        deadline = time.monotonic() + self.max_wait
+                    if not await self._wait(limiter, deadline):
+                        self.shed += 1
+                        return await self._shed_response(scope, receive, send)
+                acquired.append(limiter)
+
+            if timeout is None:
+                return await self.app(scope, receive, send)
+            send = _StartedSend(send)
+            try:
+                await asyncio.wait_for(self.app(scope, receive, send), timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                if not send.started:
+                    await self._timeout_response(scope, receive, send)
+        finally:
+            for limiter in acquired:
+                limiter.release()
+
+    async def _wait(self, limiter, deadline):
+        # Route slots are taken before the global one, so a queued request
+        # never holds a global slot while it waits.
+        if self.queued >= self.max_queue:
+            return False
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            return await limiter.acquire(deadline - started)
+        finally:
+            self.queued -= 1
+            self.wait_time_total += time.monotonic() - started
+
+    def _route_limiter(self, route):
+        limiter = self._routes.get(route)
+        if limiter is None:
+            limit = route.options.get("max_concurrency")
+            if not limit:
+                return None
+            limiter = self._routes[route] = _Limiter(limit)
+        return limiter
+
+    @property
+    def in_flight(self) -> int:
+        return self._global.active if self._global is not None else 0
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+            "wait_time_total": self.wait_time_total,
+        }
+
+    def metrics(self):
+        """Samples for ``Metrics.add_collector``."""
+        return (
+            ("xylen_load_shed_in_flight", "gauge", "Requests holding a concurrency slot.", self.in_flight),
+            ("xylen_load_shed_queued", "gauge", "Requests waiting for a concurrency slot.", self.queued),
+            ("xylen_load_shed_rejected_total", "counter", "Requests shed with 503.", self.shed),
+            ("xylen_load_shed_timeouts_total", "counter", "Handlers cancelled for running past their timeout.",
+             self.timeouts),
+            ("xylen_load_shed_wait_seconds_total", "counter", "Time requests spent queued for a slot.",
+             self.wait_time_total),
+        )
@@ -1,41 +1,215 @@
 # zephyrpy/middleware/rate_limit.py
+import math
 import time
-from collections import defaultdict, deque
+from collections import deque
+from ..datastructures import Headers
 from ..response import PlainTextResponse
+from .base import Middleware
+from .rate_limit_storage import MemoryBackend
 
-class RateLimitMiddleware:
-    def __init__(self, app, max_requests: int = 100, window_seconds: int = 60):
-        self.app = app
+
+class SlidingLog:
+    """Exact limit from a log of timestamps: O(max_requests) memory per key."""
+
+    state_size = None
+
+    def __init__(self, max_requests: int, window_seconds: float):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        # {ip: deque([timestamps])}
-        self._requests = defaultdict(deque)
 
-    async def __call__(self, scope, receive, send):
-        if scope["type"] != "http":
-            return await self.app(scope, receive, send)
+    def hit(self, state, now):
+        if state is None:
+            state = deque()
+        while state and state[0] < now - self.window_seconds:
+            state.popleft()
+        if len(state) >= self.max_requests:
+            return False, state[0] + self.window_seconds - now, state
+        state.append(now)
+        return True, 0.0, state
+
+
+class TokenBucket:
+    """Bucket of ``max_requests`` tokens refilled over ``window_seconds``.
+
+    State is ``(tokens, last_refill)``; bursts up to the bucket size are allowed.
+    """
+
+    state_size = 2
+
+    def __init__(self, max_requests: int, window_seconds: float):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.rate = max_requests / window_seconds
+
+    def hit(self, state, now):
+        if state is None:
+            tokens = self.max_requests
+        else:
+            tokens = min(self.max_requests, state[0] + (now - state[1]) * self.rate)
+        if tokens < 1:
+            return False, (1 - tokens) / self.rate, (tokens, now)
+        return True, 0.0, (tokens - 1, now)
+
+
+class SlidingWindow:
+    """Fixed-window counters weighted across the window boundary.
+
+    State is ``(window_index, previous_count, current_count)``.
+    """
+
+    state_size = 3
+
+    def __init__(self, max_requests: int, window_seconds: float):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+
+    def hit(self, state, now):
+        index, offset = divmod(now, self.window_seconds)
+        if state is None:
+            previous = current = 0
+        else:
+            last_index, previous, current = state
+            if index != last_index:
+                previous = current if index - last_index == 1 else 0
+                current = 0
+        weight = 1 - offset / self.window_seconds
+        if previous * weight + current >= self.max_requests:
+            return False, self.window_seconds - offset, (index, previous, current)
+        return True, 0.0, (index, previous, current + 1)
 
-        client_ip = self._get_client_ip(scope)
-        now = time.time()
 
-        bucket = self._requests[client_ip]
-        while bucket and bucket[0] < now - self.window_seconds:
-            bucket.popleft()
+ALGORITHMS = {
+    "sliding_log": SlidingLog,
+    "token_bucket": TokenBucket,
+    "sliding_window": SlidingWindow,
+}
 
-        if len(bucket) >= self.max_requests:
-            response = PlainTextResponse(
+
+def client_ip(scope):
+    client = scope.get("client")
+    if client:
+        return client[0]  # IP
+    return "unknown"
+
+
+def forwarded_ip(scope):
+    """First address in X-Forwarded-For; only use behind a trusted proxy."""
+    forwarded = Headers.from_scope(scope).get_raw(b"x-forwarded-for")
+    if forwarded:
+        return forwarded.split(b",", 1)[0].strip().decode("latin-1")
+    return client_ip(scope)
+
+
+def header_key(name: str):
+    """Key on a request header such as an API key, falling back to the IP."""
+    raw_name = name.lower().encode("latin-1")
+
+    def key_func(scope):
+        value = Headers.from_scope(scope).get_raw(raw_name)
+        if value:
+            return value.decode("latin-1")
+        return client_ip(scope)
+
+    return key_func
+
+
+class RateLimitMiddleware(Middleware):
+    """Per-client rate limiting.
+
+    ``algorithm`` is one of ``sliding_log`` (exact, the default),
+    ``token_bucket`` or ``sliding_window``; the latter two keep O(1) state
+    per key.  State lives in ``backend`` (per-process ``MemoryBackend`` by
+    default; ``SharedMemoryBackend`` shares limits between workers), which
+    is swept of idle keys every ``sweep_interval``.
+    Routes may pass ``rate_limit={"max_requests": ..., "window_seconds": ...}``
+    for their own limit, or ``rate_limit=False`` to opt out.
+    """
+
+    def __init__(
+        self,
+        app=None,
+        max_requests: int = 100,
+        window_seconds: int = 60,
+        algorithm: str = "sliding_log",
+        key_func=None,
+        sweep_interval: float = None,
+        router=None,
+        backend=None,
+    ):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown rate limit algorithm: {algorithm!r}")
+        super().__init__(app)
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.algorithm = ALGORITHMS[algorithm]
+        self.backend = backend or MemoryBackend()
+        self.policy = self.algorithm(max_requests, window_seconds)
+        self.backend.check_policy(self.policy)
+        self.key_func = key_func or client_ip
+        self.router = router
+        self._route_policies = {}
+
+        # A key is only dropped after sitting idle for a whole interval, so
+        # the interval must cover the longest window.
+        self.sweep_interval = max(sweep_interval or window_seconds, window_seconds)
+        self._next_sweep = None
+
+    async def before_request(self, scope):
+        policy, namespace = self._policy_for(scope)
+        if policy is None:
+            return None
+
+        key = self.key_func(scope)
+        if namespace is not None:
+            key = (namespace, key)
+        now = time.time()
+        if self._next_sweep is None or now >= self._next_sweep:
+            self.sweep(now)
+        allowed, retry_after = await self.backend.hit(key, policy, now)
+
+        if not allowed:
+            return PlainTextResponse(
                 "Too Many Requests", status_code=429,
-                headers={"Retry-After": str(self.window_seconds)}
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
             )
-            await response({}, None, send)
-            return
+        return None
+
+    def _policy_for(self, scope):
+        if self.router is None:
+            return self.policy, None
+        route = self.router.match_scope(scope)[0]
+        if route is None or "rate_limit" not in route.options:
+            return self.policy, None
+        if route not in self._route_policies:
+            config = route.options["rate_limit"]
+            if config is False:
+                policy = None
+            else:
+                policy = self.algorithm(
+                    config.get("max_requests", self.max_requests),
+                    config.get("window_seconds", self.window_seconds),
+                )
+                self.backend.check_policy(policy)
+                self.sweep_interval = max(self.sweep_interval, policy.window_seconds)
+            self._route_policies[route] = policy
+        return self._route_policies[route], route.path
 
-        bucket.append(now)
+    async def hit(self, key, policy=None, now=None):
+        """Record a request for ``key``; return ``(allowed, retry_after)``."""
+        policy = policy or self.policy
+        if now is None:
+            now = time.time()
+        if self._next_sweep is None:
+            self._next_sweep = now + self.sweep_interval
+        elif now >= self._next_sweep:
+            self.sweep(now)
+        return await self.backend.hit(key, policy, now)
 
-        await self.app(scope, receive, send)
+    def sweep(self, now=None):
+        if now is None:
+            now = time.time()
+        self.backend.sweep(now)
+        self._next_sweep = now + self.sweep_interval
 
     def _get_client_ip(self, scope):
-        client = scope.get("client")
-        if client:
-            return client[0]  # IP
-        return "unknown"
\ No newline at end of file
+        return client_ip(scope)
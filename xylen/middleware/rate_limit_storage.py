@@ -0,0 +1,160 @@
+# xylen/middleware/rate_limit_storage.py
+import hashlib
+import mmap
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+
+class RateLimitBackend:
+    """Where rate limit state lives.
+
+    ``hit`` applies ``policy.hit(state, now)`` to the stored state for
+    ``key`` atomically and returns ``(allowed, retry_after)``.  It is async so
+    that a networked store (e.g. Redis running the policy as a script keyed
+    on ``policy.max_requests``/``policy.window_seconds``) can implement it.
+    """
+
+    async def hit(self, key, policy, now):
+        raise NotImplementedError
+
+    def check_policy(self, policy):
+        """Raise ``ValueError`` if ``policy`` can't be stored by this backend."""
+
+    def sweep(self, now):
+        """Drop idle keys; called by the middleware every ``sweep_interval``."""
+
+
+class MemoryBackend(RateLimitBackend):
+    """Per-process dicts; keys idle for a whole sweep interval are dropped.
+
+    Keys live in two generations that rotate on each sweep, so a sweep is
+    O(1) and a key survives as long as it is hit once per interval.
+    """
+
+    def __init__(self):
+        self._requests = {}
+        self._previous = {}
+
+    async def hit(self, key, policy, now):
+        state = self._requests.get(key)
+        if state is None and self._previous:
+            state = self._previous.pop(key, None)
+        allowed, retry_after, self._requests[key] = policy.hit(state, now)
+        return allowed, retry_after
+
+    def sweep(self, now):
+        self._previous = self._requests
+        self._requests = {}
+
+    def __len__(self):
+        return len(self._requests) + len(self._previous)
+
+
+class SharedMemoryBackend(RateLimitBackend):
+    """Fixed-size hash table in a memory-mapped file shared by all workers.
+
+    Every process opening the same ``path`` sees the same counters, so give
+    each deployment its own file (e.g. under ``/dev/shm``).  The table's
+    layout is recorded in a header and checked on open: reopening a file
+    with a different ``slots``/``probe`` raises ``ValueError``.  A key hashes to a run of ``probe`` slots, which is
+    ``fcntl``-locked for the read-modify-write; when the run is full the
+    least recently hit slot is reused, so memory never grows.  Only
+    fixed-size policies (``token_bucket``, ``sliding_window``) are supported.
+    """
+
+    SLOT = struct.Struct("<Q4d")  # key hash, last hit, up to 3 state values
+    HEADER = struct.Struct("<8sQQ24x")  # magic, slots, probe; one slot wide
+    MAGIC = b"XYLENRL1"
+
+    def __init__(self, path: str, slots: int = 65536, probe: int = 8):
+        if fcntl is None:
+            raise RuntimeError("SharedMemoryBackend requires a POSIX platform (fcntl)")
+        self.path = path
+        self.slots = slots
+        self.probe = probe
+
+        # ``probe`` spare slots at the end so a run never wraps around.
+        size = self.HEADER.size + (slots + probe) * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Whole-file lock: the first opener writes the header.
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                self._check_header(size)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+            self._mmap = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def _check_header(self, size):
+        header = os.pread(self._fd, self.HEADER.size, 0)
+        if not header.strip(b"\0"):
+            os.ftruncate(self._fd, size)
+            os.pwrite(self._fd, self.HEADER.pack(self.MAGIC, self.slots, self.probe), 0)
+            return
+        if len(header) < self.HEADER.size:
+            raise ValueError(f"{self.path} is not a {type(self).__name__} table")
+        magic, slots, probe = self.HEADER.unpack(header)
+        if magic != self.MAGIC:
+            raise ValueError(f"{self.path} is not a {type(self).__name__} table")
+        if (slots, probe) != (self.slots, self.probe):
+            raise ValueError(
+                f"{self.path} holds a table with slots={slots}, probe={probe}; "
+                f"opened with slots={self.slots}, probe={self.probe}"
+            )
+
+    def check_policy(self, policy):
+        if getattr(policy, "state_size", None) is None:
+            raise ValueError(
+                f"{type(self).__name__} needs a fixed-size algorithm "
+                "('token_bucket' or 'sliding_window')"
+            )
+
+    def _hash(self, key):
+        # hash() is salted per process; workers need a stable digest.
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    async def hit(self, key, policy, now):
+        slot_size = self.SLOT.size
+        unpack_from = self.SLOT.unpack_from
+        key_hash = self._hash(key)
+        start = self.HEADER.size + key_hash % self.slots * slot_size
+        length = self.probe * slot_size
+        mm = self._mmap
+
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start, os.SEEK_SET)
+        try:
+            target = state = victim = victim_last = None
+            # Slots are never cleared, so a key can't sit past the first empty one.
+            for offset in range(start, start + length, slot_size):
+                stored_hash, last, a, b, c = unpack_from(mm, offset)
+                if stored_hash == key_hash:
+                    target = offset
+                    state = (a, b, c)[:policy.state_size]
+                    break
+                if stored_hash == 0:
+                    target = offset
+                    break
+                if victim is None or last < victim_last:
+                    victim, victim_last = offset, last
+            if target is None:
+                target = victim
+
+            allowed, retry_after, state = policy.hit(state, now)
+            values = tuple(state) + (0.0,) * (3 - len(state))
+            self.SLOT.pack_into(mm, target, key_hash, now, *values)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start, os.SEEK_SET)
+        return allowed, retry_after
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
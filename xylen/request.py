@@ -1,26 +1,151 @@
 # request.py
+import asyncio
+
+from .datastructures import Headers
+from .utils.json import loads as json_loads
+
+
+class RequestBodyTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Request body exceeds {limit} bytes")
+        self.limit = limit
+
+
+class ClientDisconnect(Exception):
+    """The client went away before the request body was complete."""
+
+
+DISCONNECT = {"type": "http.disconnect"}
+
+
 class Request:
-    def __init__(self, scope, receive):
+    def __init__(self, scope, receive, max_body_size=None):
         self.scope = scope
         self.method = scope["method"]
         self.path = scope["path"]
-        self.headers = {k.decode(): v.decode() for k, v in scope["headers"]}
+        self.headers = Headers.from_scope(scope)
+        self.max_body_size = max_body_size
         self._receive = receive
         self._body = None
+        self._stream_consumed = False
+        # BackgroundTasks passed to a handler that takes ``background``.
+        self.background = None
+        self._disconnected = False
+        self._on_disconnect = None
+        self._watcher = None
+        # The first message, when the watcher had to read it (see watch_disconnect).
+        self._first = None
+
+    @property
+    def app(self):
+        return self.scope.get("app")
+
+    @property
+    def query_params(self):
+        return self.headers.query_params
+
+    @property
+    def cookies(self):
+        return self.headers.cookies
+
+    async def stream(self):
+        if self._body is not None:
+            if self._body:
+                yield self._body
+            return
+        if self._stream_consumed:
+            raise RuntimeError("Request body stream has already been consumed")
+        self._stream_consumed = True
+
+        limit = self.max_body_size
+        received = 0
+        while True:
+            first = self._first
+            if first is not None:
+                self._first = None
+                message = await asyncio.shield(first)
+            else:
+                message = await self._receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                if chunk:
+                    received += len(chunk)
+                    if limit is not None and received > limit:
+                        raise RequestBodyTooLarge(limit)
+                    yield chunk
+                if not message.get("more_body", False):
+                    self._body_complete()
+                    break
+            elif message["type"] == "http.disconnect":
+                self._disconnected = True
+                raise ClientDisconnect()
 
     async def body(self):
         if self._body is not None:
             return self._body
-        body = b""
-        more_body = True
-        while more_body:
-            message = await self._receive()
-            if message["type"] == "http.request":
-                body += message.get("body", b"")
-                more_body = message.get("more_body", False)
-        self._body = body
-        return body
+        self._body = b"".join([chunk async for chunk in self.stream()])
+        return self._body
 
     async def json(self):
-        import json
-        return json.loads(await self.body())
\ No newline at end of file
+        app = self.scope.get("app")
+        loads = app.json_decoder if app is not None else json_loads
+        return loads(await self.body())
+
+    async def is_disconnected(self) -> bool:
+        """Whether the client has gone away.
+
+        While the app watches for disconnects this is known for requests
+        whose body fits one message (all bodyless ones) and, for streamed
+        bodies, once the body has been read; ``False`` until then.
+        """
+        return self._disconnected
+
+    def watch_disconnect(self, callback):
+        """Call ``callback()`` as soon as the client disconnects.
+
+        The body and the disconnect arrive through the same ``receive``.
+        The watcher reads the first message itself and hands it to
+        ``stream``; if the body continues past it, watching resumes once
+        ``stream`` has read the rest.
+        """
+        self._on_disconnect = callback
+        if self._body is None and not self._stream_consumed:
+            self._first = asyncio.get_running_loop().create_future()
+        self._start_watcher()
+
+    def _body_complete(self):
+        if self._on_disconnect is not None:
+            self._start_watcher()
+
+    def _start_watcher(self):
+        if self._watcher is None:
+            self._watcher = asyncio.ensure_future(self._wait_disconnect())
+
+    async def _wait_disconnect(self):
+        message = None
+        first = self._first
+        if first is not None:
+            message = await self._receive()
+            first.set_result(message)
+            if message["type"] == "http.request" and message.get("more_body", False):
+                self._watcher = None
+                return
+        while message is None or message["type"] != "http.disconnect":
+            message = await self._receive()
+        self._disconnected = True
+        self._on_disconnect()
+
+    async def receive_after_body(self):
+        """``receive`` for the response once the watcher owns the real one."""
+        if not self._disconnected:
+            await asyncio.shield(self._watcher)
+        return DISCONNECT
+
+    @property
+    def watching(self) -> bool:
+        return self._watcher is not None
+
+    def stop_watching(self):
+        watcher = self._watcher
+        if watcher is not None and not watcher.done():
+            watcher.cancel()
@@ -1,18 +1,34 @@
 # Xylen/response.py
+import asyncio
+import gzip
+import hashlib
 from typing import Dict, Any
 
+from .datastructures import Headers
+from .utils.json import dumps as json_dumps
+
+def _encode_headers(headers):
+    if headers is None:
+        return {}
+    return {
+        (k.encode() if isinstance(k, str) else k):
+        (v.encode() if isinstance(v, str) else v)
+        for k, v in headers.items()
+    }
+
+
 class Response:
-    def __init__(self, body: bytes, status_code: int = 200, headers=None):
+    def __init__(self, body: bytes, status_code: int = 200, headers=None, background=None):
         self.body = body
         self.status_code = status_code
-        if headers is None:
-            self.headers = {}
-        else:
-            self.headers = {
-                (k.encode() if isinstance(k, str) else k): 
-                (v.encode() if isinstance(v, str) else v)
-                for k, v in headers.items()
-            }
+        self.headers = _encode_headers(headers)
+        # BackgroundTasks the app runs once the response has been sent.
+        self.background = background
+        # A known length lets servers skip chunked transfer encoding.
+        if status_code not in (204, 304) and not any(
+            k.lower() == b"content-length" for k in self.headers
+        ):
+            self.headers[b"content-length"] = str(len(body)).encode()
 
     async def __call__(self, scope, receive, send):
         await send({
@@ -26,17 +42,326 @@ class Response:
         })
 
 class PlainTextResponse(Response):
-    def __init__(self, text: str, status_code: int = 200, headers=None):
+    def __init__(self, text: str, status_code: int = 200, headers=None, background=None):
         final_headers = {"content-type": "text/plain; charset=utf-8"}
         if headers:
             final_headers.update(headers)
-        super().__init__(text.encode("utf-8"), status_code, final_headers)
+        super().__init__(text.encode("utf-8"), status_code, final_headers, background)
 
 class JSONResponse(Response):
-    def __init__(self, data: Dict[Any, Any], status_code: int = 200, headers=None):
-        import json
-        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    """JSON body encoded with ``encoder`` (default: the fastest installed codec).
+
+    ``data`` may also be already-serialized ``bytes``, which are sent as-is.
+    """
+
+    def __init__(self, data: Dict[Any, Any], status_code: int = 200, headers=None, encoder=None, background=None):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            body = bytes(data)
+        else:
+            body = (encoder or json_dumps)(data)
+            if isinstance(body, str):
+                body = body.encode("utf-8")
         final_headers = {"content-type": "application/json; charset=utf-8"}
         if headers:
             final_headers.update(headers)
-        super().__init__(body, status_code, final_headers)
\ No newline at end of file
+        super().__init__(body, status_code, final_headers, background)
+
+class StreamingResponse(Response):
+    """Send a sync or async iterable of ``bytes``/``str`` chunks as they are produced.
+
+    The next chunk is only pulled once ``send`` has returned, so production
+    follows the server's flow control, and the iterator is closed as soon as
+    the client disconnects.
+    """
+
+    def __init__(self, content, status_code: int = 200, headers=None, background=None):
+        final_headers = {"content-type": "text/plain; charset=utf-8"}
+        if headers:
+            final_headers.update(headers)
+        self.body = b""
+        self.status_code = status_code
+        self.headers = _encode_headers(final_headers)
+        self.background = background
+        self.body_iterator = content
+
+    async def __call__(self, scope, receive, send):
+        stream = asyncio.ensure_future(self._stream(send))
+        if receive is None:
+            await stream
+            return
+
+        watcher = asyncio.ensure_future(self._wait_disconnect(receive))
+        await asyncio.wait((stream, watcher), return_when=asyncio.FIRST_COMPLETED)
+        for task in (stream, watcher):
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        if not stream.cancelled():
+            stream.result()
+
+    async def _stream(self, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": list(self.headers.items()),
+        })
+        iterator = self.body_iterator
+        try:
+            if hasattr(iterator, "__aiter__"):
+                async for chunk in iterator:
+                    await send({
+                        "type": "http.response.body",
+                        "body": chunk.encode("utf-8") if isinstance(chunk, str) else chunk,
+                        "more_body": True,
+                    })
+            else:
+                for chunk in iterator:
+                    await send({
+                        "type": "http.response.body",
+                        "body": chunk.encode("utf-8") if isinstance(chunk, str) else chunk,
+                        "more_body": True,
+                    })
+        finally:
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+            elif hasattr(iterator, "close"):
+                iterator.close()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _wait_disconnect(self, receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+
+
+class ServerSentEvent:
+    """One event of an ``EventSourceResponse``; ``data`` that isn't a ``str``
+    is sent as JSON."""
+
+    __slots__ = ("data", "event", "id", "retry")
+
+    def __init__(self, data=None, event: str = None, id: str = None, retry: int = None):
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+
+    def encode(self, encoder=None) -> bytes:
+        lines = []
+        if self.event is not None:
+            lines.append(f"event: {_sse_field(self.event)}")
+        if self.id is not None:
+            lines.append(f"id: {_sse_field(self.id)}")
+        if self.retry is not None:
+            lines.append(f"retry: {int(self.retry)}")
+        data = self.data
+        if data is not None:
+            if not isinstance(data, str):
+                data = (encoder or json_dumps)(data)
+                if isinstance(data, bytes):
+                    data = data.decode("utf-8")
+            # Multi-line data takes one field per line; the client rejoins them.
+            lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+        return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+def _sse_field(value) -> str:
+    value = str(value)
+    if "\n" in value or "\r" in value or "\0" in value:
+        raise ValueError(f"Invalid SSE field value: {value!r}")
+    return value
+
+
+class EventSourceResponse(StreamingResponse):
+    """Server-Sent Events from a sync or async iterable.
+
+    Items may be ``ServerSentEvent``s, ``dict``s of its fields, ``str`` data
+    or already encoded ``bytes`` frames.  If ``content`` is a callable it is
+    called with the client's ``Last-Event-ID`` (``None`` on a first connect)
+    so it can resume where the client left off.
+
+    The iterable runs ahead of the client by at most ``max_buffer`` events;
+    beyond that it waits for the client to catch up.  After ``ping_interval``
+    seconds without an event a comment is sent so proxies keep the
+    connection open.  The iterable is cancelled when the client disconnects.
+    """
+
+    def __init__(
+        self,
+        content,
+        status_code: int = 200,
+        headers=None,
+        ping_interval: float = 15.0,
+        max_buffer: int = 16,
+        encoder=None,
+        background=None,
+    ):
+        final_headers = {
+            "content-type": "text/event-stream; charset=utf-8",
+            "cache-control": "no-cache",
+            # Stop nginx from buffering the stream.
+            "x-accel-buffering": "no",
+        }
+        if headers:
+            final_headers.update(headers)
+        super().__init__(content, status_code, final_headers, background)
+        self.ping_interval = ping_interval
+        self.max_buffer = max_buffer
+        self.encoder = encoder
+
+    async def __call__(self, scope, receive, send):
+        if callable(self.body_iterator) and not hasattr(self.body_iterator, "__aiter__"):
+            last_event_id = Headers.from_scope(scope).get("last-event-id")
+            self.body_iterator = self.body_iterator(last_event_id)
+        await super().__call__(scope, receive, send)
+
+    def encode(self, item) -> bytes:
+        if isinstance(item, bytes):
+            return item
+        if isinstance(item, str):
+            item = ServerSentEvent(item)
+        elif isinstance(item, dict):
+            item = ServerSentEvent(**item)
+        return item.encode(self.encoder)
+
+    async def _produce(self, buffer):
+        iterator = self.body_iterator
+        if hasattr(iterator, "__aiter__"):
+            async for item in iterator:
+                await buffer.put(self.encode(item))
+        else:
+            for item in iterator:
+                await buffer.put(self.encode(item))
+        await buffer.put(None)
+
+    async def _stream(self, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": list(self.headers.items()),
+        })
+        buffer = asyncio.Queue(self.max_buffer)
+        producer = asyncio.ensure_future(self._produce(buffer))
+        getter = None
+        try:
+            while True:
+                if getter is None:
+                    getter = asyncio.ensure_future(buffer.get())
+                waiting = (getter,) if producer.done() else (getter, producer)
+                done, _ = await asyncio.wait(
+                    waiting, timeout=self.ping_interval, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter in done:
+                    frame = getter.result()
+                    getter = None
+                    if frame is None:
+                        break
+                    await send({"type": "http.response.body", "body": frame, "more_body": True})
+                elif producer in done:
+                    producer.result()  # re-raise its error; else its end marker is queued
+                else:
+                    await send({"type": "http.response.body", "body": b": ping\n\n", "more_body": True})
+        finally:
+            for task in (getter, producer):
+                if task is not None and not task.done():
+                    task.cancel()
+                    try:
+                        await task
+                    except asyncio.CancelledError:
+                        pass
+            iterator = self.body_iterator
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+            elif hasattr(iterator, "close"):
+                iterator.close()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class CachedContent:
+    """A body encoded once, served with a strong ETag and conditional GET.
+
+    The identity, gzip and 304 responses are built on first use and reused,
+    so serving the content costs only the header checks.
+    """
+
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.content_type = content_type
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'.encode()
+        self.gzip_etag = f'"{digest}-gz"'.encode()
+        self._identity = None
+        self._gzipped = None
+        # One 304 per variant: it must carry the ETag its 200 would have.
+        self._not_modified = {}
+
+    def response(self, request) -> Response:
+        use_gzip = accepts_gzip(request.headers.get_raw(b"accept-encoding", b""))
+        etag = self.gzip_etag if use_gzip else self.etag
+
+        if_none_match = request.headers.get_raw(b"if-none-match")
+        if if_none_match is not None and _etag_matches(if_none_match, etag):
+            not_modified = self._not_modified.get(etag)
+            if not_modified is None:
+                not_modified = self._not_modified[etag] = Response(
+                    b"", 304, {b"etag": etag, b"vary": b"Accept-Encoding"}
+                )
+            return not_modified
+
+        if use_gzip:
+            if self._gzipped is None:
+                self._gzipped = Response(gzip.compress(self.body, mtime=0), 200, {
+                    b"content-type": self.content_type.encode(),
+                    b"content-encoding": b"gzip",
+                    b"etag": self.gzip_etag,
+                    b"vary": b"Accept-Encoding",
+                })
+            return self._gzipped
+
+        if self._identity is None:
+            self._identity = Response(self.body, 200, {
+                b"content-type": self.content_type.encode(),
+                b"etag": self.etag,
+                b"vary": b"Accept-Encoding",
+            })
+        return self._identity
+
+
+def _etag_matches(if_none_match: bytes, etag: bytes) -> bool:
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored.
+    if if_none_match.strip() == b"*":
+        return True
+    for tag in if_none_match.split(b","):
+        tag = tag.strip()
+        if tag.startswith(b"W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def accepts_gzip(accept_encoding: bytes) -> bool:
+    """Whether an ``Accept-Encoding`` value allows gzip (``q=0`` refuses it)."""
+    wildcard = False
+    for item in accept_encoding.lower().split(b","):
+        coding, _, params = item.partition(b";")
+        coding = coding.strip()
+        if coding not in (b"gzip", b"x-gzip", b"*"):
+            continue
+        q = 1.0
+        for param in params.split(b";"):
+            name, _, value = param.partition(b"=")
+            if name.strip() == b"q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding == b"*":
+            wildcard = q > 0
+        else:
+            return q > 0
+    return wildcard
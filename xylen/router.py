@@ -1,49 +1,153 @@
 # Xylen/router.py
+import functools
+import inspect
+
 from .utils.converters import parse_path
 
+# Dynamic segments sharing a position are tried from the most to the least
+# restrictive converter, after any static segment at that position.
+CONVERTER_PRIORITY = {int: 0, float: 1, str: 3}
+
+# Scope key under which a request's match result is cached.
+MATCH_KEY = "xylen.match"
+
+
 class Route:
-    def __init__(self, path, handler, methods):
+    def __init__(self, path, handler, methods, **options):
+        self.path = path
         self.segments, self.kwargs = parse_path(path)
         self.handler = handler
         self.methods = [m.upper() for m in methods]
+        # Per-route settings (e.g. ``max_body_size``) read by the app.
+        self.options = options
+        # Resolved once here instead of inspecting the result on every call.
+        self.is_async = is_async_callable(handler)
+        # Plain sync handlers run in the app's thread pool unless the route
+        # opts out; generator functions only build their iterator.
+        self.run_in_thread = bool(options.get("run_in_thread", True)) and not (
+            self.is_async
+            or inspect.isgeneratorfunction(handler)
+            or inspect.isasyncgenfunction(handler)
+        )
+        # Handlers taking ``background`` get a BackgroundTasks passed in.
+        self.injects_background = "background" in _parameters(handler)
+
+
+def is_async_callable(obj) -> bool:
+    while isinstance(obj, functools.partial):
+        obj = obj.func
+    return inspect.iscoroutinefunction(obj) or (
+        callable(obj) and inspect.iscoroutinefunction(getattr(obj, "__call__", None))
+    )
+
+
+def _parameters(handler):
+    try:
+        return inspect.signature(handler).parameters
+    except (TypeError, ValueError):
+        return {}
+
+
+class _Node:
+    __slots__ = ("static", "dynamic", "routes")
+
+    def __init__(self):
+        self.static = {}   # segment -> _Node
+        self.dynamic = []  # [(name, converter, _Node)] in priority order
+        self.routes = {}   # method -> Route
+
 
 class Router:
     def __init__(self):
         self.routes = []
+        self._root = _Node()
+        # Fully static routes, keyed by their stripped path: one dict lookup.
+        self._static = {}
 
-    def add_route(self, path, handler, methods):
-        self.routes.append(Route(path, handler, methods))
+    def add_route(self, path, handler, methods, **options):
+        route = Route(path, handler, methods, **options)
+        self.routes.append(route)
 
-    def resolve(self, path: str, method: str):
+        node = self._root
+        for segment, kw in zip(route.segments, route.kwargs):
+            if segment is None:
+                node = self._dynamic_child(node, *kw)
+            else:
+                node = node.static.setdefault(segment, _Node())
+
+        for method in route.methods:
+            # First registration wins, as with the previous linear scan.
+            node.routes.setdefault(method, route)
+
+        if None not in route.segments:
+            self._static["/".join(route.segments)] = node
+        return route
+
+    def _dynamic_child(self, node, name, converter):
+        for child_name, child_converter, child in node.dynamic:
+            if child_name == name and child_converter is converter:
+                return child
+        child = _Node()
+        node.dynamic.append((name, converter, child))
+        node.dynamic.sort(key=lambda item: CONVERTER_PRIORITY.get(item[1], 2))
+        return child
+
+    def match(self, path: str, method: str):
+        """Return ``(route, kwargs, allowed_methods)``.
+
+        ``route`` is ``None`` when nothing matched; ``allowed_methods`` is then
+        non-empty if the path exists under other methods (405 rather than 404).
+        """
         clean_path = path.strip("/")
+        node = self._static.get(clean_path)
+        if node is not None:
+            route = node.routes.get(method)
+            if route is not None:
+                return route, {}, ()
+
         path_parts = clean_path.split("/") if clean_path else []
+        allowed = set()
+        kwargs = {}
+        route = self._search(self._root, path_parts, 0, method, kwargs, allowed)
+        if route is not None:
+            return route, kwargs, ()
+        return None, {}, tuple(sorted(allowed))
 
-        for route in self.routes:
-            if method not in route.methods:
-                continue
-            if len(path_parts) != len(route.segments):
+    def match_scope(self, scope):
+        """``match`` for an ASGI scope, computed once and cached in the scope."""
+        match = scope.get(MATCH_KEY)
+        if match is None:
+            match = scope[MATCH_KEY] = self.match(scope["path"], scope["method"])
+        return match
+
+    def _search(self, node, parts, index, method, kwargs, allowed):
+        if index == len(parts):
+            route = node.routes.get(method)
+            if route is None:
+                allowed.update(node.routes)
+            return route
+
+        part = parts[index]
+        child = node.static.get(part)
+        if child is not None:
+            route = self._search(child, parts, index + 1, method, kwargs, allowed)
+            if route is not None:
+                return route
+
+        for name, converter, child in node.dynamic:
+            try:
+                kwargs[name] = converter(part)
+            except (ValueError, TypeError):
                 continue
+            route = self._search(child, parts, index + 1, method, kwargs, allowed)
+            if route is not None:
+                return route
+            del kwargs[name]
+
+        return None
 
-            kwargs = {}
-            match = True
-            for i, seg in enumerate(route.segments):
-                expected = seg
-                actual = path_parts[i]
-                kw = route.kwargs[i]
-
-                if expected is None:  # dynamic segment
-                    name, converter = kw
-                    try:
-                        kwargs[name] = converter(actual)
-                    except (ValueError, TypeError):
-                        match = False
-                        break
-                else:
-                    if expected != actual:
-                        match = False
-                        break
-
-            if match:
-                return route.handler, kwargs
-
-        return None, {}
\ No newline at end of file
+    def resolve(self, path: str, method: str):
+        route, kwargs, _ = self.match(path, method)
+        if route is None:
+            return None, {}
+        return route.handler, kwargs
@@ -0,0 +1,705 @@
+# xylen/server.py
+"""Zero-dependency HTTP/1.1 server driving any ASGI app (``xylen run --server native``).
+
+One ``HTTPProtocol`` per connection parses requests incrementally out of a
+single buffer, so keep-alive and pipelined requests cost no extra reads.
+Pipelined requests are answered strictly in order: the next one is parsed
+only once the current response is complete.  Responses are written with
+``transport.writelines`` so the head and body go out without being joined.
+"""
+import asyncio
+import logging
+import signal
+import socket
+import time
+from email.utils import formatdate
+from http import HTTPStatus
+from urllib.parse import unquote
+
+logger = logging.getLogger("xylen.server")
+
+HIGH_WATER = 64 * 1024  # unread request body bytes before reading pauses
+MAX_CHUNK_LINE = 1024
+
+_STATUS_LINES = {
+    status.value: f"HTTP/1.1 {status.value} {status.phrase}\r\n".encode("latin-1")
+    for status in HTTPStatus
+}
+
+_date_header = [0, b""]
+
+
+def date_header():
+    now = int(time.time())
+    if now != _date_header[0]:
+        _date_header[0] = now
+        _date_header[1] = b"date: " + formatdate(now, usegmt=True).encode("latin-1") + b"\r\n"
+    return _date_header[1]
+
+
+def status_line(status):
+    line = _STATUS_LINES.get(status)
+    if line is None:
+        line = _STATUS_LINES[status] = b"HTTP/1.1 %d \r\n" % status
+    return line
+
+
+class BadRequest(Exception):
+    def __init__(self, status, reason):
+        super().__init__(reason)
+        self.status = status
+
+
+def simple_response(status, reason, keep_alive=False):
+    body = reason.encode("latin-1")
+    return [
+        status_line(status),
+        b"content-type: text/plain; charset=utf-8\r\ncontent-length: %d\r\n" % len(body),
+        date_header(),
+        b"connection: keep-alive\r\n\r\n" if keep_alive else b"connection: close\r\n\r\n",
+        body,
+    ]
+
+
+class RequestCycle:
+    """ASGI ``receive``/``send`` for one request on a connection."""
+
+    __slots__ = (
+        "protocol", "scope", "keep_alive", "is_head", "expect_continue",
+        "body", "body_size", "body_complete", "disconnected", "event",
+        "response_started", "response_complete", "head_written", "chunked",
+        "status", "headers", "request_body_sent",
+    )
+
+    def __init__(self, protocol, scope, keep_alive, expect_continue):
+        self.protocol = protocol
+        self.scope = scope
+        self.keep_alive = keep_alive
+        self.is_head = scope["method"] == "HEAD"
+        self.expect_continue = expect_continue
+        self.body = []
+        self.body_size = 0
+        self.body_complete = False
+        self.disconnected = False
+        self.event = None
+        self.response_started = False
+        self.response_complete = False
+        self.head_written = False
+        self.chunked = False
+        self.status = None
+        self.headers = None
+        self.request_body_sent = False
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+
+    async def receive(self):
+        if self.expect_continue and not self.body and not self.body_complete:
+            self.expect_continue = False
+            self.protocol.transport.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+        while not self.request_body_sent:
+            if self.disconnected:
+                return {"type": "http.disconnect"}
+            if self.body or self.body_complete:
+                body = b"".join(self.body) if len(self.body) != 1 else self.body[0]
+                self.body.clear()
+                self.body_size = 0
+                self.protocol.resume_reading()
+                self.request_body_sent = self.body_complete
+                return {"type": "http.request", "body": body, "more_body": not self.body_complete}
+            await self._wait()
+
+        # The body is read: block until the client goes away (or the
+        # response is done), like a real server.
+        while not (self.disconnected or self.response_complete):
+            await self._wait()
+        return {"type": "http.disconnect"}
+
+    async def _wait(self):
+        if self.event is None:
+            self.event = asyncio.Event()
+        self.event.clear()
+        await self.event.wait()
+
+    async def send(self, message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            if self.response_started:
+                raise RuntimeError("http.response.start sent twice")
+            self.response_started = True
+            self.status = message["status"]
+            self.headers = message.get("headers") or ()
+            return
+        if kind != "http.response.body":
+            raise RuntimeError(f"Unexpected ASGI message {kind!r}")
+        if not self.response_started:
+            raise RuntimeError("http.response.body sent before http.response.start")
+        if self.response_complete or self.disconnected:
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        protocol = self.protocol
+        if not self.head_written:
+            self.head_written = True
+            data = [self._head(body, more_body)]
+        else:
+            data = []
+        if body and not self.is_head:
+            if self.chunked:
+                data.extend((b"%x\r\n" % len(body), body, b"\r\n"))
+            else:
+                data.append(body)
+        if not more_body and self.chunked:
+            data.append(b"0\r\n\r\n")
+        if data:
+            protocol.transport.writelines(data)
+
+        if more_body:
+            await protocol.drain()
+        else:
+            self.response_complete = True
+            self.wake()
+            protocol.response_complete(self)
+
+    def _head(self, body, more_body):
+        status = self.status
+        parts = [status_line(status)]
+        has_length = False
+        for name, value in self.headers:
+            lname = name.lower()
+            if lname == b"content-length":
+                has_length = True
+            elif lname == b"connection" and value.lower() == b"close":
+                self.keep_alive = False
+                continue
+            elif lname == b"transfer-encoding":
+                continue
+            parts.append(b"%s: %s\r\n" % (name, value))
+
+        if not has_length and status >= 200 and status not in (204, 304):
+            if not more_body:
+                parts.append(b"content-length: %d\r\n" % len(body))
+            elif self.scope["http_version"] == "1.1":
+                self.chunked = True
+                parts.append(b"transfer-encoding: chunked\r\n")
+            else:
+                self.keep_alive = False  # close-delimited body
+        parts.append(date_header())
+        if not self.keep_alive:
+            parts.append(b"connection: close\r\n")
+        elif self.scope["http_version"] == "1.0":
+            parts.append(b"connection: keep-alive\r\n")
+        parts.append(b"\r\n")
+        return b"".join(parts)
+
+
+class HTTPProtocol(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.app = server.app
+        self.loop = server.loop
+        self.transport = None
+        self.buffer = bytearray()
+        self.cycle = None
+        self.closed = False
+        self.reading_paused = False
+        self.writable = None
+        self.timer = None
+        self.client = None
+        self.local = None
+        # Body framing of the request being read.
+        self.body_remaining = 0
+        self.body_received = 0
+        self.chunk_state = None  # None (length-delimited) or "size"/"data"/"data_end"/"trailer"
+
+    # -- connection lifecycle ------------------------------------------
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connections.add(self)
+        self.client = _address(transport.get_extra_info("peername"))
+        self.local = _address(transport.get_extra_info("sockname"))
+        self.set_timer(self.server.keep_alive_timeout)
+
+    def connection_lost(self, exc):
+        self.closed = True
+        self.server.connections.discard(self)
+        self.cancel_timer()
+        if self.cycle is not None:
+            self.cycle.disconnected = True
+            self.cycle.wake()
+        if self.writable is not None:
+            self.writable.set()
+
+    def set_timer(self, timeout):
+        self.cancel_timer()
+        if timeout:
+            self.timer = self.loop.call_later(timeout, self.close)
+
+    def cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.transport.close()
+
+    def is_idle(self):
+        return self.cycle is None and not self.buffer
+
+    # -- flow control --------------------------------------------------
+
+    def pause_writing(self):
+        if self.writable is None:
+            self.writable = asyncio.Event()
+        self.writable.clear()
+
+    def resume_writing(self):
+        if self.writable is not None:
+            self.writable.set()
+
+    async def drain(self):
+        if self.writable is not None and not self.writable.is_set():
+            await self.writable.wait()
+
+    def pause_reading(self):
+        if not self.reading_paused and not self.closed:
+            self.reading_paused = True
+            self.transport.pause_reading()
+
+    def resume_reading(self):
+        if self.reading_paused and not self.closed:
+            self.reading_paused = False
+            self.transport.resume_reading()
+
+    # -- parsing -------------------------------------------------------
+
+    def data_received(self, data):
+        self.buffer += data
+        try:
+            self.process()
+        except BadRequest as exc:
+            self.reject(exc.status, str(exc))
+
+    def process(self):
+        while not self.closed:
+            cycle = self.cycle
+            if cycle is None:
+                if not self.parse_head():
+                    return
+            elif not cycle.body_complete:
+                self.read_body(cycle)
+                if not cycle.body_complete:
+                    return
+            else:
+                # Pipelined data waits for the current response.
+                if len(self.buffer) > self.server.max_header_size:
+                    self.pause_reading()
+                return
+
+    def parse_head(self):
+        buffer = self.buffer
+        while buffer[:2] == b"\r\n":  # tolerated between requests
+            del buffer[:2]
+        end = buffer.find(b"\r\n\r\n")
+        if end == -1:
+            if len(buffer) > self.server.max_header_size:
+                raise BadRequest(431, "Request Header Fields Too Large")
+            return False
+        if end > self.server.max_header_size:
+            raise BadRequest(431, "Request Header Fields Too Large")
+
+        lines = bytes(buffer[:end]).split(b"\r\n")
+        del buffer[:end + 4]
+        try:
+            method, target, version = lines[0].split(b" ")
+        except ValueError:
+            raise BadRequest(400, "Bad Request")
+        if version == b"HTTP/1.1":
+            http_version = "1.1"
+        elif version == b"HTTP/1.0":
+            http_version = "1.0"
+        else:
+            raise BadRequest(505, "HTTP Version Not Supported")
+        if not method.isalpha():
+            raise BadRequest(400, "Bad Request")
+
+        headers = []
+        content_length = None
+        chunked = False
+        connection = b""
+        expect_continue = False
+        for line in lines[1:]:
+            name, sep, value = line.partition(b":")
+            if not sep or not name or name[-1:] in (b" ", b"\t") or line[:1] in (b" ", b"\t"):
+                raise BadRequest(400, "Bad Request")
+            name = name.lower()
+            value = value.strip(b" \t")
+            if name == b"content-length":
+                if not value.isdigit() or (content_length is not None and int(value) != content_length):
+                    raise BadRequest(400, "Bad Request")
+                content_length = int(value)
+            elif name == b"transfer-encoding":
+                if value.lower() != b"chunked":
+                    raise BadRequest(501, "Not Implemented")
+                chunked = True
+            elif name == b"connection":
+                connection = value.lower()
+            elif name == b"expect":
+                expect_continue = value.lower() == b"100-continue"
+            headers.append((name, value))
+
+        if chunked and content_length is not None:
+            raise BadRequest(400, "Bad Request")  # request smuggling guard
+        max_body_size = self.server.max_body_size
+        if max_body_size is not None and content_length is not None and content_length > max_body_size:
+            raise BadRequest(413, "Payload Too Large")
+
+        if http_version == "1.1":
+            keep_alive = b"close" not in connection
+        else:
+            keep_alive = b"keep-alive" in connection
+
+        if target[:1] != b"/" and target != b"*":
+            # absolute-form: http://host/path?query
+            scheme_end = target.find(b"://")
+            if scheme_end == -1:
+                raise BadRequest(400, "Bad Request")
+            slash = target.find(b"/", scheme_end + 3)
+            target = target[slash:] if slash != -1 else b"/"
+        raw_path, _, query_string = target.partition(b"?")
+        path = raw_path.decode("latin-1")
+        if "%" in path:
+            path = unquote(path)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": http_version,
+            "server": self.local,
+            "client": self.client,
+            "scheme": "http",
+            "method": method.decode("ascii"),
+            "root_path": "",
+            "path": path,
+            "raw_path": raw_path,
+            "query_string": query_string,
+            "headers": headers,
+        }
+        self.cancel_timer()
+        cycle = self.cycle = RequestCycle(self, scope, keep_alive, expect_continue)
+        self.chunk_state = "size" if chunked else None
+        self.body_remaining = content_length or 0
+        self.body_received = 0
+        if not chunked and not content_length:
+            cycle.body_complete = True
+        self.server.requests += 1
+        self.loop.create_task(self.run_asgi(cycle))
+        return True
+
+    def read_body(self, cycle):
+        buffer = self.buffer
+        if self.chunk_state is None:
+            take = min(self.body_remaining, len(buffer))
+            if take:
+                self.add_body(cycle, bytes(buffer[:take]))
+                del buffer[:take]
+                self.body_remaining -= take
+            if not self.body_remaining:
+                cycle.body_complete = True
+        else:
+            self.read_chunked(cycle)
+        cycle.wake()
+        if cycle.body_size > HIGH_WATER:
+            self.pause_reading()
+
+    def read_chunked(self, cycle):
+        buffer = self.buffer
+        while buffer:
+            state = self.chunk_state
+            if state == "data":
+                take = min(self.body_remaining, len(buffer))
+                self.add_body(cycle, bytes(buffer[:take]))
+                del buffer[:take]
+                self.body_remaining -= take
+                if not self.body_remaining:
+                    self.chunk_state = "data_end"
+                continue
+            end = buffer.find(b"\r\n")
+            if end == -1:
+                if len(buffer) > MAX_CHUNK_LINE:
+                    raise BadRequest(400, "Bad Request")
+                return
+            line = bytes(buffer[:end])
+            del buffer[:end + 2]
+            if state == "data_end":
+                if line:
+                    raise BadRequest(400, "Bad Request")
+                self.chunk_state = "size"
+            elif state == "size":
+                try:
+                    size = int(line.split(b";", 1)[0].strip(), 16)
+                except ValueError:
+                    raise BadRequest(400, "Bad Request")
+                if size:
+                    self.body_remaining = size
+                    self.chunk_state = "data"
+                else:
+                    self.chunk_state = "trailer"
+            elif not line:  # end of trailers
+                cycle.body_complete = True
+                return
+
+    def add_body(self, cycle, chunk):
+        cycle.body.append(chunk)
+        cycle.body_size += len(chunk)
+        self.body_received += len(chunk)
+        max_body_size = self.server.max_body_size
+        if max_body_size is not None and self.body_received > max_body_size:
+            raise BadRequest(413, "Payload Too Large")
+
+    def reject(self, status, reason):
+        cycle = self.cycle
+        if cycle is not None and cycle.response_started:
+            self.close()
+            return
+        if cycle is not None:
+            cycle.disconnected = True
+            cycle.response_complete = True
+            cycle.wake()
+        self.transport.writelines(simple_response(status, reason))
+        self.close()
+
+    # -- ASGI ----------------------------------------------------------
+
+    async def run_asgi(self, cycle):
+        try:
+            await self.app(cycle.scope, cycle.receive, cycle.send)
+        except BaseException as exc:
+            if not isinstance(exc, asyncio.CancelledError):
+                logger.exception("Exception in ASGI application")
+            if not cycle.response_started and not cycle.disconnected:
+                self.reject(500, "Internal Server Error")
+            elif not cycle.response_complete:
+                self.close()
+            if not isinstance(exc, Exception):
+                raise
+        else:
+            if not cycle.response_complete and not cycle.disconnected:
+                if not cycle.response_started:
+                    logger.error("ASGI application returned without a response")
+                    self.reject(500, "Internal Server Error")
+                else:
+                    self.close()
+
+    def response_complete(self, cycle):
+        self.cycle = None
+        server = self.server
+        server.responses += 1
+        if server.max_requests is not None and server.responses >= server.max_requests and not server.should_exit:
+            server.exit()
+        if not cycle.keep_alive or not cycle.body_complete or self.server.should_exit:
+            self.close()
+            return
+        self.resume_reading()
+        if self.buffer:
+            try:
+                self.process()
+            except BadRequest as exc:
+                self.reject(exc.status, str(exc))
+        if self.cycle is None and not self.closed:
+            self.set_timer(self.server.keep_alive_timeout)
+
+
+def _address(info):
+    if isinstance(info, tuple) and len(info) >= 2:
+        return (str(info[0]), int(info[1]))
+    return None
+
+
+class Lifespan:
+    """Runs the app's ASGI lifespan protocol around the server."""
+
+    def __init__(self, app):
+        self.app = app
+        self.queue = None
+        self.task = None
+        self.supported = True
+        self.state = {}
+
+    async def startup(self):
+        self.queue = asyncio.Queue()
+        self.events = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self.main())
+        await self.queue.put({"type": "lifespan.startup"})
+        message = await self.events.get()
+        if message["type"] == "lifespan.startup.failed":
+            raise RuntimeError(message.get("message") or "Application startup failed")
+
+    async def shutdown(self):
+        if not self.supported or self.task is None:
+            return
+        await self.queue.put({"type": "lifespan.shutdown"})
+        message = await self.events.get()
+        if message["type"] == "lifespan.shutdown.failed":
+            logger.error("Application shutdown failed: %s", message.get("message", ""))
+
+    async def main(self):
+        scope = {"type": "lifespan", "asgi": {"version": "3.0", "spec_version": "2.0"}, "state": self.state}
+        try:
+            await self.app(scope, self.queue.get, self.events.put)
+        except BaseException as exc:
+            self.supported = False
+            logger.info("ASGI lifespan unsupported: %r", exc)
+        # Unblocks a waiting startup/shutdown if the app returned early.
+        await self.events.put({"type": "lifespan.unsupported"})
+
+
+class Server:
+    """Serve ``app`` until SIGINT/SIGTERM (or ``should_exit``).
+
+    Pass ``sock`` to serve an already bound listening socket (e.g. shared
+    by pre-forked workers).  ``max_header_size`` bounds the request line
+    plus headers (431), ``max_body_size`` the request body (413; ``None``
+    leaves it to the app), and ``keep_alive_timeout`` both idle keep-alive
+    connections and clients slow to send a request head.  After
+    ``max_requests`` responses the server shuts down gracefully, so a
+    supervisor can replace the worker.
+    """
+
+    def __init__(
+        self,
+        app,
+        host="127.0.0.1",
+        port=8000,
+        sock=None,
+        backlog=2048,
+        max_header_size=64 * 1024,
+        max_body_size=None,
+        keep_alive_timeout=5.0,
+        graceful_timeout=30.0,
+        lifespan=True,
+        reuse_port=False,
+        max_requests=None,
+    ):
+        self.app = getattr(app, "_asgi_app", app)
+        self.host = host
+        self.port = port
+        self.sock = sock
+        self.backlog = backlog
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.keep_alive_timeout = keep_alive_timeout
+        self.graceful_timeout = graceful_timeout
+        self.lifespan = Lifespan(self.app) if lifespan else None
+        self.reuse_port = reuse_port
+        self.max_requests = max_requests
+        self.loop = None
+        self.connections = set()
+        self.requests = 0
+        self.responses = 0
+        self.should_exit = False
+        self.started = None
+        self.sockets = None
+        self._exit = None
+        self._server = None
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._exit = asyncio.Event()
+        if self.should_exit:
+            self._exit.set()
+        if self.lifespan is not None:
+            await self.lifespan.startup()
+
+        if self.sock is not None:
+            self._server = await self.loop.create_server(
+                lambda: HTTPProtocol(self), sock=self.sock, backlog=self.backlog
+            )
+        else:
+            self._server = await self.loop.create_server(
+                lambda: HTTPProtocol(self),
+                self.host,
+                self.port,
+                backlog=self.backlog,
+                reuse_port=self.reuse_port or None,
+            )
+        self.sockets = self._server.sockets
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self.exit)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass  # not the main thread, or no signal support
+        if self.started is not None:
+            self.started.set()
+
+        try:
+            await self._exit.wait()
+        finally:
+            await self.shutdown()
+
+    def exit(self):
+        self.should_exit = True
+        if self._exit is not None:
+            self.loop.call_soon_threadsafe(self._exit.set)
+
+    async def shutdown(self):
+        self._server.close()
+        for connection in list(self.connections):
+            if connection.is_idle():
+                connection.close()
+        deadline = self.loop.time() + self.graceful_timeout
+        while self.connections and self.loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        for connection in list(self.connections):
+            connection.transport.abort()
+        await self._server.wait_closed()
+        if self.lifespan is not None:
+            await self.lifespan.shutdown()
+
+
+def run(app, host="127.0.0.1", port=8000, ready=None, **options):
+    """Serve ``app`` until stopped; ``ready()`` is called once it listens."""
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        uvloop.install()
+    server = Server(app, host, port, **options)
+    if ready is None:
+        server.run()
+        return
+
+    async def main():
+        server.started = asyncio.Event()
+        task = asyncio.ensure_future(server.serve())
+        started = asyncio.ensure_future(server.started.wait())
+        await asyncio.wait((task, started), return_when=asyncio.FIRST_COMPLETED)
+        if started.done():
+            ready()
+        else:
+            started.cancel()
+        await task
+
+    asyncio.run(main())
+
+
+def bind_socket(host, port, backlog=2048, reuse_port=False):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
@@ -0,0 +1,263 @@
+# xylen/supervisor.py
+"""Pre-fork worker supervisor (``xylen run --workers N``).
+
+The master imports the app once, freezes everything it allocated out of
+the garbage collector's reach (``gc.freeze``) and forks the workers, so
+the app's code and data stay shared copy-on-write instead of being built
+N times.  Workers accept on one inherited listening socket, or bind their
+own with ``SO_REUSEPORT`` so the kernel spreads connections.
+
+Signals handled by the master:
+
+- ``SIGTERM``/``SIGINT``: stop workers gracefully, then exit.
+- ``SIGHUP``: rolling restart, one worker at a time, each replacement
+  serving before its predecessor is told to drain.  The preloaded app is
+  reused, so this recycles memory rather than reloading code.
+- ``SIGUSR1``: print each worker's memory (RSS / PSS / private) to stderr.
+
+Workers that exit for any reason other than being retired are respawned;
+``max_requests`` makes them exit on purpose to contain leaks.
+"""
+import gc
+import os
+import random
+import select
+import signal
+import sys
+import time
+import traceback
+
+from .server import bind_socket
+
+# A worker dying this soon after its start is respawned with a delay, so a
+# broken app can't turn the supervisor into a fork loop.
+CRASH_LOOP_SECONDS = 1.0
+
+HANDLED_SIGNALS = (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1, signal.SIGCHLD)
+
+
+def memory_usage(pid):
+    """``{"rss": kB, "pss": kB, "private": kB, "shared": kB}`` or ``None``.
+
+    Read from ``/proc/<pid>/smaps_rollup`` (Linux 4.14+).  ``private`` is
+    what the process alone costs; ``pss`` splits shared pages between
+    their users.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                name, _, value = line.partition(":")
+                parts = value.split()
+                if parts and parts[-1] == "kB":
+                    fields[name] = int(parts[0])
+    except (OSError, ValueError):
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+class Worker:
+    __slots__ = ("pid", "ready_fd", "started", "retiring")
+
+    def __init__(self, pid, ready_fd):
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.started = time.monotonic()
+        self.retiring = False
+
+
+class Supervisor:
+    """Fork ``workers`` processes running ``serve(sock, max_requests, ready)``.
+
+    ``serve`` runs in the child with the shared listening socket (or
+    ``None`` with ``reuse_port``, where it binds its own) and calls
+    ``ready()`` once it is accepting connections.
+    """
+
+    def __init__(
+        self,
+        serve,
+        workers,
+        host="127.0.0.1",
+        port=8000,
+        reuse_port=False,
+        max_requests=None,
+        max_requests_jitter=0,
+        graceful_timeout=30.0,
+        ready_timeout=30.0,
+    ):
+        self.serve = serve
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.ready_timeout = ready_timeout
+        self.sock = None
+        self.children = {}
+        self.signals = []
+        self._wakeup = None
+
+    def run(self):
+        if not self.reuse_port:
+            self.sock = bind_socket(self.host, self.port)
+        self._install_signals()
+        # Everything allocated so far (the app included) is shared with the
+        # workers; keep the collector from touching, and so copying, it.
+        gc.collect()
+        gc.freeze()
+        try:
+            for _ in range(self.workers):
+                self.spawn()
+            self._loop()
+        finally:
+            self.stop()
+            signal.set_wakeup_fd(-1)
+            if self.sock is not None:
+                self.sock.close()
+
+    def _install_signals(self):
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(read_fd, False)
+        os.set_blocking(write_fd, False)
+        self._wakeup = read_fd
+        signal.set_wakeup_fd(write_fd)
+        for sig in HANDLED_SIGNALS:
+            signal.signal(sig, self._on_signal)
+
+    def _on_signal(self, signum, frame):
+        self.signals.append(signum)
+
+    def _loop(self):
+        while True:
+            select.select([self._wakeup], [], [], 1.0)
+            try:
+                os.read(self._wakeup, 4096)
+            except BlockingIOError:
+                pass
+            self.reap()
+            while self.signals:
+                signum = self.signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    return
+                if signum == signal.SIGHUP:
+                    self.rolling_restart()
+                elif signum == signal.SIGUSR1:
+                    print(self.memory_report(), file=sys.stderr)
+
+            active = sum(1 for worker in self.children.values() if not worker.retiring)
+            for _ in range(self.workers - active):
+                self.spawn()
+
+    def spawn(self):
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            # Spread the recycling so workers don't all restart together.
+            max_requests += random.randint(0, self.max_requests_jitter)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._run_child(write_fd, max_requests)
+        os.close(write_fd)
+        self.children[pid] = Worker(pid, read_fd)
+        return self.children[pid]
+
+    def _run_child(self, ready_fd, max_requests):
+        code = 0
+        try:
+            signal.set_wakeup_fd(-1)
+            os.close(self._wakeup)
+            for worker in self.children.values():
+                os.close(worker.ready_fd)
+            for sig in HANDLED_SIGNALS:
+                signal.signal(sig, signal.SIG_DFL)
+
+            def ready():
+                os.write(ready_fd, b"1")
+                os.close(ready_fd)
+
+            self.serve(self.sock, max_requests, ready)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def wait_ready(self, worker, timeout):
+        readable, _, _ = select.select([worker.ready_fd], [], [], timeout)
+        return bool(readable) and os.read(worker.ready_fd, 1) == b"1"
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.children.pop(pid, None)
+            if worker is None:
+                continue
+            os.close(worker.ready_fd)
+            if worker.retiring:
+                continue
+            code = os.waitstatus_to_exitcode(status) if hasattr(os, "waitstatus_to_exitcode") else status
+            if code != 0:
+                print(f"[xylen] worker {pid} exited with {code}; restarting", file=sys.stderr)
+                if time.monotonic() - worker.started < CRASH_LOOP_SECONDS:
+                    time.sleep(CRASH_LOOP_SECONDS)
+
+    def rolling_restart(self):
+        for worker in [w for w in self.children.values() if not w.retiring]:
+            replacement = self.spawn()
+            if not self.wait_ready(replacement, self.ready_timeout):
+                print(f"[xylen] worker {replacement.pid} did not start; aborting restart", file=sys.stderr)
+                return
+            worker.retiring = True
+            self._kill(worker.pid, signal.SIGTERM)
+
+    def stop(self):
+        for worker in self.children.values():
+            worker.retiring = True
+            self._kill(worker.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid, worker in list(self.children.items()):
+            self._kill(pid, signal.SIGKILL)
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            os.close(worker.ready_fd)
+        self.children.clear()
+
+    @staticmethod
+    def _kill(pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def memory_report(self):
+        lines = [f"{'pid':>8}{'rss kB':>10}{'pss kB':>10}{'private kB':>12}{'shared kB':>11}"]
+        for pid in [os.getpid()] + sorted(self.children):
+            usage = memory_usage(pid)
+            if usage is None:
+                continue
+            lines.append(
+                f"{pid:>8}{usage['rss']:>10}{usage['pss']:>10}{usage['private']:>12}{usage['shared']:>11}"
+                + ("  (master)" if pid == os.getpid() else "")
+            )
+        return "\n".join(lines)
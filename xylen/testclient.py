@@ -1,4 +1,5 @@
 # Xylen/testclient.py
+import asyncio
 import json
 from urllib.parse import urlencode
 from .response import Response
@@ -16,7 +17,8 @@ class TestClient:
 
         if headers is None:
             headers = {}
-        header_list = [(k.encode(), v.encode()) for k, v in headers.items()]
+        # ASGI servers always send lowercase header names.
+        header_list = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
 
         return {
             "type": "http",
@@ -28,16 +30,29 @@ class TestClient:
             "scheme": "http",
         }
 
-    async def _make_request(self, method, path, headers=None, json_data=None, query_params=None):
+    async def _make_request(self, method, path, headers=None, json_data=None, query_params=None, content=None):
         scope = self._build_scope(method, path, headers, query_params)
         sent = []
+        if content is not None:
+            body = content.encode() if isinstance(content, str) else content
+        else:
+            body = json.dumps(json_data).encode() if json_data else b""
+        request_complete = False
+        response_complete = asyncio.Event()
 
         async def receive():
-            body = json.dumps(json_data).encode() if json_data else b""
-            return {"type": "http.request", "body": body}
+            nonlocal request_complete
+            if not request_complete:
+                request_complete = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Like a real client, only go away once the response has been read.
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
 
         async def send(event):
             sent.append(event)
+            if event["type"] == "http.response.body" and not event.get("more_body", False):
+                response_complete.set()
 
         try:
             await self.app(scope, receive, send)
@@ -45,24 +60,22 @@ class TestClient:
             return TestResponse(status_code=500, body=str(e).encode(), headers={})
 
         start_event = next((e for e in sent if e["type"] == "http.response.start"), None)
-        body_event = next((e for e in sent if e["type"] == "http.response.body"), None)
+        body_events = [e for e in sent if e["type"] == "http.response.body"]
 
-        if not start_event or not body_event:
+        if not start_event or not body_events:
             return TestResponse(status_code=500, body=b"", headers={})
 
         status_code = start_event["status"]
         headers = dict(start_event.get("headers", []))
-        body = body_event.get("body", b"")
+        body = b"".join(e.get("body", b"") for e in body_events)
 
         return TestResponse(status_code=status_code, body=body, headers=headers)
 
     def get(self, path, headers=None, query_params=None):
-        import asyncio
         return asyncio.run(self._make_request("GET", path, headers, None, query_params))
 
-    def post(self, path, json=None, headers=None):
-        import asyncio
-        return asyncio.run(self._make_request("POST", path, headers, json_data=json))
+    def post(self, path, json=None, headers=None, content=None):
+        return asyncio.run(self._make_request("POST", path, headers, json_data=json, content=content))
 
 
 class TestResponse:
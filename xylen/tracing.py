@@ -0,0 +1,176 @@
+# xylen/tracing.py
+import hmac
+import os
+import random
+import re
+import time
+from time import perf_counter
+
+from .datastructures import Headers
+from .router import Router
+
+try:
+    import cProfile
+except ImportError:  # pragma: no cover - stripped-down interpreters
+    cProfile = None
+
+# Scope key holding the ``Trace`` of a request picked for tracing.
+TRACE_KEY = "xylen.trace"
+
+
+class Trace:
+    """Stage timings of one request, in seconds, in the order recorded.
+
+    A stage recorded more than once (e.g. ``send`` for every body chunk, or a
+    middleware's two hooks) is summed by :meth:`durations`.
+    """
+
+    __slots__ = ("method", "path", "route", "status", "started", "total", "stages", "profile")
+
+    def __init__(self, scope):
+        self.method = scope.get("method")
+        self.path = scope.get("path")
+        self.route = None
+        self.status = None
+        self.started = perf_counter()
+        self.total = None
+        self.stages = []
+        self.profile = None
+
+    def stage(self, name, since):
+        """Record ``name`` as lasting from ``since`` until now; return now."""
+        now = perf_counter()
+        self.stages.append((name, now - since))
+        return now
+
+    def durations(self):
+        totals = {}
+        for name, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def server_timing(self):
+        """``Server-Timing`` value (milliseconds) for the stages so far."""
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.durations().items()]
+        parts.append(f"total;dur={(perf_counter() - self.started) * 1000:.3f}")
+        return ", ".join(parts)
+
+
+class _TraceSend:
+    __slots__ = ("trace", "send", "server_timing")
+
+    def __init__(self, trace, send, server_timing):
+        self.trace = trace
+        self.send = send
+        self.server_timing = server_timing
+
+    async def __call__(self, event):
+        if event["type"] == "http.response.start":
+            self.trace.status = event["status"]
+            if self.server_timing:
+                headers = event.get("headers")
+                if type(headers) is not list:
+                    headers = event["headers"] = list(headers or ())
+                headers.append((b"server-timing", self.trace.server_timing().encode("latin-1")))
+        start = perf_counter()
+        try:
+            await self.send(event)
+        finally:
+            self.trace.stage("send", start)
+
+
+def timed_hook(trace, name, hook):
+    def on_response_start(scope, status, headers):
+        start = perf_counter()
+        hook(scope, status, headers)
+        trace.stage(name, start)
+
+    return on_response_start
+
+
+class Tracer:
+    """Per-request stage timings: router, each middleware, handler,
+    serialization and send.
+
+    A request is traced when its ``header`` carries ``secret`` or, failing
+    that, with probability ``sample_rate``.  Traced responses get a
+    ``Server-Timing`` header (stages finished before the response started)
+    and the complete ``Trace`` is passed to ``sink(trace)`` afterwards.
+    ``profile=True`` also runs the request under cProfile and writes the
+    stats to ``profile_dir``; the profile covers everything the event loop
+    ran meanwhile, so it is cleanest on an otherwise idle worker.
+
+    Untraced requests pay for the sampling decision and nothing else.
+    """
+
+    def __init__(
+        self,
+        secret=None,
+        header="x-xylen-trace",
+        sample_rate=0.0,
+        sink=None,
+        server_timing=True,
+        profile=False,
+        profile_dir=None,
+        router=None,
+    ):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if profile and cProfile is None:
+            raise RuntimeError("profile=True needs the cProfile module")
+        self.secret = secret.encode("latin-1") if isinstance(secret, str) else secret
+        self.header = header.lower().encode("latin-1")
+        self.sample_rate = sample_rate
+        self.sink = sink
+        self.server_timing = server_timing
+        self.profile = profile
+        self.profile_dir = profile_dir
+        if profile and profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        self.router = router or Router()
+        self._profiling = False
+
+    def should_trace(self, scope):
+        if self.secret is not None:
+            value = Headers.from_scope(scope).get_raw(self.header)
+            if value is not None and hmac.compare_digest(value, self.secret):
+                return True
+        return self.sample_rate > 0.0 and random.random() < self.sample_rate
+
+    async def trace(self, app, scope, receive, send):
+        if not self.should_trace(scope):
+            return await app(scope, receive, send)
+
+        trace = scope[TRACE_KEY] = Trace(scope)
+        route = self.router.match_scope(scope)[0]
+        trace.stage("router", trace.started)
+        if route is not None:
+            trace.route = route.path
+
+        # cProfile can't nest, so overlapping traced requests go unprofiled.
+        profiler = None
+        if self.profile and not self._profiling:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler (e.g. coverage) is active
+                profiler = None
+            else:
+                self._profiling = True
+        try:
+            await app(scope, receive, _TraceSend(trace, send, self.server_timing))
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                trace.profile = profiler
+                if self.profile_dir:
+                    profiler.dump_stats(os.path.join(self.profile_dir, profile_filename(trace)))
+            trace.total = perf_counter() - trace.started
+            if self.sink is not None:
+                self.sink(trace)
+
+
+def profile_filename(trace):
+    path = re.sub(r"[^A-Za-z0-9_.-]+", "_", trace.path or "").strip("_") or "root"
+    return f"{int(time.time() * 1000)}-{trace.method}-{path[:80]}.prof"
@@ -8,7 +8,8 @@ CONVERTERS = {
 def parse_path(path: str):
     segments = []
     kwargs = []
-    parts = path.strip("/").split("/")
+    clean_path = path.strip("/")
+    parts = clean_path.split("/") if clean_path else []
     for part in parts:
         if part.startswith("{") and part.endswith("}"):
             name_type = part[1:-1]
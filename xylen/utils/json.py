@@ -0,0 +1,44 @@
+# Xylen/utils/json.py
+#
+# Fastest available JSON codec: orjson, then ujson, then the stdlib with a
+# prebuilt compact encoder.  ``dumps`` always returns UTF-8 ``bytes``.
+import json as _json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+_encoder = _json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def stdlib_dumps(obj) -> bytes:
+    return _encoder.encode(obj).encode("utf-8")
+
+
+stdlib_loads = _json.loads
+
+if orjson is not None:
+    BACKEND = "orjson"
+
+    def dumps(obj) -> bytes:
+        # OpenAPI response maps use int status codes as keys.
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    loads = orjson.loads
+elif ujson is not None:
+    BACKEND = "ujson"
+
+    def dumps(obj) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode("utf-8")
+
+    loads = ujson.loads
+else:
+    BACKEND = "json"
+    dumps = stdlib_dumps
+    loads = stdlib_loads
@@ -0,0 +1,159 @@
+# xylen/websockets.py
+import asyncio
+
+from .datastructures import Headers
+from .utils.json import dumps as json_dumps, loads as json_loads
+
+CONNECTING, CONNECTED, DISCONNECTED = range(3)
+
+
+class WebSocketDisconnect(Exception):
+    def __init__(self, code: int = 1000):
+        super().__init__(f"WebSocket closed with code {code}")
+        self.code = code
+
+
+class WebSocket:
+    """One WebSocket connection, handed to ``@app.websocket`` handlers.
+
+    Call ``accept()`` first; the ``receive_*`` helpers raise
+    ``WebSocketDisconnect`` once the client has gone away.
+    """
+
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self.path = scope["path"]
+        self.headers = Headers.from_scope(scope)
+        self._receive = receive
+        self._send = send
+        self.client_state = CONNECTING
+        self.application_state = CONNECTING
+
+    @property
+    def app(self):
+        return self.scope.get("app")
+
+    @property
+    def query_params(self):
+        return self.headers.query_params
+
+    @property
+    def cookies(self):
+        return self.headers.cookies
+
+    async def accept(self, subprotocol: str = None, headers=None):
+        if self.client_state == CONNECTING:
+            message = await self._receive()
+            if message["type"] == "websocket.disconnect":
+                self.client_state = DISCONNECTED
+                raise WebSocketDisconnect(message.get("code", 1000))
+            self.client_state = CONNECTED
+        event = {"type": "websocket.accept", "subprotocol": subprotocol}
+        if headers:
+            event["headers"] = [
+                (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()
+            ]
+        await self._send(event)
+        self.application_state = CONNECTED
+
+    async def receive(self):
+        """The next ``websocket.receive`` message."""
+        message = await self._receive()
+        if message["type"] == "websocket.disconnect":
+            self.client_state = DISCONNECTED
+            raise WebSocketDisconnect(message.get("code", 1000))
+        return message
+
+    async def receive_text(self) -> str:
+        message = await self.receive()
+        text = message.get("text")
+        if text is None:
+            return message["bytes"].decode("utf-8")
+        return text
+
+    async def receive_bytes(self) -> bytes:
+        message = await self.receive()
+        data = message.get("bytes")
+        if data is None:
+            return message["text"].encode("utf-8")
+        return data
+
+    async def receive_json(self):
+        message = await self.receive()
+        data = message.get("text")
+        if data is None:
+            data = message["bytes"]
+        app = self.scope.get("app")
+        return (app.json_decoder if app is not None else json_loads)(data)
+
+    async def __aiter__(self):
+        try:
+            while True:
+                message = await self.receive()
+                text = message.get("text")
+                yield message["bytes"] if text is None else text
+        except WebSocketDisconnect:
+            return
+
+    async def send(self, data):
+        """Send ``str`` as a text frame and ``bytes`` as a binary frame."""
+        if isinstance(data, str):
+            await self._send({"type": "websocket.send", "text": data})
+        else:
+            await self._send({"type": "websocket.send", "bytes": bytes(data)})
+
+    async def send_text(self, data: str):
+        await self._send({"type": "websocket.send", "text": data})
+
+    async def send_bytes(self, data: bytes):
+        await self._send({"type": "websocket.send", "bytes": data})
+
+    async def send_json(self, data):
+        app = self.scope.get("app")
+        body = (app.json_encoder if app is not None else json_dumps)(data)
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+        await self._send({"type": "websocket.send", "text": body})
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if DISCONNECTED in (self.application_state, self.client_state):
+            return
+        self.application_state = DISCONNECTED
+        await self._send({"type": "websocket.close", "code": code, "reason": reason})
+
+    async def relay(self, subscription, overflow_code: int = 1013):
+        """Send everything published to ``subscription`` until the client
+        disconnects or the subscription ends.
+
+        Incoming messages are discarded.  A subscription dropped as a slow
+        consumer closes the connection with ``overflow_code`` (try again later).
+        """
+        # A disconnect ends the subscription, which wakes the loop below.
+        watcher = asyncio.ensure_future(self._wait_disconnect())
+        watcher.add_done_callback(lambda _: subscription.close())
+        try:
+            while True:
+                payload = subscription.pop()
+                if payload is None:
+                    if subscription.closed:
+                        break
+                    await subscription.wait()
+                    continue
+                await self.send(payload)
+            if subscription.overflowed:
+                await self.close(overflow_code)
+        finally:
+            if not watcher.done():
+                watcher.cancel()
+                try:
+                    await watcher
+                except asyncio.CancelledError:
+                    pass
+            subscription.close()
+
+    async def _wait_disconnect(self):
+        while True:
+            message = await self._receive()
+            if message["type"] == "websocket.disconnect":
+                self.client_state = DISCONNECTED
+                return